@@ -1,12 +1,17 @@
 from django.contrib import admin
+from django.utils import timezone
 from .models import (
     Cliente,
     Funcionario,
+    JornadaTrabalho,
+    ExcecaoJornada,
     Servico,
     Horario,
     DadosPagamento,
     Pagamento,
-    Agendamento
+    Agendamento,
+    RecorrenciaAgendamento,
+    Notificacao
 )
 
 @admin.register(Cliente)
@@ -14,10 +19,19 @@ class ClienteAdmin(admin.ModelAdmin):
     list_display = ['nome', 'email', 'telefone', 'fidelidade_pontos']
     search_fields = ['nome', 'email']
 
+class JornadaTrabalhoInline(admin.TabularInline):
+    model = JornadaTrabalho
+    extra = 0
+
+class ExcecaoJornadaInline(admin.TabularInline):
+    model = ExcecaoJornada
+    extra = 0
+
 @admin.register(Funcionario)
 class FuncionarioAdmin(admin.ModelAdmin):
     list_display = ['nome', 'email', 'telefone', 'cargo']
     search_fields = ['nome', 'cargo']
+    inlines = [JornadaTrabalhoInline, ExcecaoJornadaInline]
 
 @admin.register(Servico)
 class ServicoAdmin(admin.ModelAdmin):
@@ -26,7 +40,7 @@ class ServicoAdmin(admin.ModelAdmin):
 
 @admin.register(Horario)
 class HorarioAdmin(admin.ModelAdmin):
-    list_display = ['data', 'disponivel']
+    list_display = ['data', 'disponivel', 'vagas']
     list_filter = ['disponivel']
 
 @admin.register(DadosPagamento)
@@ -42,4 +56,21 @@ class PagamentoAdmin(admin.ModelAdmin):
 class AgendamentoAdmin(admin.ModelAdmin):
     list_display = ['cliente', 'servico', 'data', 'status']
     list_filter = ['status']
-    search_fields = ['cliente__nome', 'servico__nome']
\ No newline at end of file
+    search_fields = ['cliente__nome', 'servico__nome']
+
+@admin.register(RecorrenciaAgendamento)
+class RecorrenciaAgendamentoAdmin(admin.ModelAdmin):
+    list_display = ['cliente', 'funcionario', 'servico', 'frequencia', 'intervalo', 'inicio', 'ativa']
+    list_filter = ['frequencia', 'ativa']
+    search_fields = ['cliente__nome', 'funcionario__nome']
+
+@admin.register(Notificacao)
+class NotificacaoAdmin(admin.ModelAdmin):
+    list_display = ['assunto', 'destinatario', 'status', 'tentativas', 'proxima_tentativa']
+    list_filter = ['status']
+    search_fields = ['destinatario']
+    actions = ['reenviar']
+
+    @admin.action(description='Reenviar as notificações selecionadas')
+    def reenviar(self, request, queryset):
+        queryset.update(status='PENDENTE', tentativas=0, proxima_tentativa=timezone.now())
@@ -0,0 +1,150 @@
+"""
+Autenticação da API com cache das verificações caras.
+
+``AutenticacaoBasica`` lembra, por alguns minutos e num LRU limitado do
+próprio processo, as credenciais Basic já verificadas. A chave é um HMAC
+(com a ``SECRET_KEY``) de usuário e senha, nunca a senha em si, e a entrada
+guarda um resumo do hash de senha do usuário no momento da verificação. Na
+repetição, o usuário ainda é lido do banco, como antes, mas o PBKDF2 só roda
+de novo se o hash mudou (troca de senha, atualização de iterações), o que
+invalida a entrada, ou se a entrada expirou. Falhas nunca entram no cache:
+cada tentativa errada continua pagando o hash inteiro.
+
+``AutenticacaoToken`` guarda o token já com o usuário (o mesmo resultado da
+junção ``Token`` + usuário) no alias de cache ``tokens``, sob um HMAC da
+chave do token. Os sinais de exclusão do token e de gravação ou exclusão do
+usuário apagam a entrada, e a próxima requisição, em qualquer processo, já
+não a encontra; por isso o alias precisa ser um cache compartilhado entre os
+processos (Redis, Memcached, banco). Um cache local, como o ``LocMemCache``,
+só seria limpo no processo que gravou. Sem o alias ``tokens`` em
+``CACHES``, cada requisição consulta o token no banco, como no DRF.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.utils.crypto import constant_time_compare, salted_hmac
+from rest_framework.authentication import BasicAuthentication, TokenAuthentication
+
+ALIAS_TOKENS = 'tokens'
+TEMPO_CACHE_TOKEN = 5 * 60
+CHAVE_CACHE_TOKEN = 'token:{}'
+
+
+class CacheLRU:
+    """Dicionário limitado a ``maximo`` entradas, que expiram ``ttl``
+    segundos depois de guardadas; o menos usado sai primeiro."""
+
+    def __init__(self, maximo, ttl):
+        self.maximo = maximo
+        self.ttl = ttl
+        self._entradas = OrderedDict()
+        self._trava = threading.Lock()
+
+    def obter(self, chave):
+        with self._trava:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                return None
+            expira, valor = entrada
+            if expira <= time.monotonic():
+                del self._entradas[chave]
+                return None
+            self._entradas.move_to_end(chave)
+            return valor
+
+    def guardar(self, chave, valor):
+        with self._trava:
+            self._entradas[chave] = (time.monotonic() + self.ttl, valor)
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.maximo:
+                self._entradas.popitem(last=False)
+
+    def descartar(self, chave):
+        with self._trava:
+            self._entradas.pop(chave, None)
+
+    def limpar(self):
+        with self._trava:
+            self._entradas.clear()
+
+    def __len__(self):
+        return len(self._entradas)
+
+
+def _resumo(valor):
+    return salted_hmac('sasb.api.autenticacao', valor, algorithm='sha256').digest()
+
+
+class AutenticacaoBasica(BasicAuthentication):
+    credenciais = CacheLRU(maximo=1024, ttl=5 * 60)
+
+    def authenticate_credentials(self, userid, password, request=None):
+        chave = _resumo(f'{userid}\0{password}')
+        verificada = self.credenciais.obter(chave)
+        if verificada is not None:
+            pk, hash_senha = verificada
+            modelo = get_user_model()
+            try:
+                usuario = modelo._default_manager.get_by_natural_key(userid)
+            except modelo.DoesNotExist:
+                usuario = None
+            if (
+                usuario is not None
+                and usuario.pk == pk
+                and usuario.is_active
+                and constant_time_compare(_resumo(usuario.password), hash_senha)
+            ):
+                return usuario, None
+            self.credenciais.descartar(chave)
+
+        usuario, auth = super().authenticate_credentials(userid, password, request)
+        self.credenciais.guardar(chave, (usuario.pk, _resumo(usuario.password)))
+        return usuario, auth
+
+
+def _chave_token(key):
+    return CHAVE_CACHE_TOKEN.format(_resumo(key).hex())
+
+
+def _cache_tokens():
+    if ALIAS_TOKENS not in settings.CACHES:
+        return None
+    return caches[ALIAS_TOKENS]
+
+
+class AutenticacaoToken(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        cache = _cache_tokens()
+        if cache is None:
+            return super().authenticate_credentials(key)
+        chave = _chave_token(key)
+        token = cache.get(chave)
+        if token is None:
+            _, token = super().authenticate_credentials(key)
+            cache.set(chave, token, TEMPO_CACHE_TOKEN)
+
+        # Cada requisição recebe a sua cópia, que pode alterar à vontade
+        usuario = copy.copy(token.user)
+        token = copy.copy(token)
+        token.user = usuario
+        return usuario, token
+
+
+def revogar_token(key):
+    cache = _cache_tokens()
+    if cache is not None:
+        cache.delete(_chave_token(key))
+
+
+def revogar_tokens_do_usuario(usuario_id):
+    cache = _cache_tokens()
+    if cache is None:
+        return
+    modelo = AutenticacaoToken().get_model()
+    keys = modelo.objects.filter(user_id=usuario_id).values_list('key', flat=True)
+    cache.delete_many([_chave_token(key) for key in keys])
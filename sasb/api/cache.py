@@ -0,0 +1,83 @@
+import hashlib
+from functools import wraps
+
+from django.db.models import Count, Max
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from ..services import cache_respostas
+from .mixins import _parametro_lista
+
+TEMPO_CATALOGO = 60 * 60
+TEMPO_DISPONIBILIDADE = 60
+
+
+def _resumo(*partes):
+    return hashlib.md5(repr(partes).encode(), usedforsecurity=False).hexdigest()
+
+
+def _chave(request, nome, grupos):
+    parametros = sorted(
+        (campo, valor) for campo, valores in request.query_params.lists() for valor in valores
+    )
+    resumo = _resumo(request.get_host(), request.path, parametros)
+    return f'resposta:{nome}:{cache_respostas.versoes(grupos)}:{resumo}'
+
+
+def cache_resposta(*grupos, tempo=TEMPO_CATALOGO):
+    """
+    Guarda no cache de respostas os dados das respostas 200 da ação
+    decorada, por caminho e parâmetros da query, até que algum dos
+    ``grupos`` seja invalidado. A permissão já foi verificada quando a ação
+    roda, então a resposta guardada não depende do usuário.
+    """
+    def decorador(acao):
+        nome = acao.__qualname__
+
+        @wraps(acao)
+        def envolvida(self, request, *args, **kwargs):
+            chave = _chave(request, nome, grupos)
+            dados = cache_respostas.obter(chave)
+            if dados is not None:
+                resposta = Response(dados)
+                resposta['X-Cache'] = 'HIT'
+                return resposta
+            resposta = acao(self, request, *args, **kwargs)
+            if resposta.status_code == status.HTTP_200_OK:
+                cache_respostas.guardar(chave, resposta.data, tempo)
+            resposta['X-Cache'] = 'MISS'
+            return resposta
+        return envolvida
+    return decorador
+
+
+def etag_lista(acao):
+    """
+    ETag forte para a listagem decorada, derivada do maior ``atualizado_em``
+    e do total de linhas do queryset filtrado (uma agregação, que também
+    acusa exclusões). Um ``If-None-Match`` que confere recebe 304 sem que a
+    consulta da listagem rode. Com ``?expand=`` os objetos aninhados vêm de
+    outras tabelas e a ETag é omitida.
+    """
+    @wraps(acao)
+    def envolvida(self, request, *args, **kwargs):
+        if _parametro_lista(request, 'expand'):
+            return acao(self, request, *args, **kwargs)
+
+        versao = self.filter_queryset(self.get_queryset()).aggregate(
+            marca=Max('atualizado_em'), total=Count('pk')
+        )
+        etag = '"%s"' % _resumo(
+            request.get_full_path(), request.user.pk, request.accepted_renderer.format,
+            versao['marca'], versao['total'],
+        )
+        recebidas = parse_etags(request.headers.get('If-None-Match', ''))
+        if '*' in recebidas or etag in [recebida.removeprefix('W/') for recebida in recebidas]:
+            resposta = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            resposta = acao(self, request, *args, **kwargs)
+        if resposta.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            resposta['ETag'] = etag
+        return resposta
+    return envolvida
@@ -0,0 +1,107 @@
+"""
+Caminho rápido de leitura para listagens grandes.
+
+Em vez de instanciar um modelo e percorrer os campos do serializer para cada
+linha, a listagem lê tuplas com ``values()`` e aplica conversores compilados
+uma vez por requisição a partir dos próprios campos do serializer: a saída é
+a mesma, byte a byte, que a do serializer. Campos que não correspondem a uma
+coluna (expansões, campos calculados) fazem a view voltar ao caminho normal.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.response import Response
+from rest_framework.settings import ISO_8601, api_settings
+
+# Campos cuja representação é o próprio valor lido do banco
+_IDENTIDADE = (
+    serializers.IntegerField,
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.PrimaryKeyRelatedField,
+)
+
+
+def _conversor_data_hora(campo):
+    formato = getattr(campo, 'format', api_settings.DATETIME_FORMAT)
+    fuso = campo.timezone if hasattr(campo, 'timezone') else campo.default_timezone()
+    if formato is None or formato.lower() != ISO_8601 or fuso is None:
+        return campo.to_representation
+
+    def converter(valor):
+        texto = valor.astimezone(fuso).isoformat()
+        return texto[:-6] + 'Z' if texto.endswith('+00:00') else texto
+    return converter
+
+
+def _conversor_decimal(campo):
+    coagir = getattr(campo, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if not coagir or campo.localize:
+        return campo.to_representation
+    quantizar = campo.quantize
+    return lambda valor: '{:f}'.format(quantizar(valor))
+
+
+def _conversor(campo):
+    if isinstance(campo, serializers.DateTimeField):
+        return _conversor_data_hora(campo)
+    if isinstance(campo, serializers.DecimalField):
+        return _conversor_decimal(campo)
+    if isinstance(campo, _IDENTIDADE) and not getattr(campo, 'localize', False):
+        return None
+    return campo.to_representation
+
+
+def compilar_leitura(serializer):
+    """
+    ``[(nome, coluna, conversor), ...]`` para os campos legíveis do
+    serializer, ou ``None`` se algum deles não sai direto de uma coluna.
+    """
+    opcoes = serializer.Meta.model._meta
+    plano = []
+    for nome, campo in serializer.fields.items():
+        if campo.write_only:
+            continue
+        if isinstance(campo, serializers.BaseSerializer) or campo.source == '*' or '.' in campo.source:
+            return None
+        try:
+            coluna = opcoes.get_field(campo.source)
+        except FieldDoesNotExist:
+            return None
+        if not coluna.concrete or coluna.many_to_many:
+            return None
+        if coluna.is_relation and not isinstance(campo, serializers.PrimaryKeyRelatedField):
+            return None
+        plano.append((nome, coluna.attname, _conversor(campo)))
+    return plano
+
+
+def _montar(plano, linha):
+    item = {}
+    for nome, coluna, conversor in plano:
+        valor = linha[coluna]
+        item[nome] = valor if conversor is None or valor is None else conversor(valor)
+    return item
+
+
+class LeituraRapidaMixin:
+    """Listagem montada a partir de ``values()`` com ``compilar_leitura``."""
+    leitura_rapida = True
+
+    def list(self, request, *args, **kwargs):
+        plano = compilar_leitura(self.get_serializer()) if self.leitura_rapida else None
+        if plano is None:
+            return super().list(request, *args, **kwargs)
+
+        colunas = [coluna for _, coluna, _ in plano]
+        ordering = getattr(self, 'ordering', None) or ()
+        for campo in (ordering,) if isinstance(ordering, str) else ordering:
+            if campo.lstrip('-') not in colunas:
+                colunas.append(campo.lstrip('-'))
+
+        linhas = self.filter_queryset(self.get_queryset()).values(*colunas)
+        pagina = self.paginate_queryset(linhas)
+        dados = [_montar(plano, linha) for linha in (pagina if pagina is not None else linhas)]
+        if pagina is not None:
+            return self.get_paginated_response(dados)
+        return Response(dados)
@@ -0,0 +1,136 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.serializers import ListSerializer
+
+
+def _parametro_lista(request, nome):
+    if request is None or request.method not in SAFE_METHODS:
+        return []
+    return [valor.strip() for valor in request.query_params.get(nome, '').split(',') if valor.strip()]
+
+
+def _no_topo(serializer):
+    # Só o serializer da resposta é afetado; os aninhados ficam completos
+    pai = serializer.parent
+    if isinstance(pai, ListSerializer):
+        pai = pai.parent
+    return pai is None
+
+
+class CamposSerializerMixin:
+    """
+    ``?fields=id,data`` limita a resposta a esses campos, nas leituras, e
+    ``colunas()`` diz quais colunas do modelo eles precisam, para o
+    ``.only()`` do queryset.
+    """
+
+    @staticmethod
+    def campos_pedidos(request):
+        return _parametro_lista(request, 'fields')
+
+    def get_fields(self):
+        fields = super().get_fields()
+        pedidos = self.campos_pedidos(self.context.get('request')) if _no_topo(self) else []
+        mantidos = {nome: fields[nome] for nome in pedidos if nome in fields}
+        return mantidos or fields
+
+    def colunas(self):
+        """Colunas lidas pelos campos da resposta, ou ``None`` se algum campo
+        não corresponde a uma coluna conhecida."""
+        opcoes = self.Meta.model._meta
+        colunas = [opcoes.pk.name]
+        for campo in self.fields.values():
+            if campo.write_only or campo.source == '*':
+                continue
+            try:
+                coluna = opcoes.get_field(campo.source.split('.')[0])
+            except FieldDoesNotExist:
+                return None
+            if coluna.concrete and not coluna.many_to_many and coluna.name not in colunas:
+                colunas.append(coluna.name)
+        return colunas
+
+
+class ExpansaoSerializerMixin:
+    """
+    ``?expand=cliente,servico`` troca as PKs desses campos pelos objetos
+    aninhados, nas leituras. ``expansiveis`` mapeia o campo para o
+    serializer aninhado.
+    """
+    expansiveis = {}
+
+    @classmethod
+    def campos_expandidos(cls, request):
+        # Campos cortados por ?fields= não são expandidos
+        pedidos = _parametro_lista(request, 'fields')
+        return [
+            campo for campo in _parametro_lista(request, 'expand')
+            if campo in cls.expansiveis and (not pedidos or campo in pedidos)
+        ]
+
+    @classmethod
+    def relacoes_expandidas(cls, request):
+        """``(select_related, prefetch_related)`` que carregam os campos expandidos."""
+        modelo = cls.Meta.model
+        relacionados, prefetch = [], []
+        for campo in cls.campos_expandidos(request):
+            relacionados.append(campo)
+            aninhado = cls.expansiveis[campo]
+            modelo_aninhado = modelo._meta.get_field(campo).related_model
+            for nome in aninhado.Meta.fields:
+                try:
+                    relacao = modelo_aninhado._meta.get_field(nome)
+                except FieldDoesNotExist:
+                    continue
+                if relacao.many_to_many or relacao.one_to_many:
+                    prefetch.append(f'{campo}__{nome}')
+        return relacionados, prefetch
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if not _no_topo(self):
+            return fields
+        for campo in self.campos_expandidos(self.context.get('request')):
+            if campo in fields:
+                fields[campo] = self.expansiveis[campo](read_only=True)
+        return fields
+
+
+class ExpansaoViewMixin:
+    """Acrescenta ao queryset os ``select_related``/``prefetch_related`` dos
+    campos pedidos em ``?expand=``, para que a lista não faça uma consulta por
+    objeto aninhado."""
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        serializer_class = self.get_serializer_class()
+        if not hasattr(serializer_class, 'relacoes_expandidas'):
+            return queryset
+        relacionados, prefetch = serializer_class.relacoes_expandidas(self.request)
+        if relacionados:
+            queryset = queryset.select_related(*relacionados)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset
+
+
+class CamposViewMixin:
+    """Em listagens e detalhes com ``?fields=``, lê do banco só as colunas
+    dos campos pedidos (mais as da ordenação da paginação)."""
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action not in ('list', 'retrieve'):
+            return queryset
+        serializer = self.get_serializer()
+        if not isinstance(serializer, CamposSerializerMixin) or not serializer.campos_pedidos(self.request):
+            return queryset
+        colunas = serializer.colunas()
+        if colunas is None:
+            return queryset
+        ordering = getattr(self, 'ordering', None) or ()
+        for campo in (ordering,) if isinstance(ordering, str) else ordering:
+            campo = campo.lstrip('-')
+            if campo not in colunas:
+                colunas.append(campo)
+        return queryset.only(*colunas)
@@ -0,0 +1,21 @@
+from rest_framework.pagination import CursorPagination
+
+
+class PaginacaoCursor(CursorPagination):
+    """
+    Paginação por cursor (keyset): cada página parte da posição da anterior
+    numa coluna indexada, sem OFFSET nem COUNT(*), de modo que páginas
+    profundas custam o mesmo que a primeira.
+
+    A ordenação vem do atributo ``ordering`` da view (padrão: ``id``).
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = ('id',)
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, 'ordering', None)
+        if ordering is None:
+            return super().get_ordering(request, queryset, view)
+        return (ordering,) if isinstance(ordering, str) else tuple(ordering)
@@ -0,0 +1,87 @@
+"""
+Renderer e parser JSON com orjson, quando instalado.
+
+A saída segue o ``JSONRenderer`` do DRF com as configurações padrão
+(compacto, UTF-8, U+2028/U+2029 escapados): datas e horas passam pelo
+codificador do DRF, que corta microssegundos e escreve ``Z`` em UTC, e o
+restante que o orjson não conhece (``Decimal``, textos preguiçosos,
+querysets) também. Sem orjson, ou quando ele recusa os dados (inteiros fora
+de 64 bits, por exemplo), ou quando a saída pede indentação ou
+configurações não padrão, tudo volta para o JSON da biblioteca padrão.
+
+Só os ``float`` saem diferentes, e nenhum campo da API é ``float`` (valores
+são ``Decimal``, que sai como texto):
+
+- o expoente sai sem ``+`` e sem zero à esquerda (``1e16`` e ``1e-7``, não
+  ``1e+16`` e ``1e-07``), o mesmo número para qualquer leitor de JSON;
+- ``NaN`` e infinitos saem como ``null``, onde o ``JSONRenderer`` com
+  ``STRICT_JSON`` levanta ``ValueError``. Nos dois casos a saída nunca tem
+  ``NaN`` nem ``Infinity``, por isso o orjson só é usado com ``STRICT_JSON``.
+
+Procurar esses ``float`` nos dados antes de serializar custaria mais do que
+o orjson economiza.
+
+Na leitura vale o mesmo: o orjson converte em ``float``, sem avisar, os
+inteiros fora de 64 bits, então um corpo com uma sequência de 19 dígitos ou
+mais vai direto para o parser padrão, e um corpo que o orjson recusa também
+(o erro, se houver, é o do parser padrão).
+
+O orjson é uma dependência opcional (``requirements-opcionais.txt``).
+"""
+import io
+import re
+
+from django.conf import settings
+from rest_framework import renderers
+from rest_framework.parsers import JSONParser
+from rest_framework.settings import api_settings
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_padrao = encoders.JSONEncoder().default
+# Inteiros que podem não caber em 64 bits (ou dígitos dentro de textos, que
+# só custam a volta para o parser padrão)
+_INTEIRO_LONGO = re.compile(rb'\d{19}')
+
+
+def _configuracao_padrao():
+    return api_settings.COMPACT_JSON and api_settings.UNICODE_JSON and api_settings.STRICT_JSON
+
+
+class JSONRapidoRenderer(renderers.JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or not _configuracao_padrao()
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            saida = orjson.dumps(data, default=_padrao, option=orjson.OPT_PASSTHROUGH_DATETIME)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Mesmo escape do JSONRenderer, para o JSON valer como JavaScript
+        return saida.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class JSONRapidoParser(JSONParser):
+    def parse(self, stream, media_type=None, parser_context=None):
+        codificacao = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        if (
+            orjson is None
+            or not api_settings.STRICT_JSON
+            or codificacao.lower().replace('-', '') != 'utf8'
+        ):
+            return super().parse(stream, media_type, parser_context)
+        corpo = stream.read()
+        if not _INTEIRO_LONGO.search(corpo):
+            try:
+                return orjson.loads(corpo)
+            except orjson.JSONDecodeError:
+                pass
+        return super().parse(io.BytesIO(corpo), media_type, parser_context)
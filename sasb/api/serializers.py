@@ -1,18 +1,25 @@
+from datetime import time
+from django.utils import timezone
 from rest_framework import serializers
-from django.core.exceptions import ValidationError
 from django.contrib.auth.validators import UnicodeUsernameValidator
 from ..models import (
     Cliente,
     Funcionario,
+    JornadaTrabalho,
+    ExcecaoJornada,
     Servico,
     Horario,
     DadosPagamento,
     Pagamento,
-    Agendamento
+    Agendamento,
+    RecorrenciaAgendamento
 )
+from .mixins import CamposSerializerMixin, ExpansaoSerializerMixin
+from ..services.agendamento import AgendamentoService
+from ..services.validacao import validar_agendamento
 
 
-class ClienteSerializer(serializers.ModelSerializer):
+class ClienteSerializer(CamposSerializerMixin, serializers.ModelSerializer):
     username = serializers.CharField(
         required=True,
         validators=[UnicodeUsernameValidator()],
@@ -39,7 +46,7 @@ class ClienteSerializer(serializers.ModelSerializer):
 
 
 
-class FuncionarioSerializer(serializers.ModelSerializer):
+class FuncionarioSerializer(CamposSerializerMixin, serializers.ModelSerializer):
     username = serializers.CharField(
         required=True,
         validators=[UnicodeUsernameValidator()],
@@ -66,7 +73,37 @@ class FuncionarioSerializer(serializers.ModelSerializer):
 
 
 
-class ServicoSerializer(serializers.ModelSerializer):
+class JornadaTrabalhoSerializer(CamposSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = JornadaTrabalho
+        fields = ['id', 'funcionario', 'dia_semana', 'inicio', 'fim']
+
+    def validate(self, data):
+        inicio = data.get('inicio', getattr(self.instance, 'inicio', None))
+        fim = data.get('fim', getattr(self.instance, 'fim', None))
+        if fim != time.min and fim <= inicio:
+            raise serializers.ValidationError({'fim': 'O fim da faixa deve ser posterior ao início.'})
+        return data
+
+
+class ExcecaoJornadaSerializer(CamposSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = ExcecaoJornada
+        fields = ['id', 'funcionario', 'data_inicio', 'data_fim', 'inicio', 'fim', 'motivo']
+
+    def validate(self, data):
+        atual = {
+            campo: data.get(campo, getattr(self.instance, campo, None))
+            for campo in ('data_inicio', 'data_fim', 'inicio', 'fim')
+        }
+        if atual['data_fim'] < atual['data_inicio']:
+            raise serializers.ValidationError({'data_fim': 'A data final deve ser igual ou posterior à inicial.'})
+        if (atual['inicio'] is None) != (atual['fim'] is None):
+            raise serializers.ValidationError({'fim': 'Informe início e fim, ou nenhum dos dois para folga.'})
+        return data
+
+
+class ServicoSerializer(CamposSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Servico
         fields = ['id', 'nome', 'duracao', 'valor']
@@ -79,19 +116,59 @@ class ServicoSerializer(serializers.ModelSerializer):
         return data
 
 
-class HorarioSerializer(serializers.ModelSerializer):
+class HorarioSerializer(CamposSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Horario
-        fields = ['id', 'data', 'disponivel']
+        fields = ['id', 'data', 'disponivel', 'vagas']
+        read_only_fields = ['vagas']
 
 
-class DadosPagamentoSerializer(serializers.ModelSerializer):
+class GeracaoHorariosSerializer(serializers.Serializer):
+    MAXIMO_DIAS = 366
+
+    data_inicio = serializers.DateField()
+    data_fim = serializers.DateField()
+    intervalo = serializers.IntegerField(min_value=5, max_value=24 * 60, default=15)
+    funcionarios = serializers.PrimaryKeyRelatedField(
+        queryset=Funcionario.objects.all(), many=True, required=False
+    )
+
+    def validate(self, data):
+        dias = (data['data_fim'] - data['data_inicio']).days
+        if dias < 0:
+            raise serializers.ValidationError({'data_fim': 'A data final deve ser igual ou posterior à inicial.'})
+        if dias >= self.MAXIMO_DIAS:
+            raise serializers.ValidationError({'data_fim': f'O período não pode passar de {self.MAXIMO_DIAS} dias.'})
+        return data
+
+
+class ExportacaoSerializer(serializers.Serializer):
+    FORMATOS = ['csv', 'ndjson']
+
+    formato = serializers.ChoiceField(choices=FORMATOS, default='csv')
+    data_inicio = serializers.DateField(required=False)
+    data_fim = serializers.DateField(required=False)
+    status = serializers.ChoiceField(choices=[], required=False)
+
+    def __init__(self, *args, status_validos=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['status'].choices = status_validos
+
+    def validate(self, data):
+        if 'data_inicio' in data and 'data_fim' in data and data['data_fim'] < data['data_inicio']:
+            raise serializers.ValidationError({'data_fim': 'A data final deve ser igual ou posterior à inicial.'})
+        return data
+
+
+class DadosPagamentoSerializer(CamposSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = DadosPagamento
         fields = ['id', 'numero_cartao', 'valor', 'metodo']
 
 
-class PagamentoSerializer(serializers.ModelSerializer):
+class PagamentoSerializer(CamposSerializerMixin, ExpansaoSerializerMixin, serializers.ModelSerializer):
+    expansiveis = {'dados_pagamento': DadosPagamentoSerializer}
+
     class Meta:
         model = Pagamento
         fields = ['id', 'data', 'status', 'dados_pagamento']
@@ -109,33 +186,137 @@ class PagamentoSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class AgendamentoSerializer(serializers.ModelSerializer):
+class AgendamentoSerializer(CamposSerializerMixin, ExpansaoSerializerMixin, serializers.ModelSerializer):
+    expansiveis = {
+        'cliente': ClienteSerializer,
+        'servico': ServicoSerializer,
+        'horario': HorarioSerializer,
+        'funcionario': FuncionarioSerializer,
+        'pagamento': PagamentoSerializer,
+    }
+
     class Meta:
         model = Agendamento
         fields = [
             'id', 'data', 'status', 'cliente', 'servico',
-            'horario', 'funcionario', 'pagamento'
+            'horario', 'funcionario', 'pagamento', 'recorrencia'
         ]
-        read_only_fields = ['status']
+        read_only_fields = ['status', 'recorrencia']
+
+    # Mudar qualquer um destes é outra reserva: cancela-se e cria-se outra
+    CAMPOS_DA_RESERVA = ['data', 'cliente', 'servico', 'horario', 'funcionario']
 
     def validate(self, data):
-        try:
-            # Criar uma instância temporária para usar o clean()
-            instance = Agendamento(
-                data=data.get('data'),
-                cliente=data.get('cliente'),
-                servico=data.get('servico'),
-                horario=data.get('horario'),
-                funcionario=data.get('funcionario')
-            )
-            instance.clean()
-        except ValidationError as e:
-            raise serializers.ValidationError(e.message_dict)
+        if self.instance is None:
+            # A instância validada é a mesma que será salva em create(), que
+            # reaproveita a validação memorizada
+            self._agendamento = Agendamento(**data)
+            erros = validar_agendamento(self._agendamento)
+            if erros:
+                raise serializers.ValidationError(erros)
+        else:
+            alterados = {
+                campo: 'Não pode ser alterado; cancele o agendamento e crie outro.'
+                for campo in self.CAMPOS_DA_RESERVA
+                if campo in data and data[campo] != getattr(self.instance, campo)
+            }
+            if alterados:
+                raise serializers.ValidationError(alterados)
 
         return data
 
     def create(self, validated_data):
         if 'cliente' not in validated_data and self.context['request'].user:
             validated_data['cliente'] = self.context['request'].user
-        instance = super().create(validated_data)
-        return instance
\ No newline at end of file
+        instance = getattr(self, '_agendamento', None) or Agendamento()
+        for campo, valor in validated_data.items():
+            setattr(instance, campo, valor)
+        instance = AgendamentoService.reservar(instance)
+        return instance
+
+class ItemLoteAgendamentoSerializer(serializers.Serializer):
+    cliente = serializers.IntegerField(required=False)
+    servico = serializers.IntegerField()
+    horario = serializers.IntegerField()
+    funcionario = serializers.IntegerField()
+
+
+class LoteAgendamentoSerializer(serializers.Serializer):
+    MAXIMO_ITENS = 50
+    MODOS = [
+        ('atomico', 'Tudo ou nada'),
+        ('parcial', 'Cria os itens válidos'),
+    ]
+
+    modo = serializers.ChoiceField(choices=MODOS, default='atomico')
+    agendamentos = ItemLoteAgendamentoSerializer(many=True, allow_empty=False)
+
+    def validate_agendamentos(self, value):
+        if len(value) > self.MAXIMO_ITENS:
+            raise serializers.ValidationError(f'O lote não pode passar de {self.MAXIMO_ITENS} agendamentos.')
+        return value
+
+    def montar_agendamentos(self, cliente_padrao=None):
+        """
+        Resolve os ids de todos os itens com uma consulta por modelo e devolve,
+        na ordem recebida, um ``Agendamento`` não salvo ou o dicionário de
+        erros de cada item. Itens sem ``cliente`` ficam com ``cliente_padrao``
+        (um ``Cliente``), ou são rejeitados se não houver um.
+        """
+        itens = self.validated_data['agendamentos']
+        for item in itens:
+            item.setdefault('cliente', cliente_padrao.pk if cliente_padrao is not None else None)
+
+        modelos = {
+            'cliente': (Cliente, 'Cliente não encontrado.'),
+            'servico': (Servico, 'Serviço não encontrado.'),
+            'horario': (Horario, 'Horário não encontrado.'),
+            'funcionario': (Funcionario, 'Funcionário não encontrado.'),
+        }
+        objetos = {
+            campo: modelo.objects.in_bulk({item[campo] for item in itens if item[campo] is not None})
+            for campo, (modelo, _) in modelos.items()
+        }
+
+        resultado = []
+        for item in itens:
+            campos = {campo: objetos[campo].get(item[campo]) for campo in modelos}
+            erros = {
+                campo: modelos[campo][1] if item[campo] is not None else 'Este campo é obrigatório.'
+                for campo, objeto in campos.items() if objeto is None
+            }
+            if erros:
+                resultado.append(erros)
+            else:
+                resultado.append(Agendamento(data=campos['horario'].data, **campos))
+        return resultado
+
+
+class RecorrenciaAgendamentoSerializer(CamposSerializerMixin, ExpansaoSerializerMixin, serializers.ModelSerializer):
+    expansiveis = {
+        'cliente': ClienteSerializer,
+        'funcionario': FuncionarioSerializer,
+        'servico': ServicoSerializer,
+    }
+
+    class Meta:
+        model = RecorrenciaAgendamento
+        fields = [
+            'id', 'cliente', 'funcionario', 'servico', 'frequencia', 'intervalo',
+            'inicio', 'data_fim', 'ativa', 'materializado_ate'
+        ]
+        read_only_fields = ['ativa', 'materializado_ate']
+
+    def validate(self, data):
+        if data.get('intervalo', 1) < 1:
+            raise serializers.ValidationError({'intervalo': 'O intervalo deve ser de pelo menos 1.'})
+        inicio = data.get('inicio')
+        if inicio and inicio <= timezone.now():
+            raise serializers.ValidationError({'inicio': 'A série deve começar em uma data futura.'})
+        if inicio and data.get('data_fim') and data['data_fim'] < timezone.localtime(inicio).date():
+            raise serializers.ValidationError({'data_fim': 'A data final deve ser igual ou posterior ao início.'})
+        funcionario = data.get('funcionario')
+        servico = data.get('servico')
+        if funcionario and servico and not funcionario.servicos.filter(pk=servico.pk).exists():
+            raise serializers.ValidationError({'funcionario': 'O funcionário não realiza este serviço.'})
+        return data
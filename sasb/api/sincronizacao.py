@@ -0,0 +1,188 @@
+"""
+Sincronização incremental das listagens por ``?since=<token>``.
+
+O token é o instante (em microssegundos) a partir do qual o cliente ainda
+não viu alterações. A resposta traz as linhas com ``atualizado_em`` desde
+então (criadas, alteradas ou canceladas), os ids excluídos desde então,
+segundo ``RegistroExclusao``, e o token seguinte. Ambas as consultas usam
+índices sobre o instante, então o custo acompanha o volume de alterações e
+não o tamanho da tabela.
+
+As alterações vêm em páginas, em ordem de ``(atualizado_em, pk)``, e as
+exclusões também, em ordem de registro, cada uma até o tamanho da paginação
+da listagem. Enquanto houver mais de alguma delas, a resposta traz em
+``proximo`` um token de continuação, que leva o token original e as
+posições das últimas linhas entregues; o cliente o passa em ``since`` até
+receber ``proximo`` nulo e então guarda ``token``, que é o mesmo em todas as
+páginas.
+
+O token seguinte fica ``MARGEM`` antes do início da requisição: uma
+gravação cujo ``atualizado_em`` foi tomado antes, mas que só ficou visível
+depois da consulta, ainda entra na próxima sincronização. As linhas
+reenviadas por isso devem ser aplicadas pelo cliente como upsert.
+
+Os registros de exclusão são guardados por ``RETENCAO`` e depois podados
+(``manage.py podar_exclusoes``). Um token mais antigo que isso recebe 410: o
+cliente precisa refazer a listagem completa.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+from functools import wraps
+
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from ..models import RegistroExclusao
+from .leitura import _montar, compilar_leitura
+
+MARGEM = timedelta(seconds=5)
+RETENCAO = timedelta(days=30)
+TAMANHO_PAGINA = 500
+CABECALHO = 'X-Sync-Token'
+
+
+def gerar_token(instante):
+    return str((instante - datetime(1970, 1, 1, tzinfo=dt_timezone.utc)) // timedelta(microseconds=1))
+
+
+def _invalido():
+    return ValidationError({'since': 'Token de sincronização inválido.'})
+
+
+def ler_token(token):
+    try:
+        microssegundos = int(token)
+        if microssegundos < 0:
+            raise ValueError
+        return datetime(1970, 1, 1, tzinfo=dt_timezone.utc) + timedelta(microseconds=microssegundos)
+    except (TypeError, ValueError, OverflowError):
+        raise _invalido()
+
+
+def gerar_continuacao(token, desde, posicao, ultima_exclusao):
+    instante, pk = posicao if posicao else ('', '')
+    if instante:
+        instante = gerar_token(instante)
+    return f'{token}:{gerar_token(desde)}:{instante}:{pk}:{ultima_exclusao}'
+
+
+def ler_continuacao(continuacao):
+    """``(token, desde, posicao, ultima_exclusao)`` de um token de
+    continuação, ou ``None`` se for um token comum. ``posicao`` é o
+    ``(atualizado_em, pk)`` da última alteração entregue, ou ``None`` se
+    nenhuma foi, e ``ultima_exclusao`` o id do último ``RegistroExclusao``."""
+    partes = continuacao.split(':')
+    if len(partes) == 1:
+        return None
+    if len(partes) != 5:
+        raise _invalido()
+    token, desde, instante, pk, ultima_exclusao = partes
+    if not ultima_exclusao.isdigit() or bool(instante) != bool(pk) or (pk and not pk.isdigit()):
+        raise _invalido()
+    posicao = (ler_token(instante), int(pk)) if instante else None
+    return gerar_token(ler_token(token)), ler_token(desde), posicao, int(ultima_exclusao)
+
+
+def podar_exclusoes(agora=None):
+    """Apaga os registros de exclusão mais antigos que ``RETENCAO``;
+    devolve quantos."""
+    limite = (agora or timezone.now()) - RETENCAO
+    apagados, _ = RegistroExclusao.objects.filter(excluido_em__lt=limite).delete()
+    return apagados
+
+
+def _tamanho_pagina(view, request):
+    paginador = getattr(view, 'paginator', None)
+    tamanho = paginador.get_page_size(request) if paginador is not None else None
+    return tamanho or TAMANHO_PAGINA
+
+
+def _pagina(view, queryset, tamanho):
+    """``(itens, posicao, mais)``: até ``tamanho`` linhas serializadas, o
+    ``(atualizado_em, pk)`` da última (``None`` se não houver) e se há mais
+    depois dela."""
+    serializer = view.get_serializer()
+    plano = compilar_leitura(serializer) if getattr(view, 'leitura_rapida', False) else None
+    if plano is None:
+        linhas = list(queryset[:tamanho + 1])
+        itens = view.get_serializer(linhas[:tamanho], many=True).data
+    else:
+        colunas = {coluna for _, coluna, _ in plano} | {'atualizado_em', 'pk'}
+        linhas = list(queryset.values(*colunas)[:tamanho + 1])
+        itens = [_montar(plano, linha) for linha in linhas[:tamanho]]
+    mais = len(linhas) > tamanho
+    if not itens:
+        return itens, None, mais
+    ultima = linhas[len(itens) - 1]
+    if plano is None:
+        return itens, (ultima.atualizado_em, ultima.pk), mais
+    return itens, (ultima['atualizado_em'], ultima['pk']), mais
+
+
+def _exclusoes(view, desde, depois_de, tamanho):
+    """``(objeto_ids, ultima, mais)``: a página de exclusões desde ``desde``
+    após o registro ``depois_de``."""
+    exclusoes = RegistroExclusao.objects.filter(
+        modelo=view.get_queryset().model._meta.model_name, excluido_em__gte=desde, pk__gt=depois_de
+    )
+    filtrar_exclusoes = getattr(view, 'filtrar_exclusoes', None)
+    if filtrar_exclusoes is not None:
+        exclusoes = filtrar_exclusoes(exclusoes)
+    linhas = list(exclusoes.order_by('pk').values_list('pk', 'objeto_id')[:tamanho + 1])
+    pagina = linhas[:tamanho]
+    return [objeto_id for _, objeto_id in pagina], (pagina[-1][0] if pagina else depois_de), len(linhas) > tamanho
+
+
+def sincronizavel(acao):
+    """
+    Com ``?since=``, a listagem decorada responde só o que mudou desde o
+    token: ``{'token', 'proximo', 'alterados', 'excluidos'}``. Sem ele, a
+    listagem segue normalmente e o token inicial vem no cabeçalho
+    ``X-Sync-Token``.
+
+    Os filtros da listagem valem para ``alterados``; para ``excluidos``, só
+    se a view os aplicar em ``filtrar_exclusoes(queryset)``. Sem esse
+    método, vêm todas as exclusões do modelo.
+    """
+    @wraps(acao)
+    def envolvida(self, request, *args, **kwargs):
+        token = gerar_token(timezone.now() - MARGEM)
+        desde = request.query_params.get('since')
+        if desde is None:
+            resposta = acao(self, request, *args, **kwargs)
+            resposta[CABECALHO] = token
+            return resposta
+
+        continuacao = ler_continuacao(desde)
+        if continuacao is None:
+            desde, posicao, ultima_exclusao = ler_token(desde), None, 0
+        else:
+            token, desde, posicao, ultima_exclusao = continuacao
+        if desde < timezone.now() - RETENCAO:
+            return Response(
+                {'since': 'Token de sincronização expirado; refaça a listagem completa.'},
+                status=status.HTTP_410_GONE
+            )
+
+        alterados = self.filter_queryset(self.get_queryset()).filter(atualizado_em__gte=desde)
+        if posicao is not None:
+            instante, pk = posicao
+            alterados = alterados.filter(Q(atualizado_em__gt=instante) | Q(atualizado_em=instante, pk__gt=pk))
+        tamanho = _tamanho_pagina(self, request)
+        itens, ultima, mais_alterados = _pagina(self, alterados.order_by('atualizado_em', 'pk'), tamanho)
+        excluidos, ultima_exclusao, mais_excluidos = _exclusoes(self, desde, ultima_exclusao, tamanho)
+
+        proximo = None
+        if mais_alterados or mais_excluidos:
+            proximo = gerar_continuacao(token, desde, ultima or posicao, ultima_exclusao)
+        resposta = Response({
+            'token': token,
+            'proximo': proximo,
+            'alterados': itens,
+            'excluidos': excluidos,
+        })
+        resposta[CABECALHO] = token
+        return resposta
+    return envolvida
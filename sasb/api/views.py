@@ -1,29 +1,108 @@
-from rest_framework import viewsets, status, permissions
+from rest_framework import viewsets, status, permissions, serializers
 from rest_framework.decorators import action
+from rest_framework.negotiation import BaseContentNegotiation
+from rest_framework.exceptions import ValidationError as DRFValidationError
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from django.core.exceptions import ValidationError
-from django.core.mail import send_mail
-from django.conf import settings    
+from django.http import StreamingHttpResponse
 from django.utils import timezone
 from datetime import timedelta, datetime
 from ..models import (
     Cliente,
     Funcionario,
+    JornadaTrabalho,
+    ExcecaoJornada,
     Servico,
     Horario,
     DadosPagamento,
     Pagamento,
-    Agendamento
+    Agendamento,
+    RecorrenciaAgendamento
 )
+from .cache import TEMPO_DISPONIBILIDADE, cache_resposta, etag_lista
+from .leitura import LeituraRapidaMixin
+from .mixins import CamposViewMixin, ExpansaoViewMixin
+from .sincronizacao import sincronizavel
 from .serializers import (
     ClienteSerializer,
     FuncionarioSerializer,
+    JornadaTrabalhoSerializer,
+    ExcecaoJornadaSerializer,
+    ExportacaoSerializer,
     ServicoSerializer,
     HorarioSerializer,
+    GeracaoHorariosSerializer,
     DadosPagamentoSerializer,
+    LoteAgendamentoSerializer,
     PagamentoSerializer,
-    AgendamentoSerializer
+    AgendamentoSerializer,
+    RecorrenciaAgendamentoSerializer
 )
+from ..services.agendamento import AgendamentoService, ConflitoAgendamento
+from ..services import cache_respostas
+from ..services.busca import buscar_horarios_livres
+from ..services.calendario import calendario_mes
+from ..services.cache_respostas import DISPONIBILIDADE, FUNCIONARIOS, SERVICOS
+from ..services.disponibilidade import inicio_do_dia
+from ..services.exportacao import COLUNAS_AGENDAMENTO, COLUNAS_PAGAMENTO, FORMATOS
+from ..services.horarios import gerar_horarios
+from ..services.matriz import CODIFICACOES, matriz_disponibilidade
+from ..services.recorrencia import encerrar, materializar
+from ..services.sugestoes import sugerir_alternativas
+from ..services.validacao import validar_agendamento
+
+
+def _periodo(request, dias=7):
+    """Período ``data_inicio``/``data_fim`` da query (padrão: próximos ``dias``).
+    Datas sem fuso ficam no fuso atual."""
+    data_inicio = _data_da_query(request, 'data_inicio') or timezone.now()
+    data_fim = _data_da_query(request, 'data_fim') or data_inicio + timedelta(days=dias)
+    return data_inicio, data_fim
+
+
+def _data_da_query(request, nome):
+    valor = request.query_params.get(nome)
+    if not valor:
+        return None
+    try:
+        data = datetime.fromisoformat(valor)
+    except ValueError:
+        raise DRFValidationError({nome: 'Informe uma data ISO 8601.'})
+    return timezone.make_aware(data) if timezone.is_naive(data) else data
+
+
+def _exportar(request, queryset, colunas, status_validos, nome):
+    """
+    Resposta em fluxo com as linhas de ``queryset`` filtradas pela query:
+    formato (csv ou ndjson), data_inicio e data_fim (AAAA-MM-DD, inclusive)
+    e status.
+    """
+    parametros = ExportacaoSerializer(data=request.query_params, status_validos=status_validos)
+    parametros.is_valid(raise_exception=True)
+    filtros = parametros.validated_data
+
+    if 'data_inicio' in filtros:
+        queryset = queryset.filter(data__gte=inicio_do_dia(filtros['data_inicio']))
+    if 'data_fim' in filtros:
+        queryset = queryset.filter(data__lt=inicio_do_dia(filtros['data_fim'] + timedelta(days=1)))
+    if 'status' in filtros:
+        queryset = queryset.filter(status=filtros['status'])
+
+    gerar, tipo = FORMATOS[filtros['formato']]
+    resposta = StreamingHttpResponse(gerar(queryset.order_by('data', 'id'), colunas), content_type=tipo)
+    resposta['Content-Disposition'] = f'attachment; filename="{nome}.{filtros["formato"]}"'
+    return resposta
+
+
+class SemNegociacao(BaseContentNegotiation):
+    """O formato das exportações vem de ``?formato=``, não do Accept."""
+
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
 
 
 class IsAdminOrReadOnly(permissions.BasePermission):
@@ -33,7 +112,7 @@ class IsAdminOrReadOnly(permissions.BasePermission):
         return request.user and request.user.is_staff
 
 
-class ClienteViewSet(viewsets.ModelViewSet):
+class ClienteViewSet(CamposViewMixin, viewsets.ModelViewSet):
     queryset = Cliente.objects.all()
     serializer_class = ClienteSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -44,48 +123,141 @@ class ClienteViewSet(viewsets.ModelViewSet):
         return super().get_permissions()
 
 
-class FuncionarioViewSet(viewsets.ModelViewSet):
+class FuncionarioViewSet(CamposViewMixin, viewsets.ModelViewSet):
     queryset = Funcionario.objects.all()
     serializer_class = FuncionarioSerializer
     permission_classes = [permissions.IsAdminUser]
 
+    @cache_resposta(FUNCIONARIOS)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
 
-class ServicoViewSet(viewsets.ModelViewSet):
+
+class JornadaTrabalhoViewSet(CamposViewMixin, viewsets.ModelViewSet):
+    queryset = JornadaTrabalho.objects.all()
+    serializer_class = JornadaTrabalhoSerializer
+    permission_classes = [permissions.IsAdminUser]
+
+
+class ExcecaoJornadaViewSet(CamposViewMixin, viewsets.ModelViewSet):
+    queryset = ExcecaoJornada.objects.all()
+    serializer_class = ExcecaoJornadaSerializer
+    permission_classes = [permissions.IsAdminUser]
+
+
+class ServicoViewSet(CamposViewMixin, viewsets.ModelViewSet):
     queryset = Servico.objects.all()
     serializer_class = ServicoSerializer
     permission_classes = [IsAdminOrReadOnly]
 
+    @etag_lista
+    @cache_resposta(SERVICOS)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cache_resposta(SERVICOS)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     @action(detail=True, methods=['get'])
+    @cache_resposta(SERVICOS, DISPONIBILIDADE, tempo=TEMPO_DISPONIBILIDADE)
     def horarios_disponiveis(self, request, pk=None):
+        """
+        Horários em que o serviço cabe inteiro na agenda de algum profissional
+        Parâmetros opcionais na query: data_inicio, data_fim (ISO 8601)
+        """
         servico = self.get_object()
-        horarios = servico.buscar_horarios_disponiveis()
+        data_inicio, data_fim = _periodo(request)
+        horarios = servico.buscar_horarios_disponiveis(data_inicio, data_fim)
         serializer = HorarioSerializer(horarios, many=True)
         return Response(serializer.data)
 
 
-class HorarioViewSet(viewsets.ModelViewSet):
+class HorarioViewSet(LeituraRapidaMixin, CamposViewMixin, viewsets.ModelViewSet):
     queryset = Horario.objects.all()
+    # Paginação por cursor sobre (data, id)
+    ordering = ('data', 'id')
     serializer_class = HorarioSerializer
     permission_classes = [IsAdminOrReadOnly]
 
+    @sincronizavel
+    @etag_lista
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        vagas_min = self.request.query_params.get('vagas_min', None)
+
+        # Filtra pela capacidade restante (índice em data, vagas)
+        if vagas_min:
+            try:
+                queryset = queryset.filter(vagas__gte=int(vagas_min))
+            except ValueError:
+                raise DRFValidationError({'vagas_min': 'Informe um número inteiro.'})
+
+        return queryset
 
-class DadosPagamentoViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['post'])
+    def gerar(self, request):
+        """
+        Gera em lote os horários de um período a partir das jornadas
+        Dados esperados no body:
+        - data_inicio, data_fim: período (AAAA-MM-DD, inclusive)
+        - intervalo: minutos entre horários (opcional, padrão 15)
+        - funcionarios: IDs cujas jornadas serão usadas (opcional, todos)
+        """
+        serializer = GeracaoHorariosSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        dados = serializer.validated_data
+        funcionarios = dados.get('funcionarios')
+
+        resumo = gerar_horarios(
+            dados['data_inicio'],
+            dados['data_fim'],
+            intervalo=dados['intervalo'],
+            funcionario_ids=[f.pk for f in funcionarios] if funcionarios else None,
+        )
+        return Response(resumo, status=status.HTTP_201_CREATED)
+
+
+class DadosPagamentoViewSet(CamposViewMixin, viewsets.ModelViewSet):
     queryset = DadosPagamento.objects.all()
     serializer_class = DadosPagamentoSerializer
     permission_classes = [permissions.IsAuthenticated]
 
 
-class PagamentoViewSet(viewsets.ModelViewSet):
+class PagamentoViewSet(CamposViewMixin, ExpansaoViewMixin, viewsets.ModelViewSet):
     queryset = Pagamento.objects.all()
     serializer_class = PagamentoSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser],
+            content_negotiation_class=SemNegociacao)
+    def export(self, request):
+        """
+        Exporta os pagamentos em fluxo
+        Parâmetros opcionais na query: formato (csv ou ndjson), data_inicio,
+        data_fim (AAAA-MM-DD) e status
+        """
+        return _exportar(
+            request, self.get_queryset(), COLUNAS_PAGAMENTO,
+            ['PENDENTE', 'CONFIRMADO', 'CANCELADO'], 'pagamentos'
+        )
+
 
-class AgendamentoViewSet(viewsets.ModelViewSet):
+class AgendamentoViewSet(LeituraRapidaMixin, CamposViewMixin, ExpansaoViewMixin, viewsets.ModelViewSet):
     queryset = Agendamento.objects.all()
+    # Paginação por cursor sobre (data, id)
+    ordering = ('data', 'id')
     serializer_class = AgendamentoSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    @sincronizavel
+    @etag_lista
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         try:
@@ -104,16 +276,84 @@ class AgendamentoViewSet(viewsets.ModelViewSet):
             )
 
     def get_queryset(self):
-        queryset = super().get_queryset()
+        return super().get_queryset().filter(**self.filtros())
+
+    def filtros(self):
+        """Filtros da query, que valem também para os registros de exclusão"""
+        filtros = {}
         cliente_id = self.request.query_params.get('cliente', None)
         data = self.request.query_params.get('data', None)
-        
+
         if cliente_id:
-            queryset = queryset.filter(cliente_id=cliente_id)
+            filtros['cliente_id'] = cliente_id
         if data:
-            queryset = queryset.filter(data__date=data)
-        
-        return queryset
+            filtros['data__date'] = data
+
+        return filtros
+
+    def filtrar_exclusoes(self, exclusoes):
+        return exclusoes.filter(**self.filtros())
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser],
+            content_negotiation_class=SemNegociacao)
+    def export(self, request):
+        """
+        Exporta os agendamentos em fluxo, com nomes do cliente, serviço e
+        profissional e o valor do serviço
+        Parâmetros opcionais na query: formato (csv ou ndjson), data_inicio,
+        data_fim (AAAA-MM-DD), status e cliente
+        """
+        return _exportar(
+            request, self.get_queryset(), COLUNAS_AGENDAMENTO,
+            [valor for valor, _ in Agendamento.STATUS_CHOICES], 'agendamentos'
+        )
+
+    @action(detail=False, methods=['post'])
+    def lote(self, request):
+        """
+        Cria vários agendamentos de uma vez
+        Dados esperados no body:
+        - agendamentos: lista de {cliente, servico, horario, funcionario}; o
+          cliente só é opcional quando quem pede é o próprio cliente
+        - modo: 'atomico' (padrão, tudo ou nada) ou 'parcial' (cria os válidos)
+        """
+        serializer = LoteAgendamentoSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        atomico = serializer.validated_data['modo'] == 'atomico'
+        itens = serializer.montar_agendamentos(request.user if isinstance(request.user, Cliente) else None)
+        agendamentos = [item for item in itens if isinstance(item, Agendamento)]
+
+        # No modo atômico, um item inválido já impede o lote inteiro
+        if agendamentos and not (atomico and len(agendamentos) < len(itens)):
+            try:
+                validacoes = iter(AgendamentoService.reservar_lote(agendamentos, atomico))
+            except ConflitoAgendamento as e:
+                return Response({'error': e.message_dict}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            validacoes = iter(())
+
+        resultados = []
+        for posicao, item in enumerate(itens):
+            erros = item if isinstance(item, dict) else next(validacoes, None)
+            if erros:
+                resultados.append({'indice': posicao, 'status': 'rejeitado', 'erros': erros})
+            elif item.pk:
+                resultados.append({
+                    'indice': posicao,
+                    'status': 'criado',
+                    'agendamento': AgendamentoSerializer(item).data,
+                })
+            else:
+                resultados.append({'indice': posicao, 'status': 'nao_criado'})
+
+        criados = sum(resultado['status'] == 'criado' for resultado in resultados)
+        if criados == len(resultados):
+            codigo = status.HTTP_201_CREATED
+        elif criados:
+            codigo = status.HTTP_207_MULTI_STATUS
+        else:
+            codigo = status.HTTP_400_BAD_REQUEST
+        return Response({'criados': criados, 'resultados': resultados}, status=codigo)
 
     @action(detail=True, methods=['post'])
     def cancelar(self, request, pk=None):
@@ -131,11 +371,44 @@ class AgendamentoViewSet(viewsets.ModelViewSet):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-class AgendamentoProcessoViewSet(viewsets.ModelViewSet):
+class RecorrenciaAgendamentoViewSet(CamposViewMixin, ExpansaoViewMixin, viewsets.ModelViewSet):
+    queryset = RecorrenciaAgendamento.objects.all()
+    serializer_class = RecorrenciaAgendamentoSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def create(self, request, *args, **kwargs):
+        """
+        Cria a série e já materializa as ocorrências do horizonte inicial;
+        as que conflitam com outros agendamentos são puladas e informadas
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recorrencia = serializer.save()
+        ocorrencias = materializar(recorrencia)
+
+        dados = dict(self.get_serializer(recorrencia).data)
+        dados['ocorrencias'] = [
+            {'data': data, 'status': 'criado'} if erros is None
+            else {'data': data, 'status': 'rejeitado', 'erros': erros}
+            for data, erros in ocorrencias
+        ]
+        return Response(dados, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post'])
+    def encerrar(self, request, pk=None):
+        recorrencia = self.get_object()
+        cancelados = encerrar(recorrencia)
+        return Response({'status': 'recorrência encerrada', 'agendamentos_cancelados': cancelados})
+
+
+class AgendamentoProcessoViewSet(CamposViewMixin, ExpansaoViewMixin, viewsets.ModelViewSet):
     queryset = Agendamento.objects.all()
+    # Paginação por cursor sobre (data, id)
+    ordering = ('data', 'id')
     serializer_class = AgendamentoSerializer
 
     @action(detail=False, methods=['get'])
+    @cache_resposta(SERVICOS, DISPONIBILIDADE, tempo=TEMPO_DISPONIBILIDADE)
     def buscar_horarios_disponiveis(self, request):
         """
         Busca horários disponíveis para um serviço específico
@@ -151,26 +424,60 @@ class AgendamentoProcessoViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Define período de busca (padrão: próximos 7 dias)
-        data_inicio = request.query_params.get('data_inicio', timezone.now())
-        if isinstance(data_inicio, str):
-            data_inicio = timezone.make_aware(datetime.fromisoformat(data_inicio))
-        data_fim = request.query_params.get(
-            'data_fim',
-            (timezone.now() + timedelta(days=7))
-        )
-        if isinstance(data_fim, str):
-            data_fim = timezone.make_aware(datetime.fromisoformat(data_fim))
+        try:
+            servico = Servico.objects.get(id=servico_id)
+        except Servico.DoesNotExist:
+            return Response(
+                {'error': 'Serviço não encontrado'},
+                status=status.HTTP_404_NOT_FOUND
+            )
 
-        horarios_disponiveis = Horario.objects.filter(
-            data__range=[data_inicio, data_fim],
-            disponivel=True
-        ).order_by('data')
+        # Define período de busca (padrão: próximos 7 dias)
+        data_inicio, data_fim = _periodo(request)
+        horarios_disponiveis = servico.buscar_horarios_disponiveis(data_inicio, data_fim)
 
         serializer = HorarioSerializer(horarios_disponiveis, many=True)
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
+    @cache_resposta(SERVICOS, FUNCIONARIOS, DISPONIBILIDADE, tempo=TEMPO_DISPONIBILIDADE)
+    def calendario(self, request):
+        """
+        Horários livres por dia de um mês
+        Parâmetros opcionais na query:
+        - mes: AAAA-MM (padrão: mês atual)
+        - servico_id: conta só os profissionais do serviço, com a duração dele
+        - por_profissional: 1 para incluir a contagem de cada profissional
+        """
+        mes = request.query_params.get('mes')
+        try:
+            referencia = datetime.strptime(mes, '%Y-%m') if mes else timezone.localdate()
+        except ValueError:
+            return Response(
+                {'error': 'Informe o mês no formato AAAA-MM'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        servico = None
+        servico_id = request.query_params.get('servico_id')
+        if servico_id:
+            try:
+                servico = Servico.objects.get(id=servico_id)
+            except (Servico.DoesNotExist, ValueError):
+                return Response(
+                    {'error': 'Serviço não encontrado'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+
+        por_profissional = request.query_params.get('por_profissional', '').lower() in ('1', 'true', 'sim')
+        dias = calendario_mes(referencia.year, referencia.month, servico, por_profissional)
+        if por_profissional:
+            for dia in dias:
+                dia['profissionais'] = {str(pk): livres for pk, livres in dia['profissionais'].items()}
+        return Response({'mes': f'{referencia.year:04d}-{referencia.month:02d}', 'dias': dias})
+
+    @action(detail=False, methods=['get'])
+    @cache_resposta(SERVICOS, FUNCIONARIOS, DISPONIBILIDADE, tempo=TEMPO_DISPONIBILIDADE)
     def buscar_profissionais_disponiveis(self, request):
         """
         Busca profissionais disponíveis para um horário e serviço específicos
@@ -191,14 +498,11 @@ class AgendamentoProcessoViewSet(viewsets.ModelViewSet):
             horario = Horario.objects.get(id=horario_id)
             servico = Servico.objects.get(id=servico_id)
 
-            # Busca funcionários que:
-            # 1. Não têm agendamento no horário
-            # 2. Trabalham no horário do agendamento
-            hora = horario.data.hour
-            funcionarios = Funcionario.objects.exclude(
-                agendamento__horario=horario,
-                agendamento__status__in=['AGENDADO', 'CONFIRMADO']
-            ).filter(servicos=servico)
+            # Busca funcionários qualificados que têm a duração do serviço
+            # livre a partir do horário, dentro da jornada de trabalho
+            livres = buscar_horarios_livres(servico, [horario])
+            funcionario_ids = livres[0][1] if livres else []
+            funcionarios = Funcionario.objects.filter(id__in=funcionario_ids)
 
             serializer = FuncionarioSerializer(funcionarios, many=True)
             return Response(serializer.data)
@@ -209,6 +513,58 @@ class AgendamentoProcessoViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
 
+    @action(detail=False, methods=['get'])
+    @cache_resposta(SERVICOS, FUNCIONARIOS, DISPONIBILIDADE, tempo=TEMPO_DISPONIBILIDADE)
+    def matriz_disponibilidade(self, request):
+        """
+        Grade profissionais × horários de um período para um serviço
+        Parâmetros esperados na query:
+        - servico_id: ID do serviço selecionado
+        - data_inicio, data_fim: período (opcional, padrão: próximas 24 horas; até 31 dias)
+        - codificacao: 'rle' (padrão, corridas de ocupados e livres) ou 'bits' (base64)
+        """
+        servico_id = request.query_params.get('servico_id')
+        if not servico_id:
+            return Response(
+                {'error': 'É necessário informar o serviço'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        codificacao = request.query_params.get('codificacao', 'rle')
+        if codificacao not in CODIFICACOES:
+            return Response(
+                {'error': f"Codificação deve ser uma das seguintes: {', '.join(CODIFICACOES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            servico = Servico.objects.get(id=servico_id)
+        except (Servico.DoesNotExist, ValueError):
+            return Response(
+                {'error': 'Serviço não encontrado'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        data_inicio, data_fim = _periodo(request, dias=1)
+        if not timedelta(0) < data_fim - data_inicio <= timedelta(days=31):
+            return Response(
+                {'error': 'O período deve ser positivo e de até 31 dias'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        horarios, linhas = matriz_disponibilidade(servico, data_inicio, data_fim)
+        codificar = CODIFICACOES[codificacao]
+        # Mesma representação de data do HorarioSerializer
+        representar = serializers.DateTimeField().to_representation
+        return Response({
+            'servico': servico.pk,
+            'codificacao': codificacao,
+            'horarios': [{'id': pk, 'data': representar(data)} for pk, data in horarios],
+            'profissionais': [
+                {'id': pk, 'nome': nome, 'livres': codificar(livres)}
+                for pk, nome, livres in linhas
+            ],
+        })
+
     @action(detail=False, methods=['post'])
     def criar_agendamento(self, request):
         """
@@ -227,68 +583,74 @@ class AgendamentoProcessoViewSet(viewsets.ModelViewSet):
             horario = Horario.objects.get(id=horario_id, disponivel=True)
             funcionario = Funcionario.objects.get(id=funcionario_id)
             servico = Servico.objects.get(id=servico_id)
-
-            # Verificar se funcionário já tem agendamento neste horário
-            agendamento_existente = Agendamento.objects.filter(
-                horario=horario,
-                funcionario=funcionario,
-                status__in=['AGENDADO', 'CONFIRMADO']
-            ).exists()
-
-            if agendamento_existente:
-                # Buscar horários alternativos
-                horarios_alternativos = Horario.objects.filter(
-                    data__gt=horario.data,
-                    data__lt=horario.data + timedelta(days=2),
-                    disponivel=True
-                ).order_by('data')[:3]
-
-                return Response({
-                    'error': 'Horário ou profissional indisponível',
-                    'horarios_alternativos': HorarioSerializer(horarios_alternativos, many=True).data
-                }, status=status.HTTP_400_BAD_REQUEST)
-
-            # Criar agendamento
-            agendamento = Agendamento.objects.create(
-                cliente=request.user,
-                servico=servico,
-                horario=horario,
-                funcionario=funcionario,
-                status='AGENDADO',
-                data=horario.data
+        except (Horario.DoesNotExist, Funcionario.DoesNotExist, Servico.DoesNotExist):
+            return Response(
+                {'error': 'Dados inválidos para agendamento'},
+                status=status.HTTP_400_BAD_REQUEST
             )
 
-            # Atualizar disponibilidade do horário
-            horario.disponivel = False
-            horario.save()
+        agendamento = Agendamento(
+            cliente=request.user,
+            servico=servico,
+            horario=horario,
+            funcionario=funcionario,
+            status='AGENDADO',
+            data=horario.data
+        )
 
-            # Adicionar pontos de fidelidade
-            if isinstance(request.user, Cliente):
-                request.user.fidelidade_pontos += 10
-                request.user.save()
+        # Validação em uma consulta; o save() reaproveita o resultado
+        erros = validar_agendamento(agendamento)
+        if erros:
+            return self._resposta_indisponivel(agendamento, erros)
 
-            # Enviar email de confirmação
-            try:
-                send_mail(
-                    'Confirmação de Agendamento',
-                    f'''Seu agendamento foi confirmado!
-                    Serviço: {servico.nome}
-                    Data: {horario.data}
-                    Profissional: {funcionario.nome}
-                    ''',
-                    settings.DEFAULT_FROM_EMAIL,
-                    [request.user.email],
-                    fail_silently=True,
-                )
-            except Exception as e:
-                # Log do erro de envio de email, mas não impede a criação do agendamento
-                print(f"Erro ao enviar email: {e}")
+        # Criar agendamento, tomar a vaga e enfileirar o e-mail de
+        # confirmação numa única transação; o envio fica para o comando
+        # processar_notificacoes
+        try:
+            AgendamentoService.reservar(agendamento, notificar=True)
+        except ConflitoAgendamento as e:
+            return self._resposta_indisponivel(agendamento, e.message_dict)
+
+        # Adicionar pontos de fidelidade
+        if isinstance(request.user, Cliente):
+            request.user.fidelidade_pontos += 10
+            request.user.save()
+
+        serializer = self.get_serializer(agendamento)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def _resposta_indisponivel(self, agendamento, erros):
+        # Sugerir alternativas para o serviço: o mesmo profissional em
+        # horários próximos, depois outros profissionais qualificados
+        sugestoes = sugerir_alternativas(
+            agendamento.servico, agendamento.horario, agendamento.funcionario_id
+        )
+        horarios_alternativos = list({s['horario'].pk: s['horario'] for s in sugestoes}.values())
+
+        return Response({
+            'error': 'Horário ou profissional indisponível',
+            'detalhes': erros,
+            'horarios_alternativos': HorarioSerializer(horarios_alternativos, many=True).data,
+            'sugestoes': [
+                {
+                    'horario': s['horario'].pk,
+                    'data': HorarioSerializer(s['horario']).data['data'],
+                    'funcionario': s['funcionario_id'],
+                    'funcionario_nome': s['funcionario_nome'],
+                    'distancia_minutos': s['distancia_minutos'],
+                }
+                for s in sugestoes
+            ],
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+
+class EstatisticasCacheView(APIView):
+    """Acertos e falhas do cache de respostas; DELETE zera os contadores."""
+    permission_classes = [permissions.IsAdminUser]
 
-            serializer = self.get_serializer(agendamento)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+    def get(self, request):
+        return Response(cache_respostas.estatisticas())
 
-        except (Horario.DoesNotExist, Funcionario.DoesNotExist, Servico.DoesNotExist):
-            return Response(
-                {'error': 'Dados inválidos para agendamento'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
\ No newline at end of file
+    def delete(self, request):
+        cache_respostas.zerar_estatisticas()
+        return Response(status=status.HTTP_204_NO_CONTENT)
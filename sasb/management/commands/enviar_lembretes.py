@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from sasb.services.lembretes import ANTECEDENCIAS_PADRAO, agendar_lembretes
+from sasb.services.notifications import TAMANHO_LOTE, processar_pendentes
+
+
+class Command(BaseCommand):
+    help = 'Enfileira os lembretes de agendamento devidos e envia a caixa de saída (para rodar no cron).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--antecedencias', type=int, nargs='+', default=list(ANTECEDENCIAS_PADRAO),
+            help=f'Antecedências em horas (padrão: {" ".join(map(str, ANTECEDENCIAS_PADRAO))})',
+        )
+        parser.add_argument(
+            '--lote', type=int, default=TAMANHO_LOTE,
+            help=f'E-mails por lote de envio (padrão: {TAMANHO_LOTE})',
+        )
+        parser.add_argument(
+            '--sem-envio', action='store_true',
+            help='Só enfileira; o envio fica com processar_notificacoes',
+        )
+
+    def handle(self, *args, **options):
+        if min(options['antecedencias']) <= 0:
+            raise CommandError('As antecedências devem ser maiores que zero.')
+        if options['lote'] <= 0:
+            raise CommandError('O lote deve ser maior que zero.')
+
+        enfileirados = agendar_lembretes(options['antecedencias'])
+        resumo = ', '.join(f'{quantidade} de {horas}h' for horas, quantidade in enfileirados.items())
+        self.stdout.write(self.style.SUCCESS(f'Lembretes enfileirados: {resumo}'))
+
+        if not options['sem_envio']:
+            enviadas, reagendadas, descartadas = processar_pendentes(options['lote'])
+            self.stdout.write(self.style.SUCCESS(
+                f'{enviadas} enviadas, {reagendadas} reagendadas, {descartadas} com falha definitiva'
+            ))
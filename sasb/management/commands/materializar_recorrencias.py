@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from sasb.services.recorrencia import HORIZONTE_PADRAO, materializar_pendentes
+
+
+class Command(BaseCommand):
+    help = 'Estende as séries de agendamentos recorrentes até o horizonte móvel.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--semanas', type=int, default=HORIZONTE_PADRAO.days // 7,
+            help=f'Tamanho do horizonte em semanas (padrão: {HORIZONTE_PADRAO.days // 7})',
+        )
+
+    def handle(self, *args, **options):
+        if options['semanas'] <= 0:
+            raise CommandError('O horizonte deve ser maior que zero.')
+
+        series, criados = materializar_pendentes(timedelta(weeks=options['semanas']))
+        self.stdout.write(self.style.SUCCESS(
+            f'{series} séries estendidas, {criados} agendamentos criados'
+        ))
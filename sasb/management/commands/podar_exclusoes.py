@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from sasb.api.sincronizacao import RETENCAO, podar_exclusoes
+
+
+class Command(BaseCommand):
+    help = (
+        f'Apaga os registros de exclusão com mais de {RETENCAO.days} dias; '
+        'tokens de sincronização mais antigos que isso recebem 410.'
+    )
+
+    def handle(self, *args, **options):
+        apagados = podar_exclusoes()
+        self.stdout.write(self.style.SUCCESS(f'{apagados} registros de exclusão apagados'))
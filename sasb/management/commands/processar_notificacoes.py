@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from sasb.services.notifications import TAMANHO_LOTE, processar_pendentes
+
+
+class Command(BaseCommand):
+    help = 'Envia os e-mails pendentes da caixa de saída, em lotes por uma única conexão.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote', type=int, default=TAMANHO_LOTE,
+            help=f'Notificações por lote (padrão: {TAMANHO_LOTE})',
+        )
+        parser.add_argument(
+            '--continuo', action='store_true',
+            help='Continua rodando, esvaziando a fila a cada intervalo',
+        )
+        parser.add_argument(
+            '--intervalo', type=float, default=5,
+            help='Segundos entre as passadas no modo contínuo (padrão: 5)',
+        )
+
+    def handle(self, *args, **options):
+        if options['lote'] <= 0:
+            raise CommandError('O lote deve ser maior que zero.')
+
+        while True:
+            enviadas, reagendadas, descartadas = processar_pendentes(options['lote'])
+            if enviadas or reagendadas or descartadas or not options['continuo']:
+                self.stdout.write(self.style.SUCCESS(
+                    f'{enviadas} enviadas, {reagendadas} reagendadas, {descartadas} com falha definitiva'
+                ))
+            if not options['continuo']:
+                return
+            time.sleep(options['intervalo'])
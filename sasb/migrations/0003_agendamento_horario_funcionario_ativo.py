@@ -0,0 +1,17 @@
+# Generated by Django 4.2.3 on 2026-10-18 02:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sasb', '0002_funcionario_servicos'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='agendamento',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['AGENDADO', 'CONFIRMADO'])), fields=('horario', 'funcionario'), name='agendamento_horario_funcionario_ativo'),
+        ),
+    ]
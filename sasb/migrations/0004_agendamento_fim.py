@@ -0,0 +1,42 @@
+# Generated by Django 4.2.3 on 2026-10-18 02:29
+
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def preencher_fim(apps, schema_editor):
+    Agendamento = apps.get_model('sasb', 'Agendamento')
+    agendamentos = Agendamento.objects.filter(fim__isnull=True).select_related('horario', 'servico')
+    lote = []
+    for agendamento in agendamentos.iterator(chunk_size=1000):
+        agendamento.fim = agendamento.horario.data + timedelta(minutes=agendamento.servico.duracao)
+        lote.append(agendamento)
+        if len(lote) == 1000:
+            Agendamento.objects.bulk_update(lote, ['fim'])
+            lote = []
+    Agendamento.objects.bulk_update(lote, ['fim'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sasb', '0003_agendamento_horario_funcionario_ativo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agendamento',
+            name='fim',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Término previsto do atendimento', null=True),
+        ),
+        migrations.RunPython(preencher_fim, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='agendamento',
+            index=models.Index(fields=['funcionario', 'fim'], name='agendamento_func_fim_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='agendamento',
+            index=models.Index(fields=['cliente', 'fim'], name='agendamento_cliente_fim_idx'),
+        ),
+    ]
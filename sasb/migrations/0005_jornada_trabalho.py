@@ -0,0 +1,49 @@
+# Generated by Django 4.2.3 on 2026-10-18 02:33
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sasb', '0004_agendamento_fim'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JornadaTrabalho',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia_semana', models.PositiveSmallIntegerField(choices=[(0, 'Segunda-feira'), (1, 'Terça-feira'), (2, 'Quarta-feira'), (3, 'Quinta-feira'), (4, 'Sexta-feira'), (5, 'Sábado'), (6, 'Domingo')])),
+                ('inicio', models.TimeField()),
+                ('fim', models.TimeField(help_text='00:00 indica o fim do dia')),
+                ('funcionario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='jornadas', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Jornada de Trabalho',
+                'verbose_name_plural': 'Jornadas de Trabalho',
+                'db_table': 'jornada_trabalho',
+                'ordering': ['funcionario', 'dia_semana', 'inicio'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ExcecaoJornada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data_inicio', models.DateField()),
+                ('data_fim', models.DateField()),
+                ('inicio', models.TimeField(blank=True, null=True)),
+                ('fim', models.TimeField(blank=True, null=True)),
+                ('motivo', models.CharField(blank=True, max_length=255)),
+                ('funcionario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='excecoes_jornada', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Exceção de Jornada',
+                'verbose_name_plural': 'Exceções de Jornada',
+                'db_table': 'excecao_jornada',
+                'ordering': ['funcionario', 'data_inicio'],
+            },
+        ),
+    ]
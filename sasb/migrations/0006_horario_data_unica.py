@@ -0,0 +1,54 @@
+# Generated by Django 4.2.3 on 2026-10-18 02:35
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+STATUS_ATIVOS = ('AGENDADO', 'CONFIRMADO')
+
+
+def unificar_horarios_duplicados(apps, schema_editor):
+    """
+    Mantém o horário de menor id para cada data e move os agendamentos dos
+    demais para ele. Agendamentos ativos do mesmo funcionário nos horários
+    repetidos não podem coexistir no horário mantido (restrição
+    ``agendamento_horario_funcionario_ativo``): fica o mais antigo e os
+    outros são cancelados. O horário mantido fica aberto se algum dos
+    repetidos estava; as vagas são calculadas depois, na 0007, a partir dos
+    agendamentos que continuam ativos.
+    """
+    Horario = apps.get_model('sasb', 'Horario')
+    Agendamento = apps.get_model('sasb', 'Agendamento')
+    duplicados = Horario.objects.values('data').annotate(total=Count('id'), manter=Min('id')).filter(total__gt=1)
+    for linha in duplicados:
+        todos = Horario.objects.filter(data=linha['data'])
+        funcionarios, conflitantes = set(), []
+        for agendamento_id, funcionario_id in Agendamento.objects.filter(
+            horario__in=todos, status__in=STATUS_ATIVOS
+        ).order_by('id').values_list('id', 'funcionario_id'):
+            if funcionario_id in funcionarios:
+                conflitantes.append(agendamento_id)
+            funcionarios.add(funcionario_id)
+        Agendamento.objects.filter(id__in=conflitantes).update(status='CANCELADO')
+
+        if todos.filter(disponivel=True).exists():
+            Horario.objects.filter(id=linha['manter']).update(disponivel=True)
+        repetidos = todos.exclude(id=linha['manter'])
+        Agendamento.objects.filter(horario__in=repetidos).update(horario_id=linha['manter'])
+        repetidos.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sasb', '0005_jornada_trabalho'),
+    ]
+
+    operations = [
+        migrations.RunPython(unificar_horarios_duplicados, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='horario',
+            name='data',
+            field=models.DateTimeField(unique=True),
+        ),
+    ]
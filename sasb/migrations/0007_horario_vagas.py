@@ -0,0 +1,52 @@
+# Generated by Django 4.2.3 on 2026-10-18 03:10
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def calcular_vagas(apps, schema_editor):
+    """
+    Vagas = profissionais cadastrados menos os agendamentos ativos de cada
+    horário. Antes, uma reserva fechava o horário (disponivel=False) e o
+    cancelamento o reabria; agora só as vagas controlam a ocupação, então os
+    horários fechados com reserva ativa são reabertos. Os fechados sem
+    reserva foram fechados à mão e continuam assim.
+    """
+    Horario = apps.get_model('sasb', 'Horario')
+    Funcionario = apps.get_model('sasb', 'Funcionario')
+    capacidade = Funcionario.objects.count()
+    Horario.objects.update(vagas=capacidade)
+    ocupados = Horario.objects.annotate(
+        ativos=Count('agendamento', filter=Q(agendamento__status__in=['AGENDADO', 'CONFIRMADO']))
+    ).filter(ativos__gt=0).values_list('id', 'ativos')
+    for horario_id, ativos in ocupados:
+        Horario.objects.filter(id=horario_id).update(vagas=max(capacidade - ativos, 0), disponivel=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sasb', '0006_horario_data_unica'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='horario',
+            name='disponivel',
+            field=models.BooleanField(default=True, help_text='Aberto para novos agendamentos'),
+        ),
+        migrations.AddField(
+            model_name='horario',
+            name='vagas',
+            field=models.PositiveSmallIntegerField(
+                blank=True, default=0,
+                help_text='Atendimentos ainda livres no horário (padrão: número de profissionais)'
+            ),
+            preserve_default=False,
+        ),
+        migrations.RunPython(calcular_vagas, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='horario',
+            index=models.Index(fields=['data', 'vagas'], name='horario_data_vagas_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.3 on 2026-10-18 02:46
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sasb', '0007_horario_vagas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecorrenciaAgendamento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('frequencia', models.CharField(choices=[('SEMANAL', 'Semanal'), ('MENSAL', 'Mensal, no mesmo dia da semana')], default='SEMANAL', max_length=10)),
+                ('intervalo', models.PositiveSmallIntegerField(default=1, help_text='A cada N semanas ou meses')),
+                ('inicio', models.DateTimeField(help_text='Primeira ocorrência')),
+                ('data_fim', models.DateField(blank=True, help_text='Última data da série (vazio: sem fim)', null=True)),
+                ('ativa', models.BooleanField(default=True)),
+                ('materializado_ate', models.DateTimeField(blank=True, editable=False, null=True)),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recorrencias', to='sasb.cliente')),
+                ('funcionario', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='recorrencias', to=settings.AUTH_USER_MODEL)),
+                ('servico', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='sasb.servico')),
+            ],
+            options={
+                'verbose_name': 'Recorrência de Agendamento',
+                'verbose_name_plural': 'Recorrências de Agendamento',
+                'db_table': 'recorrencia_agendamento',
+            },
+        ),
+        migrations.AddField(
+            model_name='agendamento',
+            name='recorrencia',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='agendamentos', to='sasb.recorrenciaagendamento'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.3 on 2026-10-18 02:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sasb', '0008_recorrencia_agendamento'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='agendamento',
+            index=models.Index(fields=['data', 'id'], name='agendamento_data_id_idx'),
+        ),
+    ]
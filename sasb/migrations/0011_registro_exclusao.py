@@ -0,0 +1,28 @@
+# Generated by Django 4.2.3 on 2026-10-18 03:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sasb', '0010_atualizado_em'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistroExclusao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(choices=[('horario', 'Horário'), ('agendamento', 'Agendamento')], max_length=20)),
+                ('objeto_id', models.PositiveBigIntegerField()),
+                ('excluido_em', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Registro de exclusão',
+                'verbose_name_plural': 'Registros de exclusão',
+                'db_table': 'registro_exclusao',
+                'indexes': [models.Index(fields=['modelo', 'excluido_em'], name='registro_exclusao_modelo_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.3 on 2026-10-18 03:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sasb', '0011_registro_exclusao'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pagamento',
+            index=models.Index(fields=['data', 'id'], name='pagamento_data_id_idx'),
+        ),
+    ]
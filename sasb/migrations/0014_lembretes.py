@@ -0,0 +1,22 @@
+# Generated by Django 4.2.3 on 2026-10-18 03:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sasb', '0013_notificacao'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificacao',
+            name='chave',
+            field=models.CharField(blank=True, help_text='Identifica avisos que não podem se repetir, como os lembretes', max_length=100, null=True, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='agendamento',
+            index=models.Index(fields=['status', 'data'], name='agendamento_status_data_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.3 on 2026-10-18 03:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sasb', '0014_lembretes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='registroexclusao',
+            name='cliente_id',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='registroexclusao',
+            name='data',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.3 on 2026-10-18 04:01
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sasb', '0016_notificacao_cancelada'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='funcionario',
+            name='versao_jornada',
+            field=models.UUIDField(default=uuid.uuid4, editable=False),
+        ),
+    ]
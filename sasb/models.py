@@ -1,8 +1,12 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.contrib.auth.models import AbstractUser
 from django.core.exceptions import ValidationError
-from datetime import datetime
+from datetime import datetime, timedelta
+import uuid
 from django.utils import timezone
+from .services.disponibilidade import STATUS_ATIVOS, indice_ativo, obter_indice
+from .services.validacao import validar_agendamento
 
 
 class UsuarioSASB(AbstractUser):
@@ -73,6 +77,9 @@ class Funcionario(UsuarioSASB):
     cargo = models.CharField(max_length=100)
     horario_trabalho = models.CharField(max_length=255)
     servicos = models.ManyToManyField('Servico', related_name='funcionarios')
+    # Trocada a cada alteração de JornadaTrabalho/ExcecaoJornada; entra na
+    # chave do cache da jornada compilada
+    versao_jornada = models.UUIDField(default=uuid.uuid4, editable=False)
 
     groups = models.ManyToManyField(
         'auth.Group',
@@ -94,14 +101,86 @@ class Funcionario(UsuarioSASB):
         verbose_name = 'Funcionario'
         verbose_name_plural = 'Funcionarios'
 
+    def jornada(self):
+        from .services.jornada import obter_jornada
+        return obter_jornada(self.pk, (self.horario_trabalho, self.versao_jornada))
+
+
+class JornadaTrabalho(models.Model):
+    """
+    Faixa de trabalho de um funcionário em um dia da semana. Pausas (almoço,
+    intervalos) são o espaço entre duas faixas do mesmo dia.
+    """
+    DIAS_SEMANA = [
+        (0, 'Segunda-feira'),
+        (1, 'Terça-feira'),
+        (2, 'Quarta-feira'),
+        (3, 'Quinta-feira'),
+        (4, 'Sexta-feira'),
+        (5, 'Sábado'),
+        (6, 'Domingo'),
+    ]
+
+    funcionario = models.ForeignKey('Funcionario', on_delete=models.CASCADE, related_name='jornadas')
+    dia_semana = models.PositiveSmallIntegerField(choices=DIAS_SEMANA)
+    inicio = models.TimeField()
+    fim = models.TimeField(help_text='00:00 indica o fim do dia')
+
+    class Meta:
+        db_table = 'jornada_trabalho'
+        verbose_name = 'Jornada de Trabalho'
+        verbose_name_plural = 'Jornadas de Trabalho'
+        ordering = ['funcionario', 'dia_semana', 'inicio']
+
+    def clean(self):
+        if self.fim != datetime.min.time() and self.fim <= self.inicio:
+            raise ValidationError({'fim': 'O fim da faixa deve ser posterior ao início.'})
+
+
+class ExcecaoJornada(models.Model):
+    """
+    Substitui a jornada semanal entre ``data_inicio`` e ``data_fim``: sem
+    ``inicio``/``fim`` o funcionário não trabalha (feriado, férias); com
+    eles, trabalha apenas nessa faixa.
+    """
+    funcionario = models.ForeignKey('Funcionario', on_delete=models.CASCADE, related_name='excecoes_jornada')
+    data_inicio = models.DateField()
+    data_fim = models.DateField()
+    inicio = models.TimeField(null=True, blank=True)
+    fim = models.TimeField(null=True, blank=True)
+    motivo = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        db_table = 'excecao_jornada'
+        verbose_name = 'Exceção de Jornada'
+        verbose_name_plural = 'Exceções de Jornada'
+        ordering = ['funcionario', 'data_inicio']
+
+    def clean(self):
+        if self.data_fim < self.data_inicio:
+            raise ValidationError({'data_fim': 'A data final deve ser igual ou posterior à inicial.'})
+        if (self.inicio is None) != (self.fim is None):
+            raise ValidationError({'fim': 'Informe início e fim, ou nenhum dos dois para folga.'})
+
 
 class Servico(models.Model):
     nome = models.CharField(max_length=255)
     duracao = models.IntegerField(help_text='Duração em minutos')
     valor = models.DecimalField(max_digits=10, decimal_places=2)
-
-    def buscar_horarios_disponiveis(self):
-        return Horario.objects.filter(disponivel=True)
+    atualizado_em = models.DateTimeField(auto_now=True, db_index=True)
+
+    def buscar_horarios_disponiveis(self, data_inicio=None, data_fim=None):
+        """
+        Horários do período (padrão: próximos 7 dias) em que algum
+        profissional qualificado tem ``duracao`` minutos livres seguidos.
+        """
+        from .services.busca import buscar_horarios_livres
+        data_inicio = data_inicio or timezone.now()
+        data_fim = data_fim or data_inicio + timedelta(days=7)
+        horarios = Horario.objects.filter(
+            data__range=[data_inicio, data_fim], disponivel=True, vagas__gt=0
+        )
+        return [horario for horario, _ in buscar_horarios_livres(self, horarios)]
 
     class Meta:
         db_table = 'servico'
@@ -110,34 +189,40 @@ class Servico(models.Model):
 
 
 class Horario(models.Model):
-    data = models.DateTimeField()
-    disponivel = models.BooleanField(default=True)
+    data = models.DateTimeField(unique=True)
+    disponivel = models.BooleanField(default=True, help_text='Aberto para novos agendamentos')
+    vagas = models.PositiveSmallIntegerField(
+        blank=True,
+        help_text='Atendimentos ainda livres no horário (padrão: número de profissionais)'
+    )
+    atualizado_em = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         db_table = 'horario'
         verbose_name = 'Horário'
         verbose_name_plural = 'Horários'
+        indexes = [
+            models.Index(fields=['data', 'vagas'], name='horario_data_vagas_idx'),
+        ]
+
+    @staticmethod
+    def capacidade_padrao():
+        return Funcionario.objects.count()
+
+    def save(self, *args, **kwargs):
+        if self.vagas is None:
+            self.vagas = self.capacidade_padrao()
+        super().save(*args, **kwargs)
 
     def esta_disponivel_para_funcionario(self, funcionario):
-        return not Agendamento.objects.filter(
-            horario=self,
-            funcionario=funcionario,
-            status__in=['AGENDADO', 'CONFIRMADO']
-        ).exists()
+        return obter_indice().funcionario_livre(funcionario.pk, self.data)
 
     def esta_disponivel_para_cliente(self, cliente):
-        return not Agendamento.objects.filter(
-            horario=self,
-            cliente=cliente,
-            status__in=['AGENDADO', 'CONFIRMADO']
-        ).exists()
+        return obter_indice().cliente_livre(cliente.pk, self.data)
 
     def buscar_profissionais_disponiveis(self):
         from .models import Funcionario
-        funcionarios_ocupados = Agendamento.objects.filter(
-            horario=self,
-            status__in=['AGENDADO', 'CONFIRMADO']
-        ).values_list('funcionario_id', flat=True)
+        funcionarios_ocupados = obter_indice().funcionarios_ocupados(self.data)
         return Funcionario.objects.exclude(id__in=funcionarios_ocupados)
 
 
@@ -172,6 +257,42 @@ class Pagamento(models.Model):
         db_table = 'pagamento'
         verbose_name = 'Pagamento'
         verbose_name_plural = 'Pagamentos'
+        indexes = [
+            models.Index(fields=['data', 'id'], name='pagamento_data_id_idx'),
+        ]
+
+
+class RecorrenciaAgendamento(models.Model):
+    """
+    Série de agendamentos de um cliente fixo. Os agendamentos da série são
+    criados aos poucos, até um horizonte móvel (ver ``services.recorrencia``),
+    e ``materializado_ate`` marca até onde a série já foi gerada.
+    """
+    FREQUENCIAS = [
+        ('SEMANAL', 'Semanal'),
+        ('MENSAL', 'Mensal, no mesmo dia da semana'),
+    ]
+
+    cliente = models.ForeignKey('Cliente', on_delete=models.CASCADE, related_name='recorrencias')
+    funcionario = models.ForeignKey('Funcionario', on_delete=models.PROTECT, related_name='recorrencias')
+    servico = models.ForeignKey('Servico', on_delete=models.PROTECT)
+    frequencia = models.CharField(max_length=10, choices=FREQUENCIAS, default='SEMANAL')
+    intervalo = models.PositiveSmallIntegerField(default=1, help_text='A cada N semanas ou meses')
+    inicio = models.DateTimeField(help_text='Primeira ocorrência')
+    data_fim = models.DateField(null=True, blank=True, help_text='Última data da série (vazio: sem fim)')
+    ativa = models.BooleanField(default=True)
+    materializado_ate = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        db_table = 'recorrencia_agendamento'
+        verbose_name = 'Recorrência de Agendamento'
+        verbose_name_plural = 'Recorrências de Agendamento'
+
+    def clean(self):
+        if self.intervalo < 1:
+            raise ValidationError({'intervalo': 'O intervalo deve ser de pelo menos 1.'})
+        if self.data_fim and self.inicio and self.data_fim < timezone.localtime(self.inicio).date():
+            raise ValidationError({'data_fim': 'A data final deve ser igual ou posterior ao início.'})
 
 
 class Agendamento(models.Model):
@@ -189,72 +310,99 @@ class Agendamento(models.Model):
     horario = models.ForeignKey('Horario', on_delete=models.PROTECT)
     funcionario = models.ForeignKey('Funcionario', on_delete=models.PROTECT)
     pagamento = models.OneToOneField('Pagamento', on_delete=models.SET_NULL, null=True, blank=True)
+    fim = models.DateTimeField(null=True, blank=True, editable=False, help_text='Término previsto do atendimento')
+    recorrencia = models.ForeignKey(
+        'RecorrenciaAgendamento', on_delete=models.SET_NULL, null=True, blank=True, related_name='agendamentos'
+    )
+    atualizado_em = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         db_table = 'agendamento'
         verbose_name = 'Agendamento'
         verbose_name_plural = 'Agendamentos'
+        constraints = [
+            # Um funcionário só pode ter uma reserva ativa por horário
+            models.UniqueConstraint(
+                fields=['horario', 'funcionario'],
+                condition=models.Q(status__in=['AGENDADO', 'CONFIRMADO']),
+                name='agendamento_horario_funcionario_ativo',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['funcionario', 'fim'], name='agendamento_func_fim_idx'),
+            models.Index(fields=['cliente', 'fim'], name='agendamento_cliente_fim_idx'),
+            models.Index(fields=['data', 'id'], name='agendamento_data_id_idx'),
+            models.Index(fields=['status', 'data'], name='agendamento_status_data_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        agendamento = super().from_db(db, field_names, values)
+        if 'status' in field_names and 'horario_id' in field_names:
+            agendamento._status_salvo = agendamento.status
+            agendamento._horario_salvo = agendamento.horario_id
+        if {'horario_id', 'servico_id', 'fim'} <= set(field_names):
+            agendamento._origem_fim = (agendamento.horario_id, agendamento.servico_id)
+        return agendamento
+
+    def _estado_anterior(self):
+        """``(status, horario_id)`` gravados no banco; ``(None, None)`` se novo."""
+        if not self.pk:
+            return None, None
+        if '_status_salvo' not in self.__dict__ or '_horario_salvo' not in self.__dict__:
+            self._status_salvo, self._horario_salvo = (
+                Agendamento.objects.filter(pk=self.pk).values_list('status', 'horario_id').first()
+                or (None, None)
+            )
+        return self._status_salvo, self._horario_salvo
 
     def clean(self):
         if not self.pk:  # Apenas para novos agendamentos
-            # Verificar se o horário já está ocupado para este funcionário
-            conflito_funcionario = Agendamento.objects.filter(
-                horario=self.horario,
-                funcionario=self.funcionario,
-                status__in=['AGENDADO', 'CONFIRMADO']
-            ).exists()
-
-            if conflito_funcionario:
-                raise ValidationError({
-                    'horario': 'Este horário já está ocupado para o funcionário selecionado.'
-                })
-
-            # Verificar se o horário está disponível
-            if not self.horario.disponivel:
-                raise ValidationError({
-                    'horario': 'Este horário não está mais disponível.'
-                })
-
-            # Verificar se o cliente já tem agendamento no mesmo horário
-            conflito_cliente = Agendamento.objects.filter(
-                horario=self.horario,
-                cliente=self.cliente,
-                status__in=['AGENDADO', 'CONFIRMADO']
-            ).exists()
-
-            if conflito_cliente:
-                raise ValidationError({
-                    'horario': 'Você já possui um agendamento neste horário.'
-                })
-
-            # Verificar se a data do agendamento é futura
-            if self.horario.data <= timezone.now():
-                raise ValidationError({
-                    'horario': 'Não é possível fazer agendamentos em datas passadas.'
-                })
-
-            # Verificar se o horário está dentro do horário de trabalho do funcionário
-            hora = self.horario.data.hour
-            horario_trabalho = self.funcionario.horario_trabalho.split('-')
-            hora_inicio = int(horario_trabalho[0].split(':')[0])
-            hora_fim = int(horario_trabalho[1].split(':')[0])
-
-            if hora < hora_inicio or hora >= hora_fim:
-                raise ValidationError({
-                    'horario': 'Este horário está fora do período de trabalho do funcionário.'
-                })
+            erros = validar_agendamento(self)
+            if erros:
+                raise ValidationError(erros)
 
     def save(self, *args, **kwargs):
         self.clean()
-        super().save(*args, **kwargs)
-        
-        # Atualizar disponibilidade do horário
-        if self.status in ['AGENDADO', 'CONFIRMADO']:
-            self.horario.disponivel = False
-            self.horario.save()
-        elif self.status == 'CANCELADO':
-            self.horario.disponivel = True
-            self.horario.save()
+        # O término acompanha o horário e o serviço, também quando mudam
+        origem = (self.horario_id, self.servico_id)
+        if not self.pk or self.fim is None or self.__dict__.get('_origem_fim') != origem:
+            self.fim = self.horario.data + timedelta(minutes=self.servico.duracao)
+
+        # A vaga do horário só muda quando o agendamento entra ou sai dos
+        # status ativos, ou troca de horário estando ativo, e sempre com
+        # UPDATE atômico sobre o contador
+        status_antes, horario_antes = self._estado_anterior()
+        ativo_antes = status_antes in STATUS_ATIVOS
+        ativo = self.status in STATUS_ATIVOS
+        trocou = ativo_antes and ativo and horario_antes != self.horario_id
+        with transaction.atomic():
+            if ativo and (not ativo_antes or trocou):
+                tomada = Horario.objects.filter(
+                    pk=self.horario_id, disponivel=True, vagas__gt=0
+                ).update(vagas=F('vagas') - 1, atualizado_em=timezone.now())
+                if not tomada:
+                    from .services.agendamento import ConflitoAgendamento
+                    raise ConflitoAgendamento()
+            if ativo_antes and (not ativo or trocou):
+                Horario.objects.filter(pk=horario_antes).update(
+                    vagas=F('vagas') + 1, atualizado_em=timezone.now()
+                )
+            super().save(*args, **kwargs)
+        self._status_salvo = self.status
+        self._horario_salvo = self.horario_id
+        self._origem_fim = origem
+
+        # Manter o índice de disponibilidade do escopo atual em dia
+        indice = indice_ativo()
+        if indice is not None:
+            if self.status in STATUS_ATIVOS:
+                indice.registrar(
+                    self.pk, self.funcionario_id, self.cliente_id,
+                    self.horario.data, (self.fim - self.horario.data) // timedelta(minutes=1)
+                )
+            else:
+                indice.remover(self.pk)
 
     def confirmar_agendamento(self):
         if self.status == 'AGENDADO':
@@ -267,6 +415,65 @@ class Agendamento(models.Model):
         self.status = 'CANCELADO'
         self.save()
 
+
+class RegistroExclusao(models.Model):
+    """Marca (tombstone) de uma linha excluída, para a sincronização por ``?since=``."""
+    MODELO_CHOICES = [
+        ('horario', 'Horário'),
+        ('agendamento', 'Agendamento'),
+    ]
+
+    modelo = models.CharField(max_length=20, choices=MODELO_CHOICES)
+    objeto_id = models.PositiveBigIntegerField()
+    excluido_em = models.DateTimeField(auto_now_add=True)
+    # Cópia das colunas filtráveis da linha excluída, para que a
+    # sincronização aplique aos registros os mesmos filtros da listagem
+    cliente_id = models.PositiveBigIntegerField(null=True, blank=True)
+    data = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'registro_exclusao'
+        verbose_name = 'Registro de exclusão'
+        verbose_name_plural = 'Registros de exclusão'
+        indexes = [
+            models.Index(fields=['modelo', 'excluido_em'], name='registro_exclusao_modelo_idx'),
+        ]
+
+class Notificacao(models.Model):
+    """E-mail na caixa de saída, gravado na mesma transação que o originou e
+    enviado depois pelo comando ``processar_notificacoes``."""
+    STATUS_CHOICES = [
+        ('PENDENTE', 'Pendente'),
+        ('ENVIADA', 'Enviada'),
+        ('FALHOU', 'Falhou'),
+        ('CANCELADA', 'Cancelada'),
+    ]
+
+    destinatario = models.EmailField()
+    assunto = models.CharField(max_length=200)
+    mensagem = models.TextField()
+    agendamento = models.ForeignKey(
+        'Agendamento', on_delete=models.SET_NULL, null=True, blank=True, related_name='notificacoes'
+    )
+    chave = models.CharField(
+        max_length=100, unique=True, null=True, blank=True,
+        help_text='Identifica avisos que não podem se repetir, como os lembretes'
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDENTE')
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    proxima_tentativa = models.DateTimeField(default=timezone.now)
+    ultimo_erro = models.TextField(blank=True)
+    criada_em = models.DateTimeField(auto_now_add=True)
+    enviada_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'notificacao'
+        verbose_name = 'Notificação'
+        verbose_name_plural = 'Notificações'
+        indexes = [
+            models.Index(fields=['status', 'proxima_tentativa'], name='notificacao_fila_idx'),
+        ]
+
 # class Avaliacao(models.Model):
 #     agendamento = models.OneToOneField(Agendamento, on_delete=models.CASCADE)
 #     nota = models.IntegerField(choices=[(i, i) for i in range(1, 6)])
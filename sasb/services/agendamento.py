@@ -0,0 +1,222 @@
+import random
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.models import Case, F, Q, When
+from django.utils import timezone
+
+from ..models import Agendamento, Funcionario, Horario
+from .cache_respostas import DISPONIBILIDADE, invalidar
+from .disponibilidade import STATUS_ATIVOS, IndiceDisponibilidade, indice_ativo, usar_indice
+from .jornada import obter_jornadas
+from .notifications import NotificationService
+from .validacao import revalidar_agendamento
+
+RESTRICAO_RESERVA = 'agendamento_horario_funcionario_ativo'
+
+
+class ConflitoAgendamento(ValidationError):
+    """O horário foi tomado por outra reserva concorrente."""
+
+    def __init__(self, mensagem='Este horário não está mais disponível.'):
+        super().__init__({'horario': mensagem})
+
+
+class AgendamentoService:
+    TENTATIVAS = 5
+    ESPERA_INICIAL = 0.05  # segundos
+
+    @staticmethod
+    def reservar(agendamento=None, notificar=False, **dados):
+        """
+        Cria um agendamento de forma atômica, a partir de uma instância ainda
+        não salva ou dos campos. A validação é refeita dentro da transação,
+        sob as travas; a memorizada pelo serializer ou pela view não vale ali.
+
+        A vaga é tomada por ``Agendamento.save`` com um UPDATE condicional
+        sobre o contador (``WHERE vagas > 0``) como primeira escrita da
+        transação, de modo que a última vaga vai para uma só de duas reservas
+        concorrentes; onde o banco suporta, o horário e o funcionário são
+        travados com SELECT ... FOR UPDATE antes das validações. A restrição
+        única parcial em (horario, funcionario) cobre o que ainda escapar. No
+        SQLite, ``database is locked`` é repetido com espera exponencial.
+
+        Com ``notificar``, a confirmação para o cliente entra na caixa de
+        saída dentro da mesma transação.
+        """
+        if agendamento is None:
+            agendamento = Agendamento(**dados)
+        return AgendamentoService._repetir(AgendamentoService._reservar, agendamento, notificar)
+
+    @staticmethod
+    def reservar_lote(agendamentos, atomico=True):
+        """
+        Valida e cria vários agendamentos (instâncias ainda não salvas) de uma
+        vez, com um número constante de consultas: os conflitos com o banco
+        vêm de uma única carga do índice de disponibilidade, restrita aos
+        profissionais, clientes e intervalos do lote, e os conflitos entre os
+        próprios itens são detectados registrando cada item aceito no mesmo
+        índice. As vagas são tomadas num único UPDATE condicional e os
+        agendamentos inseridos com ``bulk_create``, tudo numa transação.
+
+        Devolve, na ordem recebida, ``None`` para cada item criado ou o seu
+        dicionário de erros. Com ``atomico``, qualquer erro impede a criação
+        de todo o lote; sem ele, os itens válidos são criados mesmo assim.
+        """
+        return AgendamentoService._repetir(AgendamentoService._reservar_lote, agendamentos, atomico)
+
+    @staticmethod
+    def _repetir(operacao, *args):
+        for tentativa in range(AgendamentoService.TENTATIVAS):
+            try:
+                return operacao(*args)
+            except OperationalError as e:
+                if (
+                    'database is locked' not in str(e)
+                    or connection.in_atomic_block
+                    or tentativa == AgendamentoService.TENTATIVAS - 1
+                ):
+                    raise
+                espera = AgendamentoService.ESPERA_INICIAL * 2 ** tentativa
+                time.sleep(espera + random.uniform(0, espera))
+
+    @staticmethod
+    def _reservar(agendamento, notificar=False):
+        horario_id = agendamento.horario_id
+        try:
+            with transaction.atomic():
+                if connection.features.has_select_for_update:
+                    list(Horario.objects.select_for_update().filter(pk=horario_id).values_list('pk'))
+                    list(Funcionario.objects.select_for_update().filter(
+                        pk=agendamento.funcionario_id
+                    ).values_list('pk'))
+
+                # A validação do serializer ou da view pode estar velha: outra
+                # reserva pode ter sido confirmada depois dela. O que falhar
+                # aqui é conflito, tratado como tal pelas views
+                erros = revalidar_agendamento(agendamento)
+                if erros:
+                    raise ConflitoAgendamento(erros['horario'])
+
+                # Toma a vaga (ou levanta ConflitoAgendamento) e insere
+                agendamento.save(force_insert=True)
+                if notificar:
+                    NotificationService.enviar_confirmacao_agendamento(agendamento)
+                return agendamento
+        except IntegrityError as e:
+            AgendamentoService._conflito_de_restricao(e, [agendamento])
+
+    @staticmethod
+    def _conflito_de_restricao(erro, agendamentos):
+        # Só a restrição de (horario, funcionario) indica conflito de reserva.
+        # O PostgreSQL cita o nome dela na mensagem; o SQLite só as colunas, e
+        # aí uma violação de unicidade é confirmada pelas reservas ativas dos
+        # pares envolvidos
+        mensagem = str(erro)
+        if RESTRICAO_RESERVA not in mensagem:
+            pares = Q()
+            for agendamento in agendamentos:
+                pares |= Q(horario_id=agendamento.horario_id, funcionario_id=agendamento.funcionario_id)
+            if (
+                'unique' not in mensagem.lower()
+                or connection.needs_rollback
+                or not Agendamento.objects.filter(pares, status__in=STATUS_ATIVOS).exists()
+            ):
+                raise erro
+        raise ConflitoAgendamento(
+            'Este horário já está ocupado para o funcionário selecionado.'
+        )
+
+    @staticmethod
+    def _reservar_lote(agendamentos, atomico):
+        # Itens do mesmo horário compartilham a instância, para que as vagas
+        # tomadas por um item valham para os seguintes
+        horarios = {}
+        for agendamento in agendamentos:
+            agendamento.horario = horarios.setdefault(agendamento.horario_id, agendamento.horario)
+        estados = {
+            a.funcionario_id: (a.funcionario.horario_trabalho, a.funcionario.versao_jornada) for a in agendamentos
+        }
+        obter_jornadas(estados, estados)
+
+        intervalos = [
+            (a.horario.data, a.horario.data + timedelta(minutes=max(a.servico.duracao, 1)))
+            for a in agendamentos
+        ]
+        vagas = {horario_id: horario.vagas for horario_id, horario in horarios.items()}
+        externo = indice_ativo()
+        aceitos = []
+        try:
+            with transaction.atomic(), usar_indice(IndiceDisponibilidade()) as indice:
+                travados = Horario.objects.filter(pk__in=horarios)
+                if connection.features.has_select_for_update:
+                    travados = travados.select_for_update()
+                # Vagas e abertura relidas sob a trava: a validação de cada item
+                # decide com elas, e a atualização condicional abaixo não falha
+                for horario_id, vagas_atuais, disponivel in travados.values_list('pk', 'vagas', 'disponivel'):
+                    horarios[horario_id].vagas = vagas[horario_id] = vagas_atuais
+                    horarios[horario_id].disponivel = disponivel
+
+                indice.carregar_restrito(
+                    intervalos,
+                    {a.funcionario_id for a in agendamentos},
+                    {a.cliente_id for a in agendamentos},
+                )
+                resultados = []
+                for posicao, agendamento in enumerate(agendamentos):
+                    erros = revalidar_agendamento(agendamento)
+                    if erros is None:
+                        # Id provisório negativo: conflita com os próximos itens
+                        indice.registrar(
+                            -1 - posicao, agendamento.funcionario_id, agendamento.cliente_id,
+                            agendamento.horario.data, agendamento.servico.duracao
+                        )
+                        agendamento.horario.vagas -= 1
+                    resultados.append(erros)
+
+                aceitos = [a for a, erros in zip(agendamentos, resultados) if erros is None]
+                if atomico and len(aceitos) < len(agendamentos):
+                    aceitos = []
+                if not aceitos:
+                    return resultados
+
+                demanda = Counter(a.horario_id for a in aceitos)
+                condicao = Q()
+                for horario_id, quantidade in demanda.items():
+                    condicao |= Q(pk=horario_id, vagas__gte=quantidade)
+                tomados = Horario.objects.filter(condicao, disponivel=True).update(
+                    vagas=Case(*(
+                        When(pk=horario_id, then=F('vagas') - quantidade)
+                        for horario_id, quantidade in demanda.items()
+                    )),
+                    atualizado_em=timezone.now(),
+                )
+                if tomados != len(demanda):
+                    raise ConflitoAgendamento()
+
+                for agendamento in aceitos:
+                    agendamento.fim = agendamento.horario.data + timedelta(minutes=agendamento.servico.duracao)
+                Agendamento.objects.bulk_create(aceitos)
+                # bulk_create não emite post_save
+                invalidar(DISPONIBILIDADE)
+                for agendamento in aceitos:
+                    agendamento._status_salvo = agendamento.status
+                    agendamento._horario_salvo = agendamento.horario_id
+        except IntegrityError as e:
+            AgendamentoService._conflito_de_restricao(e, aceitos)
+        finally:
+            # Nada gravado: desfaz as vagas tomadas em memória durante a validação
+            if not aceitos or aceitos[0].pk is None:
+                for horario_id, horario in horarios.items():
+                    horario.vagas = vagas[horario_id]
+
+        if externo is not None:
+            for agendamento in aceitos:
+                externo.registrar(
+                    agendamento.pk, agendamento.funcionario_id, agendamento.cliente_id,
+                    agendamento.horario.data, agendamento.servico.duracao
+                )
+        return resultados
@@ -0,0 +1,90 @@
+"""
+Busca de horários com tempo livre contíguo para a duração do serviço.
+
+Para cada profissional qualificado e cada dia, uma varredura (sweep-line)
+sobre as faixas da jornada e os intervalos ocupados (já ordenados no índice
+de disponibilidade, carregado com uma consulta para todo o período) produz as
+janelas livres; um segundo passo, com dois ponteiros, casa os inícios dos
+horários com as janelas em que ``duracao`` minutos cabem inteiros.
+"""
+from itertools import groupby
+
+from .disponibilidade import para_minutos, usar_indice
+from .jornada import obter_jornadas
+
+
+def janelas_livres(faixas, ocupados):
+    """
+    Janelas ``(inicio, fim)`` livres dentro das ``faixas`` (array plano da
+    jornada), descontando os intervalos ``ocupados`` ordenados pelo início.
+    """
+    livres = []
+    j = 0
+    for k in range(0, len(faixas), 2):
+        cursor, fim = faixas[k], faixas[k + 1]
+        while j < len(ocupados) and ocupados[j][0] < fim:
+            inicio_ocupado, fim_ocupado = ocupados[j][0], ocupados[j][1]
+            if inicio_ocupado > cursor:
+                livres.append((cursor, inicio_ocupado))
+            cursor = max(cursor, fim_ocupado)
+            if fim_ocupado > fim:
+                # Continua na próxima faixa; não consome o intervalo
+                break
+            j += 1
+        if cursor < fim:
+            livres.append((cursor, fim))
+    return livres
+
+
+def inicios_que_cabem(minutos, janelas, duracao):
+    """Posições de ``minutos`` (ordenados) cujo ``[m, m + duracao)`` cabe numa janela."""
+    j = 0
+    for i, minuto in enumerate(minutos):
+        while j < len(janelas) and janelas[j][1] <= minuto:
+            j += 1
+        if j == len(janelas):
+            break
+        if janelas[j][0] <= minuto and minuto + duracao <= janelas[j][1]:
+            yield i
+
+
+def buscar_horarios_livres(servico, horarios, funcionario_ids=None):
+    """
+    Para os ``horarios`` candidatos (queryset ou lista de ``Horario``),
+    devolve ``[(horario, [ids dos profissionais livres]), ...]`` em ordem de
+    data, só com os horários em que algum profissional qualificado para o
+    serviço tem ``servico.duracao`` minutos contíguos livres.
+    """
+    from ..models import Funcionario
+
+    qualificados = Funcionario.objects.filter(servicos=servico)
+    if funcionario_ids is not None:
+        qualificados = qualificados.filter(pk__in=funcionario_ids)
+    estados = {
+        pk: (texto, versao)
+        for pk, texto, versao in qualificados.values_list('id', 'horario_trabalho', 'versao_jornada')
+    }
+    if not estados:
+        return []
+
+    horarios = sorted(horarios, key=lambda horario: horario.data)
+    if not horarios:
+        return []
+
+    jornadas = obter_jornadas(estados, estados)
+    duracao = max(servico.duracao, 1)
+    resultado = []
+    with usar_indice() as indice:
+        indice.carregar(horarios[0].data, horarios[-1].data)
+        for dia, grupo in groupby(horarios, key=lambda horario: para_minutos(horario.data)[0]):
+            grupo = list(grupo)
+            minutos = [para_minutos(horario.data)[1] for horario in grupo]
+            livres = [[] for _ in grupo]
+            for funcionario_id, jornada in jornadas.items():
+                janelas = janelas_livres(jornada.faixas(dia), indice.ocupacao(funcionario_id, dia))
+                for i in inicios_que_cabem(minutos, janelas, duracao):
+                    livres[i].append(funcionario_id)
+            resultado.extend(
+                (horario, funcionarios) for horario, funcionarios in zip(grupo, livres) if funcionarios
+            )
+    return resultado
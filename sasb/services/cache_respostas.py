@@ -0,0 +1,99 @@
+"""
+Cache de respostas das leituras de catálogo e disponibilidade.
+
+As respostas ficam no alias ``respostas`` (LRU limitado em tamanho) sob uma
+chave que inclui a versão de cada grupo de dados de que dependem. Gravar
+num modelo do grupo só incrementa a versão: as entradas antigas deixam de ser
+encontradas e saem do LRU sozinhas, sem varrer o cache. Versões ausentes
+(nunca criadas ou despejadas pelo LRU) recomeçam de um valor novo, para que
+entradas antigas nunca voltem a valer.
+"""
+import time
+
+from django.core.cache import caches
+from django.db import transaction
+
+ALIAS = 'respostas'
+
+SERVICOS = 'servicos'
+FUNCIONARIOS = 'funcionarios'
+DISPONIBILIDADE = 'disponibilidade'
+
+ACERTOS = 'estatisticas:acertos'
+FALHAS = 'estatisticas:falhas'
+
+
+def _cache():
+    return caches[ALIAS]
+
+
+def _chave_versao(grupo):
+    return f'versao:{grupo}'
+
+
+def versoes(grupos):
+    """Versões atuais de ``grupos``, como texto para compor chaves."""
+    cache = _cache()
+    chaves = [_chave_versao(grupo) for grupo in grupos]
+    atuais = cache.get_many(chaves)
+    for chave in chaves:
+        if chave not in atuais:
+            cache.add(chave, time.time_ns(), None)
+            atuais[chave] = cache.get(chave)
+    return '.'.join(str(atuais[chave]) for chave in chaves)
+
+
+def _incrementar(grupos):
+    cache = _cache()
+    for grupo in grupos:
+        chave = _chave_versao(grupo)
+        try:
+            cache.incr(chave)
+        except ValueError:
+            cache.set(chave, time.time_ns(), None)
+
+
+def invalidar(*grupos):
+    """
+    Invalida as respostas que dependem de ``grupos``. Dentro de uma transação
+    a versão é incrementada de novo no commit, para descartar o que tiver sido
+    guardado por outra requisição antes de a gravação ficar visível.
+    """
+    _incrementar(grupos)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _incrementar(grupos))
+
+
+def obter(chave):
+    resposta = _cache().get(chave)
+    _contar(FALHAS if resposta is None else ACERTOS)
+    return resposta
+
+
+def guardar(chave, dados, tempo):
+    _cache().set(chave, dados, tempo)
+
+
+def _contar(contador):
+    cache = _cache()
+    cache.add(contador, 0, None)
+    try:
+        cache.incr(contador)
+    except ValueError:
+        cache.set(contador, 1, None)
+
+
+def estatisticas():
+    """``{'acertos', 'falhas', 'taxa_acerto'}`` desde o último ``zerar_estatisticas``."""
+    valores = _cache().get_many([ACERTOS, FALHAS])
+    acertos, falhas = valores.get(ACERTOS, 0), valores.get(FALHAS, 0)
+    total = acertos + falhas
+    return {
+        'acertos': acertos,
+        'falhas': falhas,
+        'taxa_acerto': round(acertos / total, 4) if total else None,
+    }
+
+
+def zerar_estatisticas():
+    _cache().delete_many([ACERTOS, FALHAS])
@@ -0,0 +1,103 @@
+"""
+Calendário mensal de horários livres.
+
+Tudo sai das mesmas janelas livres da busca (``services.busca``): os
+horários do mês, os agendamentos do mês (uma consulta, pelo índice de
+disponibilidade) e as jornadas compiladas em cache. Para cada profissional e
+dia, as janelas dizem em quais horários a duração do serviço cabe; somando
+os profissionais, cada horário fica com quantos deles estão livres ali, o
+que já desconta os agendamentos que ocupam mais de um horário e os
+profissionais fora da jornada ou que não fazem o serviço. ``vagas`` só entra
+como teto do horário.
+"""
+import calendar
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+from itertools import accumulate, groupby
+
+from django.utils import timezone
+
+from .busca import janelas_livres
+from .disponibilidade import inicio_do_dia, usar_indice
+from .jornada import obter_jornadas
+
+
+def calendario_mes(ano, mes, servico=None, por_profissional=False):
+    """
+    ``[{'dia', 'horarios_livres', 'vagas'}, ...]`` para todos os dias do mês.
+    Um horário futuro e aberto é livre se algum profissional (qualificado
+    para ``servico``, se informado) tem a duração do serviço livre a partir
+    dele, e suas vagas são quantos profissionais estão assim, limitadas às
+    ``vagas`` do horário. Com ``por_profissional``, cada dia traz também
+    ``profissionais``: ``{id: horários livres}``.
+    """
+    from ..models import Funcionario, Horario
+
+    primeiro = date(ano, mes, 1)
+    dias_no_mes = calendar.monthrange(ano, mes)[1]
+    qualificados = Funcionario.objects.all()
+    if servico is not None:
+        qualificados = qualificados.filter(servicos=servico)
+    estados = {
+        pk: (texto, versao)
+        for pk, texto, versao in qualificados.values_list('id', 'horario_trabalho', 'versao_jornada')
+    }
+    funcionarios = sorted(estados)
+
+    dias = {}
+    for i in range(dias_no_mes):
+        dia = primeiro + timedelta(days=i)
+        dias[dia] = {'dia': dia, 'horarios_livres': 0, 'vagas': 0}
+        if por_profissional:
+            dias[dia]['profissionais'] = dict.fromkeys(funcionarios, 0)
+    if not funcionarios:
+        return list(dias.values())
+
+    linhas = list(Horario.objects.filter(
+        data__gte=inicio_do_dia(primeiro),
+        data__lt=inicio_do_dia(primeiro + timedelta(days=dias_no_mes)),
+        data__gt=timezone.now(),
+        disponivel=True,
+        vagas__gt=0,
+    ).order_by('data').values_list('data', 'vagas'))
+    if not linhas:
+        return list(dias.values())
+
+    # Converte para o fuso local uma vez por horário (o mesmo de para_minutos)
+    fuso = timezone.get_current_timezone()
+    locais = [(data.astimezone(fuso), vagas) for data, vagas in linhas]
+    jornadas = obter_jornadas(funcionarios, estados)
+    duracao = max(servico.duracao, 1) if servico is not None else 1
+    with usar_indice() as indice:
+        indice.carregar(linhas[0][0], linhas[-1][0])
+        for dia, grupo in groupby(locais, key=lambda local: local[0].date()):
+            grupo = list(grupo)
+            minutos = [local.hour * 60 + local.minute for local, _ in grupo]
+            # Diferenças: a soma acumulada é quantos profissionais estão livres em cada horário
+            livres = [0] * (len(minutos) + 1)
+            resumo = dias[dia]
+            for funcionario_id in funcionarios:
+                janelas = janelas_livres(jornadas[funcionario_id].faixas(dia), indice.ocupacao(funcionario_id, dia))
+                total = 0
+                for inicio, fim in _inicios_que_cabem(minutos, janelas, duracao):
+                    livres[inicio] += 1
+                    livres[fim] -= 1
+                    total += fim - inicio
+                if por_profissional:
+                    resumo['profissionais'][funcionario_id] = total
+            for (_, vagas), profissionais in zip(grupo, accumulate(livres)):
+                vagas = min(vagas, profissionais)
+                if vagas > 0:
+                    resumo['horarios_livres'] += 1
+                    resumo['vagas'] += vagas
+    return list(dias.values())
+
+
+def _inicios_que_cabem(minutos, janelas, duracao):
+    """Faixas de posições ``[inicio, fim)`` dos ``minutos`` (ordenados) que
+    têm ``[m, m + duracao)`` dentro de alguma das ``janelas`` (disjuntas e
+    ordenadas), com duas buscas binárias por janela."""
+    for inicio, fim in janelas:
+        primeira, depois = bisect_left(minutos, inicio), bisect_right(minutos, fim - duracao)
+        if depois > primeira:
+            yield primeira, depois
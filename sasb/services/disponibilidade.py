@@ -0,0 +1,234 @@
+"""
+Índice de disponibilidade de profissionais e clientes.
+
+Para cada profissional (e cliente) e cada dia, guarda os intervalos ocupados
+em minutos a partir da meia-noite, ordenados pelo início. O índice é montado
+em lote, com uma única consulta por faixa de dias, a partir dos agendamentos
+ativos, e é atualizado incrementalmente por ``Agendamento.save``. Assim, as
+perguntas de disponibilidade viram buscas binárias em memória em vez de uma
+consulta EXISTS por horário.
+
+O índice vale para um escopo (uma requisição, um lote de agendamentos):
+``usar_indice()`` o ativa para o bloco e ``obter_indice()`` devolve o ativo ou
+um novo, descartável, para consultas avulsas.
+"""
+from bisect import bisect_left, insort
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+STATUS_ATIVOS = ('AGENDADO', 'CONFIRMADO')
+MINUTOS_DIA = 24 * 60
+
+FUNCIONARIO = 'funcionario'
+CLIENTE = 'cliente'
+
+_indice_ativo = ContextVar('indice_disponibilidade', default=None)
+
+
+def para_minutos(momento):
+    """Converte um datetime em ``(dia, minuto do dia)`` no fuso local."""
+    if timezone.is_aware(momento):
+        momento = timezone.localtime(momento)
+    return momento.date(), momento.hour * 60 + momento.minute
+
+
+def inicio_do_dia(dia):
+    momento = datetime.combine(dia, time.min)
+    if settings.USE_TZ:
+        return timezone.make_aware(momento)
+    return momento
+
+
+def _dia(valor):
+    if isinstance(valor, datetime):
+        return para_minutos(valor)[0]
+    return valor
+
+
+def _dias_entre(primeiro, ultimo):
+    dia = primeiro
+    while dia <= ultimo:
+        yield dia
+        dia += timedelta(days=1)
+
+
+def fatias(inicio, duracao):
+    """Quebra ``[inicio, inicio + duracao)`` em fatias ``(dia, inicio, fim)``
+    por dia, para intervalos que atravessam a meia-noite."""
+    dia, minuto = para_minutos(inicio)
+    fim = minuto + max(duracao or 0, 1)
+    while True:
+        yield dia, minuto, min(fim, MINUTOS_DIA)
+        if fim <= MINUTOS_DIA:
+            break
+        fim -= MINUTOS_DIA
+        minuto = 0
+        dia += timedelta(days=1)
+
+
+class IndiceDisponibilidade:
+    def __init__(self):
+        # (tipo, id, dia) -> [(inicio, fim, agendamento_id), ...] ordenada
+        self._intervalos = {}
+        # (tipo, dia) -> {id: quantidade de intervalos}
+        self._ocupados_dia = {}
+        # agendamento_id -> [(chave, intervalo), ...], para remoção
+        self._agendamentos = {}
+        self._dias = set()
+        # Limita a varredura para trás em _conflita
+        self._maior_intervalo = 1
+
+    def carregar(self, inicio, fim=None):
+        """
+        Indexa os agendamentos ativos dos dias entre ``inicio`` e ``fim``
+        (datas ou datetimes) que ainda não foram carregados, em uma única
+        consulta.
+        """
+        from ..models import Agendamento
+
+        primeiro = _dia(inicio)
+        ultimo = _dia(fim) if fim is not None else primeiro
+        faltantes = [d for d in _dias_entre(primeiro, ultimo) if d not in self._dias]
+        if not faltantes:
+            return self
+
+        # Inclui o dia anterior para pegar agendamentos que atravessam a meia-noite
+        linhas = Agendamento.objects.filter(
+            status__in=STATUS_ATIVOS,
+            horario__data__gte=inicio_do_dia(faltantes[0] - timedelta(days=1)),
+            horario__data__lt=inicio_do_dia(faltantes[-1] + timedelta(days=1)),
+        ).values_list('id', 'funcionario_id', 'cliente_id', 'horario__data', 'fim', 'servico__duracao')
+
+        for agendamento_id, funcionario_id, cliente_id, data, fim_, duracao in linhas:
+            if agendamento_id in self._agendamentos:
+                continue
+            if fim_ is not None:
+                duracao = (fim_ - data) // timedelta(minutes=1)
+            self.registrar(agendamento_id, funcionario_id, cliente_id, data, duracao)
+        self._dias.update(_dias_entre(faltantes[0], faltantes[-1]))
+        return self
+
+    def carregar_restrito(self, intervalos, funcionario_ids, cliente_ids):
+        """
+        Indexa, em uma única consulta, apenas os agendamentos ativos dos
+        profissionais e clientes informados que se sobrepõem a algum dos
+        ``intervalos`` ``(inicio, fim)``, e dá os dias tocados como
+        carregados. O índice passa a responder só por esses profissionais e
+        clientes nesses intervalos; use-o em um escopo próprio (um lote).
+        """
+        from django.db.models import Q
+
+        from ..models import Agendamento
+
+        sobreposicao = Q()
+        for inicio, fim in intervalos:
+            sobreposicao |= Q(horario__data__lt=fim, fim__gt=inicio)
+        if not sobreposicao:
+            return self
+
+        linhas = Agendamento.objects.filter(
+            sobreposicao,
+            Q(funcionario_id__in=funcionario_ids) | Q(cliente_id__in=cliente_ids),
+            status__in=STATUS_ATIVOS,
+        ).values_list('id', 'funcionario_id', 'cliente_id', 'horario__data', 'fim')
+
+        for agendamento_id, funcionario_id, cliente_id, data, fim in linhas:
+            if agendamento_id not in self._agendamentos:
+                self.registrar(
+                    agendamento_id, funcionario_id, cliente_id, data, (fim - data) // timedelta(minutes=1)
+                )
+        for inicio, fim in intervalos:
+            self._dias.update(_dias_entre(_dia(inicio), _dia(fim)))
+        return self
+
+    def registrar(self, agendamento_id, funcionario_id, cliente_id, inicio, duracao):
+        """Marca como ocupado o intervalo de um agendamento ativo."""
+        self.remover(agendamento_id)
+        entradas = []
+        for dia, a, b in fatias(inicio, duracao):
+            intervalo = (a, b, agendamento_id)
+            for tipo, id_ in ((FUNCIONARIO, funcionario_id), (CLIENTE, cliente_id)):
+                if id_ is None:
+                    continue
+                chave = (tipo, id_, dia)
+                insort(self._intervalos.setdefault(chave, []), intervalo)
+                ocupados = self._ocupados_dia.setdefault((tipo, dia), {})
+                ocupados[id_] = ocupados.get(id_, 0) + 1
+                entradas.append((chave, intervalo))
+            self._maior_intervalo = max(self._maior_intervalo, b - a)
+        self._agendamentos[agendamento_id] = entradas
+
+    def remover(self, agendamento_id):
+        """Libera o intervalo de um agendamento cancelado ou concluído."""
+        for chave, intervalo in self._agendamentos.pop(agendamento_id, ()):
+            tipo, id_, dia = chave
+            intervalos = self._intervalos[chave]
+            del intervalos[bisect_left(intervalos, intervalo)]
+            ocupados = self._ocupados_dia[(tipo, dia)]
+            ocupados[id_] -= 1
+            if not ocupados[id_]:
+                del ocupados[id_]
+
+    def _conflita(self, intervalos, a, b, ignorar):
+        # Só intervalos que começam antes de ``b`` podem se sobrepor a [a, b);
+        # voltando a partir dali, nenhum intervalo é maior que _maior_intervalo.
+        pos = bisect_left(intervalos, (b,))
+        while pos > 0:
+            pos -= 1
+            inicio, fim, agendamento_id = intervalos[pos]
+            if inicio + self._maior_intervalo <= a:
+                break
+            if fim > a and agendamento_id != ignorar:
+                return True
+        return False
+
+    def ocupado(self, tipo, id_, inicio, duracao=1, ignorar=None):
+        for dia, a, b in fatias(inicio, duracao):
+            self.carregar(dia)
+            if self._conflita(self._intervalos.get((tipo, id_, dia), ()), a, b, ignorar):
+                return True
+        return False
+
+    def funcionario_livre(self, funcionario_id, inicio, duracao=1, ignorar=None):
+        return not self.ocupado(FUNCIONARIO, funcionario_id, inicio, duracao, ignorar)
+
+    def cliente_livre(self, cliente_id, inicio, duracao=1, ignorar=None):
+        return not self.ocupado(CLIENTE, cliente_id, inicio, duracao, ignorar)
+
+    def ocupacao(self, funcionario_id, dia):
+        """Intervalos ``(inicio, fim, agendamento_id)`` ocupados do profissional no dia, ordenados."""
+        self.carregar(dia)
+        return self._intervalos.get((FUNCIONARIO, funcionario_id, dia), ())
+
+    def funcionarios_ocupados(self, inicio, duracao=1):
+        """Ids dos profissionais com algum agendamento em ``[inicio, inicio + duracao)``."""
+        ocupados = set()
+        for dia, _, _ in fatias(inicio, duracao):
+            self.carregar(dia)
+            ocupados.update(self._ocupados_dia.get((FUNCIONARIO, dia), ()))
+        return {f for f in ocupados if self.ocupado(FUNCIONARIO, f, inicio, duracao)}
+
+
+def indice_ativo():
+    return _indice_ativo.get()
+
+
+def obter_indice():
+    """Índice ativo no escopo atual ou um novo, descartável."""
+    return _indice_ativo.get() or IndiceDisponibilidade()
+
+
+@contextmanager
+def usar_indice(indice=None):
+    """Ativa um índice para o bloco, reaproveitando o já ativo se houver."""
+    if indice is None:
+        indice = _indice_ativo.get() or IndiceDisponibilidade()
+    token = _indice_ativo.set(indice)
+    try:
+        yield indice
+    finally:
+        _indice_ativo.reset(token)
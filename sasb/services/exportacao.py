@@ -0,0 +1,77 @@
+"""
+Exportação de agendamentos e pagamentos em CSV ou NDJSON.
+
+As linhas são lidas com ``values_list(...).iterator(chunk_size)``, já com as
+colunas das tabelas relacionadas resolvidas por JOIN, e codificadas uma a uma
+num gerador: a memória usada não depende do número de linhas exportadas,
+nem do lado do banco nem do lado da resposta.
+"""
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+TAMANHO_LOTE = 2000
+
+# (cabeçalho, caminho em values_list)
+COLUNAS_AGENDAMENTO = [
+    ('id', 'id'),
+    ('data', 'data'),
+    ('fim', 'fim'),
+    ('status', 'status'),
+    ('cliente', 'cliente__nome'),
+    ('servico', 'servico__nome'),
+    ('profissional', 'funcionario__nome'),
+    ('valor', 'servico__valor'),
+    ('pagamento_status', 'pagamento__status'),
+]
+
+COLUNAS_PAGAMENTO = [
+    ('id', 'id'),
+    ('data', 'data'),
+    ('status', 'status'),
+    ('metodo', 'dados_pagamento__metodo'),
+    ('valor', 'dados_pagamento__valor'),
+    ('agendamento', 'agendamento__id'),
+    ('cliente', 'agendamento__cliente__nome'),
+    ('servico', 'agendamento__servico__nome'),
+]
+
+
+class _Eco:
+    """Arquivo falso cujo ``write`` devolve o texto, para o ``csv.writer``
+    produzir uma linha por vez."""
+
+    def write(self, texto):
+        return texto
+
+
+def linhas(queryset, colunas, tamanho_lote=TAMANHO_LOTE):
+    return queryset.values_list(*(caminho for _, caminho in colunas)).iterator(chunk_size=tamanho_lote)
+
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    if hasattr(valor, 'isoformat'):
+        return valor.isoformat()
+    return valor
+
+
+def gerar_csv(queryset, colunas, tamanho_lote=TAMANHO_LOTE):
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow([cabecalho for cabecalho, _ in colunas])
+    for linha in linhas(queryset, colunas, tamanho_lote):
+        yield escritor.writerow([_texto(valor) for valor in linha])
+
+
+def gerar_ndjson(queryset, colunas, tamanho_lote=TAMANHO_LOTE):
+    cabecalhos = [cabecalho for cabecalho, _ in colunas]
+    codificador = DjangoJSONEncoder(ensure_ascii=False)
+    for linha in linhas(queryset, colunas, tamanho_lote):
+        yield codificador.encode(dict(zip(cabecalhos, linha))) + '\n'
+
+
+FORMATOS = {
+    'csv': (gerar_csv, 'text/csv; charset=utf-8'),
+    'ndjson': (gerar_ndjson, 'application/x-ndjson; charset=utf-8'),
+}
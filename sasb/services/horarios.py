@@ -0,0 +1,82 @@
+"""
+Geração em lote de horários (``Horario``) a partir das jornadas.
+
+Os horários de cada dia são os inícios, numa grade de ``intervalo`` minutos,
+que cabem na união das faixas de trabalho dos funcionários. São produzidos
+como um fluxo e gravados em lotes com ``bulk_create(ignore_conflicts=True)``;
+a restrição única em ``Horario.data`` torna a geração idempotente.
+"""
+import time
+from datetime import timedelta
+from itertools import islice
+
+from .cache_respostas import DISPONIBILIDADE, invalidar
+from .disponibilidade import inicio_do_dia, para_minutos
+from .jornada import obter_jornadas, unir_faixas
+
+INTERVALO_PADRAO = 15
+TAMANHO_LOTE = 1000
+
+
+def iterar_inicios(data_inicio, data_fim, intervalo=INTERVALO_PADRAO, funcionario_ids=None):
+    """Gera, em ordem, os datetimes de início dos horários entre as datas (inclusive)."""
+    from ..models import Funcionario
+
+    if funcionario_ids is None:
+        funcionario_ids = Funcionario.objects.values_list('id', flat=True)
+    jornadas = list(obter_jornadas(funcionario_ids).values())
+
+    dia = data_inicio
+    while dia <= data_fim:
+        faixas = unir_faixas(*(jornada.faixas(dia) for jornada in jornadas))
+        meia_noite = inicio_do_dia(dia)
+        for i in range(0, len(faixas), 2):
+            inicio, fim = faixas[i], faixas[i + 1]
+            # Alinha à grade do dia (08:00, 08:15, ...), não ao início da faixa
+            primeiro = -(-inicio // intervalo) * intervalo
+            for minuto in range(primeiro, fim - intervalo + 1, intervalo):
+                yield meia_noite + timedelta(minutes=minuto)
+        dia += timedelta(days=1)
+
+
+def na_grade(momento, intervalo=INTERVALO_PADRAO):
+    """Se ``momento`` é um dos inícios da grade de ``intervalo`` minutos do dia."""
+    _, minuto = para_minutos(momento)
+    return minuto % intervalo == 0 and momento.second == 0 and momento.microsecond == 0
+
+
+def gerar_horarios(data_inicio, data_fim, intervalo=INTERVALO_PADRAO, funcionario_ids=None,
+                   tamanho_lote=TAMANHO_LOTE):
+    """
+    Grava os horários do período e devolve um resumo com ``gerados``,
+    ``inseridos`` (os demais já existiam), ``segundos`` e ``linhas_por_segundo``.
+    """
+    from ..models import Horario
+
+    periodo = {
+        'data__gte': inicio_do_dia(data_inicio),
+        'data__lt': inicio_do_dia(data_fim + timedelta(days=1)),
+    }
+    existentes = Horario.objects.filter(**periodo).count()
+
+    comeco = time.perf_counter()
+    gerados = 0
+    vagas = Horario.capacidade_padrao()
+    fluxo = (Horario(data=inicio, vagas=vagas) for inicio in iterar_inicios(
+        data_inicio, data_fim, intervalo, funcionario_ids
+    ))
+    while True:
+        lote = list(islice(fluxo, tamanho_lote))
+        if not lote:
+            break
+        Horario.objects.bulk_create(lote, ignore_conflicts=True)
+        gerados += len(lote)
+    segundos = time.perf_counter() - comeco
+    invalidar(DISPONIBILIDADE)
+
+    return {
+        'gerados': gerados,
+        'inseridos': Horario.objects.filter(**periodo).count() - existentes,
+        'segundos': round(segundos, 3),
+        'linhas_por_segundo': round(gerados / segundos) if segundos else gerados,
+    }
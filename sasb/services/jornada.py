@@ -0,0 +1,220 @@
+"""
+Jornada de trabalho compilada.
+
+A jornada de um funcionário (faixas semanais de ``JornadaTrabalho``, exceções
+de ``ExcecaoJornada`` ou, na falta delas, o texto ``horario_trabalho`` no
+formato ``HH:MM-HH:MM``) é compilada uma vez em arrays ordenados de minutos
+e guardada no cache por funcionário. Verificar se um intervalo está dentro do
+expediente passa a ser uma busca binária, sem releitura de texto.
+
+A chave do cache leva ``Funcionario.versao_jornada``, que os sinais em
+``sasb.signals`` trocam quando uma faixa ou exceção muda, e a entrada
+guarda o ``horario_trabalho`` de que saiu. Quem pede a jornada já traz os
+dois da mesma linha de ``Funcionario`` que leu, então uma jornada alterada
+por outro processo nunca é servida velha, mesmo com um cache por processo.
+"""
+import uuid
+from array import array
+from bisect import bisect_right
+from datetime import timedelta
+
+from django.core.cache import cache
+
+from .disponibilidade import MINUTOS_DIA, para_minutos
+
+CHAVE_CACHE = 'jornada:{}:{}'
+TEMPO_CACHE = 24 * 60 * 60
+
+
+def _minutos(hora, fim=False):
+    minutos = hora.hour * 60 + hora.minute
+    # 00:00 no fim de uma faixa indica o fim do dia
+    return MINUTOS_DIA if fim and minutos == 0 else minutos
+
+
+def _compactar(faixas):
+    """Ordena e funde faixas ``(inicio, fim)`` em um array plano
+    ``[inicio0, fim0, inicio1, fim1, ...]`` sem sobreposições."""
+    plano = array('H')
+    for inicio, fim in sorted(faixas):
+        if fim <= inicio:
+            continue
+        if plano and inicio <= plano[-1]:
+            plano[-1] = max(plano[-1], fim)
+        else:
+            plano.extend((inicio, fim))
+    return plano
+
+
+def interpretar_horario_trabalho(texto):
+    """Converte ``'HH:MM-HH:MM'`` em ``(inicio, fim)`` em minutos, ou ``None``."""
+    try:
+        inicio, fim = (parte.strip() for parte in texto.split('-'))
+        minutos = []
+        for valor in (inicio, fim):
+            hora, _, minuto = valor.partition(':')
+            minutos.append(int(hora) * 60 + int(minuto or 0))
+    except (AttributeError, ValueError):
+        return None
+    inicio, fim = minutos
+    return inicio, (MINUTOS_DIA if fim == 0 else fim)
+
+
+def unir_faixas(*planos):
+    """União de arrays planos de faixas, no mesmo formato."""
+    return _compactar(
+        (plano[i], plano[i + 1]) for plano in planos for i in range(0, len(plano), 2)
+    )
+
+
+class JornadaCompilada:
+    __slots__ = ('semana', 'excecoes')
+
+    def __init__(self, semana, excecoes):
+        # Um array plano de faixas por dia da semana (0 = segunda-feira)
+        self.semana = semana
+        # data -> array plano de faixas daquele dia
+        self.excecoes = excecoes
+
+    def __getstate__(self):
+        return self.semana, self.excecoes
+
+    def __setstate__(self, estado):
+        self.semana, self.excecoes = estado
+
+    def faixas(self, dia):
+        faixas = self.excecoes.get(dia)
+        if faixas is None:
+            faixas = self.semana[dia.weekday()]
+        return faixas
+
+    def contem(self, dia, inicio, fim):
+        """Se ``[inicio, fim)`` (minutos do dia) cabe em uma faixa de ``dia``."""
+        faixas = self.faixas(dia)
+        pos = bisect_right(faixas, inicio)
+        # Posição ímpar: ``inicio`` está dentro da faixa que termina em faixas[pos]
+        return pos % 2 == 1 and fim <= faixas[pos]
+
+    def atende(self, momento, duracao=1):
+        """Se o funcionário trabalha em ``[momento, momento + duracao)``."""
+        dia, minuto = para_minutos(momento)
+        fim = minuto + max(duracao or 0, 1)
+        if fim <= MINUTOS_DIA:
+            return self.contem(dia, minuto, fim)
+        # Atravessa a meia-noite: precisa de faixas contíguas nos dois dias
+        return (
+            self.contem(dia, minuto, MINUTOS_DIA)
+            and self.contem(dia + timedelta(days=1), 0, fim - MINUTOS_DIA)
+        )
+
+
+def compilar(faixas_semana, excecoes, horario_trabalho=''):
+    """
+    Compila a jornada a partir de ``[(dia_semana, inicio, fim), ...]`` e
+    ``[(data_inicio, data_fim, inicio, fim), ...]`` (horas em ``time``).
+    """
+    if faixas_semana:
+        por_dia = [[] for _ in range(7)]
+        for dia_semana, inicio, fim in faixas_semana:
+            por_dia[dia_semana].append((_minutos(inicio), _minutos(fim, fim=True)))
+    else:
+        # Sem faixas estruturadas vale o texto legado, todos os dias
+        faixa = interpretar_horario_trabalho(horario_trabalho)
+        por_dia = [[faixa] if faixa else [] for _ in range(7)]
+    semana = tuple(_compactar(faixas) for faixas in por_dia)
+
+    por_data = {}
+    for data_inicio, data_fim, inicio, fim in excecoes:
+        dia = data_inicio
+        while dia <= data_fim:
+            faixas = por_data.setdefault(dia, [])
+            if inicio is not None and fim is not None:
+                faixas.append((_minutos(inicio), _minutos(fim, fim=True)))
+            dia += timedelta(days=1)
+    return JornadaCompilada(semana, {dia: _compactar(f) for dia, f in por_data.items()})
+
+
+def _compilar_do_banco(funcionario_ids, textos=None):
+    from ..models import ExcecaoJornada, Funcionario, JornadaTrabalho
+
+    textos = dict(textos or {})
+    faltando_texto = [f for f in funcionario_ids if f not in textos]
+    if faltando_texto:
+        textos.update(
+            Funcionario.objects.filter(pk__in=faltando_texto).values_list('pk', 'horario_trabalho')
+        )
+
+    faixas = {f: [] for f in funcionario_ids}
+    for linha in JornadaTrabalho.objects.filter(funcionario_id__in=funcionario_ids).values_list(
+        'funcionario_id', 'dia_semana', 'inicio', 'fim'
+    ):
+        faixas[linha[0]].append(linha[1:])
+
+    excecoes = {f: [] for f in funcionario_ids}
+    for linha in ExcecaoJornada.objects.filter(funcionario_id__in=funcionario_ids).values_list(
+        'funcionario_id', 'data_inicio', 'data_fim', 'inicio', 'fim'
+    ):
+        excecoes[linha[0]].append(linha[1:])
+
+    return {
+        f: compilar(faixas[f], excecoes[f], textos.get(f, ''))
+        for f in funcionario_ids
+    }
+
+
+def obter_jornadas(funcionario_ids, estados=None):
+    """
+    Jornadas compiladas de vários funcionários, com uma leitura do cache e,
+    para os ausentes, uma compilação em lote. ``estados`` pode trazer o
+    ``(horario_trabalho, versao_jornada)`` de cada um, já carregado; os que
+    faltarem são lidos numa consulta.
+    """
+    from ..models import Funcionario
+
+    funcionario_ids = list(dict.fromkeys(funcionario_ids))
+    estados = dict(estados or {})
+    faltando = [f for f in funcionario_ids if f not in estados]
+    if faltando:
+        estados.update(
+            (pk, (texto, versao))
+            for pk, texto, versao in Funcionario.objects.filter(pk__in=faltando).values_list(
+                'pk', 'horario_trabalho', 'versao_jornada'
+            )
+        )
+    estados = {f: estados.get(f, ('', None)) for f in funcionario_ids}
+
+    chaves = {CHAVE_CACHE.format(f, versao): f for f, (_, versao) in estados.items()}
+    jornadas = {}
+    for chave, (texto, jornada) in cache.get_many(chaves).items():
+        # O texto legado também muda a jornada, sem mudar a versão
+        if texto == estados[chaves[chave]][0]:
+            jornadas[chaves[chave]] = jornada
+
+    ausentes = [f for f in funcionario_ids if f not in jornadas]
+    if ausentes:
+        compiladas = _compilar_do_banco(ausentes, {f: estados[f][0] for f in ausentes})
+        cache.set_many(
+            {
+                CHAVE_CACHE.format(f, estados[f][1]): (estados[f][0], jornada)
+                for f, jornada in compiladas.items()
+            },
+            TEMPO_CACHE,
+        )
+        jornadas.update(compiladas)
+    return jornadas
+
+
+def obter_jornada(funcionario_id, estado=None):
+    estados = {funcionario_id: estado} if estado is not None else None
+    return obter_jornadas([funcionario_id], estados)[funcionario_id]
+
+
+def invalidar_jornada(funcionario_id, funcionario=None):
+    """Passa a jornada para uma nova versão, que nenhum processo tem em cache;
+    ``funcionario``, se já carregado, recebe a nova versão também."""
+    from ..models import Funcionario
+
+    versao = uuid.uuid4()
+    Funcionario.objects.filter(pk=funcionario_id).update(versao_jornada=versao)
+    if funcionario is not None:
+        funcionario.versao_jornada = versao
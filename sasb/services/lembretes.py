@@ -0,0 +1,108 @@
+"""
+Lembretes de agendamento.
+
+Cada antecedência (24h e 2h por padrão) define uma faixa antes do
+atendimento, e as faixas são disjuntas: ``(agora, agora + 2h]`` recebe o
+lembrete de 2h, ``(agora + 2h, agora + 24h]`` o de 24h. Um agendamento feito
+em cima da hora recebe só o lembrete da menor faixa em que já está, e os
+demais recebem um por faixa, na ordem em que entram nelas.
+
+Cada faixa é uma consulta por intervalo em ``(status, data)``, que usa o
+índice ``agendamento_status_data_idx`` e descarta no próprio banco os
+agendamentos que já têm o lembrete. Os lembretes entram na caixa de saída
+(``services.notifications``) com uma ``chave`` única por agendamento e
+antecedência, inseridos em lotes com ``ignore_conflicts``: rodar de novo, ou
+em dois processos ao mesmo tempo, não duplica nada. Pensado para o cron
+(``manage.py enviar_lembretes`` a cada poucos minutos): uma passada perdida é
+coberta pela seguinte, já que a faixa vai de agora até a antecedência.
+Um lembrete ainda na fila quando o agendamento é cancelado (ou excluído) não
+sai: o processamento da caixa de saída o marca como ``CANCELADA``.
+"""
+from datetime import timedelta
+
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .disponibilidade import STATUS_ATIVOS
+
+ANTECEDENCIAS_PADRAO = (24, 2)  # horas
+TAMANHO_LOTE = 1000
+PREFIXO_CHAVE = 'lembrete-'
+
+
+def chave_lembrete(horas, agendamento_id):
+    return f'{PREFIXO_CHAVE}{horas}h:{agendamento_id}'
+
+
+def faixas(antecedencias, agora):
+    """``[(horas, inicio, fim), ...]`` disjuntas, da menor antecedência
+    para a maior."""
+    resultado = []
+    inicio = agora
+    for horas in sorted(set(antecedencias)):
+        fim = agora + timedelta(hours=horas)
+        resultado.append((horas, inicio, fim))
+        inicio = fim
+    return resultado
+
+
+def _lembrete(horas, agendamento_id, data, email, nome, servico, funcionario):
+    from ..models import Notificacao
+
+    return Notificacao(
+        destinatario=email,
+        assunto='Lembrete de Agendamento',
+        mensagem=(
+            f'Olá, {nome}! Este é um lembrete do seu agendamento.\n'
+            f'Serviço: {servico}\n'
+            f'Data: {data:%d/%m/%Y %H:%M}\n'
+            f'Profissional: {funcionario}\n'
+        ),
+        agendamento_id=agendamento_id,
+        chave=chave_lembrete(horas, agendamento_id),
+    )
+
+
+def agendar_lembretes(antecedencias=ANTECEDENCIAS_PADRAO, agora=None, tamanho=TAMANHO_LOTE):
+    """Enfileira os lembretes devidos e devolve ``{horas: quantidade}``."""
+    from ..models import Agendamento, Notificacao
+
+    agora = agora or timezone.now()
+    fuso = timezone.get_current_timezone()
+    enfileirados = {}
+    for horas, inicio, fim in faixas(antecedencias, agora):
+        lembrados = Notificacao.objects.filter(
+            agendamento=OuterRef('pk'), chave__startswith=chave_lembrete(horas, '')
+        )
+        devidos = list(
+            Agendamento.objects.filter(status__in=STATUS_ATIVOS, data__gt=inicio, data__lte=fim)
+            .exclude(cliente__email='')
+            .filter(~Exists(lembrados))
+            .order_by('data', 'id')
+            .values_list('id', 'data', 'cliente__email', 'cliente__nome', 'servico__nome', 'funcionario__nome')
+        )
+        for posicao in range(0, len(devidos), tamanho):
+            Notificacao.objects.bulk_create(
+                [
+                    _lembrete(horas, pk, data.astimezone(fuso), email, nome, servico, funcionario)
+                    for pk, data, email, nome, servico, funcionario in devidos[posicao:posicao + tamanho]
+                ],
+                ignore_conflicts=True,
+            )
+        enfileirados[horas] = len(devidos)
+    return enfileirados
+
+
+def enfileirar_lembrete(agendamento, horas):
+    """Enfileira um lembrete avulso, sem repetir um já existente."""
+    from ..models import Notificacao
+
+    if not agendamento.cliente.email:
+        return
+    Notificacao.objects.bulk_create(
+        [_lembrete(
+            horas, agendamento.pk, timezone.localtime(agendamento.data), agendamento.cliente.email,
+            agendamento.cliente.nome, agendamento.servico.nome, agendamento.funcionario.nome,
+        )],
+        ignore_conflicts=True,
+    )
@@ -0,0 +1,97 @@
+"""
+Matriz de disponibilidade profissionais × horários de um período.
+
+A grade inteira sai de três consultas (os horários do período, os
+profissionais qualificados para o serviço e os agendamentos do período, pelo
+índice de disponibilidade), mais as jornadas compiladas em cache, e das
+mesmas janelas livres da busca (``services.busca``): cada linha marca os
+horários em que o profissional tem a duração do serviço livre.
+
+As linhas podem ser compactadas em bits (base64, um bit por horário, do mais
+significativo para o menos em cada byte) ou em corridas (RLE) alternadas de
+ocupados e livres, começando pelos ocupados.
+"""
+import base64
+from itertools import groupby
+
+from django.utils import timezone
+
+from .busca import inicios_que_cabem, janelas_livres
+from .disponibilidade import usar_indice
+from .jornada import obter_jornadas
+
+
+def matriz_disponibilidade(servico, inicio, fim):
+    """
+    ``(horarios, linhas)``: ``horarios`` é ``[(id, data), ...]`` em ordem de
+    data, no período ``[inicio, fim)``; ``linhas`` é ``[(funcionario_id,
+    nome, livres), ...]`` com ``livres[i]`` igual a 1 se o profissional pode
+    atender o serviço no horário ``i``.
+    """
+    from ..models import Funcionario, Horario
+
+    horarios = list(
+        Horario.objects.filter(data__gte=inicio, data__lt=fim).order_by('data').values_list(
+            'id', 'data', 'disponivel', 'vagas'
+        )
+    )
+    qualificados = list(
+        Funcionario.objects.filter(servicos=servico).order_by('nome', 'id').values_list(
+            'id', 'nome', 'horario_trabalho', 'versao_jornada'
+        )
+    )
+    linhas = {pk: bytearray(len(horarios)) for pk, _, _, _ in qualificados}
+
+    # Só horários abertos e com vaga podem ser livres
+    fuso = timezone.get_current_timezone()
+    abertos = [
+        (posicao, data.astimezone(fuso))
+        for posicao, (_, data, disponivel, vagas) in enumerate(horarios)
+        if disponivel and vagas > 0
+    ]
+    if qualificados and abertos:
+        estados = {pk: (texto, versao) for pk, _, texto, versao in qualificados}
+        jornadas = obter_jornadas(estados, estados)
+        duracao = max(servico.duracao, 1)
+        with usar_indice() as indice:
+            indice.carregar(abertos[0][1], abertos[-1][1])
+            for dia, grupo in groupby(abertos, key=lambda item: item[1].date()):
+                grupo = list(grupo)
+                minutos = [local.hour * 60 + local.minute for _, local in grupo]
+                for pk, jornada in jornadas.items():
+                    janelas = janelas_livres(jornada.faixas(dia), indice.ocupacao(pk, dia))
+                    linha = linhas[pk]
+                    for i in inicios_que_cabem(minutos, janelas, duracao):
+                        linha[grupo[i][0]] = 1
+
+    return (
+        [(pk, data) for pk, data, _, _ in horarios],
+        [(pk, nome, linhas[pk]) for pk, nome, _, _ in qualificados],
+    )
+
+
+def codificar_bits(livres):
+    pacote = bytearray((len(livres) + 7) // 8)
+    for i, livre in enumerate(livres):
+        if livre:
+            pacote[i >> 3] |= 0x80 >> (i & 7)
+    return base64.b64encode(bytes(pacote)).decode()
+
+
+def codificar_rle(livres):
+    corridas = []
+    atual, tamanho = 0, 0
+    for valor in livres:
+        if valor == atual:
+            tamanho += 1
+        else:
+            corridas.append(tamanho)
+            atual, tamanho = valor, 1
+    corridas.append(tamanho)
+    return corridas
+
+
+CODIFICACOES = {
+    'bits': codificar_bits,
+    'rle': codificar_rle,
+}
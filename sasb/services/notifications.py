@@ -1,18 +1,160 @@
-from django.core.mail import send_mail
+"""
+Caixa de saída de e-mails.
+
+Quem precisa avisar alguém só grava uma ``Notificacao`` (de preferência na
+mesma transação da operação que a originou, para que o aviso exista se, e
+somente se, a operação foi confirmada); o envio fica com o comando
+``processar_notificacoes``, fora do ciclo da requisição.
+
+O processamento pega um lote das notificações vencidas, reserva-as por
+``ARRENDAMENTO`` (se o processo morrer no meio, o lote volta à fila sozinho)
+e envia todas por uma única conexão de e-mail. Cada falha é reagendada com
+espera exponencial; depois de ``MAX_TENTATIVAS`` a notificação fica como
+``FALHOU`` (fila de mortos), com o último erro guardado. A entrega é "pelo
+menos uma vez": uma queda entre o envio e a gravação do resultado reenvia.
+Lembretes cujo agendamento já não está ativo são marcados como ``CANCELADA``
+na hora de reservar o lote, em vez de enviados.
+"""
+from datetime import timedelta
+
 from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .disponibilidade import STATUS_ATIVOS
+from .lembretes import PREFIXO_CHAVE
+
+TAMANHO_LOTE = 100
+MAX_TENTATIVAS = 5
+ESPERA_INICIAL = timedelta(minutes=1)
+ESPERA_MAXIMA = timedelta(hours=1)
+ARRENDAMENTO = timedelta(minutes=5)
+
+
+def enfileirar(destinatario, assunto, mensagem, agendamento=None):
+    from ..models import Notificacao
+
+    return Notificacao.objects.create(
+        destinatario=destinatario, assunto=assunto, mensagem=mensagem, agendamento=agendamento
+    )
+
+
+def espera(tentativas):
+    """Intervalo até a próxima tentativa depois de ``tentativas`` falhas."""
+    segundos = ESPERA_INICIAL.total_seconds() * 2.0 ** (tentativas - 1)
+    return timedelta(seconds=min(segundos, ESPERA_MAXIMA.total_seconds()))
+
+
+def _reservar_lote(tamanho, agora):
+    from ..models import Notificacao
+
+    with transaction.atomic():
+        vencidas = Notificacao.objects.filter(status='PENDENTE', proxima_tentativa__lte=agora)
+        # Agendamento cancelado ou excluído (agendamento nulo) depois de enfileirado o lembrete
+        vencidas.filter(chave__startswith=PREFIXO_CHAVE).exclude(
+            agendamento__status__in=STATUS_ATIVOS
+        ).update(status='CANCELADA')
+        vencidas = vencidas.order_by('proxima_tentativa', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            vencidas = vencidas.select_for_update(skip_locked=True)
+        lote = list(vencidas[:tamanho])
+        if lote:
+            Notificacao.objects.filter(pk__in=[n.pk for n in lote]).update(
+                proxima_tentativa=agora + ARRENDAMENTO
+            )
+    return lote
+
+
+def processar_lote(tamanho=TAMANHO_LOTE, conexao=None):
+    """
+    Envia um lote de notificações vencidas e devolve ``(enviadas,
+    reagendadas, descartadas)``; ``(0, 0, 0)`` quando a fila está vazia.
+    """
+    from ..models import Notificacao
+
+    agora = timezone.now()
+    lote = _reservar_lote(tamanho, agora)
+    if not lote:
+        return 0, 0, 0
+
+    enviadas, falhas = [], []
+    conexao = conexao or get_connection()
+    try:
+        conexao.open()
+    except Exception as e:
+        # Sem conexão, o lote inteiro volta para a fila
+        falhas = [(notificacao, e) for notificacao in lote]
+    else:
+        try:
+            for notificacao in lote:
+                mensagem = EmailMessage(
+                    notificacao.assunto, notificacao.mensagem, settings.DEFAULT_FROM_EMAIL,
+                    [notificacao.destinatario],
+                )
+                try:
+                    conexao.send_messages([mensagem])
+                except Exception as e:
+                    falhas.append((notificacao, e))
+                else:
+                    enviadas.append(notificacao.pk)
+        finally:
+            conexao.close()
+
+    agora = timezone.now()
+    if enviadas:
+        Notificacao.objects.filter(pk__in=enviadas).update(
+            status='ENVIADA', enviada_em=agora, tentativas=F('tentativas') + 1, ultimo_erro=''
+        )
+    descartadas = 0
+    for notificacao, erro in falhas:
+        notificacao.tentativas += 1
+        notificacao.ultimo_erro = f'{type(erro).__name__}: {erro}'
+        if notificacao.tentativas >= MAX_TENTATIVAS:
+            notificacao.status = 'FALHOU'
+            descartadas += 1
+        else:
+            notificacao.proxima_tentativa = agora + espera(notificacao.tentativas)
+    if falhas:
+        Notificacao.objects.bulk_update(
+            [notificacao for notificacao, _ in falhas],
+            ['tentativas', 'ultimo_erro', 'status', 'proxima_tentativa'],
+        )
+    return len(enviadas), len(falhas) - descartadas, descartadas
+
+
+def processar_pendentes(tamanho=TAMANHO_LOTE):
+    """Esvazia a fila (só o que já venceu), lote a lote; devolve os totais
+    somados de ``processar_lote``."""
+    totais = [0, 0, 0]
+    while True:
+        resultado = processar_lote(tamanho)
+        if resultado == (0, 0, 0):
+            return tuple(totais)
+        totais = [total + parcial for total, parcial in zip(totais, resultado)]
+
 
 class NotificationService:
     @staticmethod
     def enviar_confirmacao_agendamento(agendamento):
-        send_mail(
+        """Enfileira a confirmação; chamada dentro da transação da reserva."""
+        if not agendamento.cliente.email:
+            return None
+        return enfileirar(
+            agendamento.cliente.email,
             'Confirmação de Agendamento',
-            f'Seu agendamento para {agendamento.servico.nome} foi confirmado.',
-            settings.DEFAULT_FROM_EMAIL,
-            [agendamento.cliente.email],
-            fail_silently=False,
+            f'Seu agendamento foi confirmado!\n'
+            f'Serviço: {agendamento.servico.nome}\n'
+            f'Data: {timezone.localtime(agendamento.data):%d/%m/%Y %H:%M}\n'
+            f'Profissional: {agendamento.funcionario.nome}\n',
+            agendamento=agendamento,
         )
 
     @staticmethod
-    def enviar_lembrete(agendamento):
-        # Enviar lembrete 24h antes
-        pass
\ No newline at end of file
+    def enviar_lembrete(agendamento, horas=24):
+        """Enfileira o lembrete de ``horas`` de antecedência, uma vez só; os
+        lembretes em massa saem do comando ``enviar_lembretes``."""
+        from .lembretes import enfileirar_lembrete
+
+        enfileirar_lembrete(agendamento, horas)
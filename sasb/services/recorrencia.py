@@ -0,0 +1,161 @@
+"""
+Agendamentos recorrentes.
+
+Uma ``RecorrenciaAgendamento`` descreve a série (semanal, a cada N semanas ou
+mensal no mesmo dia da semana) sem gravar anos de linhas de uma vez: as
+ocorrências são materializadas só até um horizonte móvel, na criação da série
+e depois periodicamente pelo comando ``materializar_recorrencias``.
+
+Cada materialização cria as ocorrências novas com ``reservar_lote`` em modo
+parcial: os conflitos de toda a série saem de uma única consulta sobre os
+agendamentos do profissional e do cliente, cruzada em memória com os
+intervalos da série, e as ocorrências em conflito são apenas puladas.
+
+Ocorrências na grade padrão de horários ganham o horário que a geração em
+lote criaria, se ainda não existir. Fora da grade, só valem horários já
+existentes: criar um horário público numa hora quebrada o abriria a todos os
+clientes, então a ocorrência é informada como indisponível.
+"""
+import calendar
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+from django.db import transaction
+from django.db.models import Case, F, Q, When
+from django.utils import timezone
+
+from .agendamento import AgendamentoService
+from .cache_respostas import DISPONIBILIDADE, invalidar
+from .disponibilidade import STATUS_ATIVOS
+from .horarios import na_grade
+
+HORIZONTE_PADRAO = timedelta(weeks=8)
+FORA_DA_GRADE = {'horario': 'Não há horário para esta ocorrência fora da grade de horários.'}
+
+
+def _enesimo_dia_da_semana(ano, mes, dia_semana, semana):
+    """Data do ``semana``-ésimo (0 = primeiro) ``dia_semana`` do mês; se o mês
+    não tiver tantos, vale o último."""
+    dia_semana_do_primeiro, dias_no_mes = calendar.monthrange(ano, mes)
+    primeiro = (dia_semana - dia_semana_do_primeiro) % 7 + 1
+    dia = primeiro + 7 * semana
+    while dia > dias_no_mes:
+        dia -= 7
+    return date(ano, mes, dia)
+
+
+def _datas(recorrencia):
+    """Datas (no fuso local) de todas as ocorrências, em ordem, sem limite."""
+    inicio = timezone.localtime(recorrencia.inicio).date()
+    passo = 0
+    while True:
+        if recorrencia.frequencia == 'MENSAL':
+            meses = inicio.month - 1 + passo * recorrencia.intervalo
+            yield _enesimo_dia_da_semana(
+                inicio.year + meses // 12, meses % 12 + 1, inicio.weekday(), (inicio.day - 1) // 7
+            )
+        else:
+            yield inicio + timedelta(weeks=passo * recorrencia.intervalo)
+        passo += 1
+
+
+def ocorrencias(recorrencia, depois=None, ate=None):
+    """
+    Inícios (datetimes) das ocorrências posteriores a ``depois`` e até ``ate``,
+    mantendo a hora local da primeira ocorrência.
+    """
+    hora = timezone.localtime(recorrencia.inicio).time()
+    for dia in _datas(recorrencia):
+        if recorrencia.data_fim and dia > recorrencia.data_fim:
+            break
+        momento = timezone.make_aware(datetime.combine(dia, hora))
+        if ate is not None and momento > ate:
+            break
+        if depois is None or momento > depois:
+            yield momento
+
+
+def materializar(recorrencia, ate=None):
+    """
+    Cria os agendamentos da série até ``ate`` (padrão: agora + horizonte) e
+    devolve ``[(data, erros), ...]`` das ocorrências novas, com ``erros``
+    ``None`` para as criadas.
+    """
+    from ..models import Agendamento, Horario
+
+    ate = ate or timezone.now() + HORIZONTE_PADRAO
+    depois = max(filter(None, [recorrencia.materializado_ate, timezone.now()]))
+    datas = list(ocorrencias(recorrencia, depois, ate)) if recorrencia.ativa else []
+
+    resultados = []
+    if datas:
+        vagas = Horario.capacidade_padrao()
+        novos = [Horario(data=data, vagas=vagas) for data in datas if na_grade(data)]
+        if novos:
+            Horario.objects.bulk_create(novos, ignore_conflicts=True)
+            invalidar(DISPONIBILIDADE)
+        horarios = {horario.data: horario for horario in Horario.objects.filter(data__in=datas)}
+
+        agendamentos = [
+            Agendamento(
+                data=data, cliente=recorrencia.cliente, servico=recorrencia.servico,
+                funcionario=recorrencia.funcionario, horario=horarios[data], recorrencia=recorrencia
+            )
+            for data in datas if data in horarios
+        ]
+        validacoes = iter(AgendamentoService.reservar_lote(agendamentos, atomico=False) if agendamentos else ())
+        resultados = [
+            (data, next(validacoes) if data in horarios else dict(FORA_DA_GRADE))
+            for data in datas
+        ]
+
+    if recorrencia.materializado_ate is None or ate > recorrencia.materializado_ate:
+        recorrencia.materializado_ate = ate
+        type(recorrencia).objects.filter(pk=recorrencia.pk).update(materializado_ate=ate)
+    return resultados
+
+
+def materializar_pendentes(horizonte=HORIZONTE_PADRAO):
+    """Estende até ``agora + horizonte`` todas as séries ativas ainda aquém dele.
+    Devolve ``(séries, agendamentos criados)``."""
+    from ..models import RecorrenciaAgendamento
+
+    ate = timezone.now() + horizonte
+    pendentes = RecorrenciaAgendamento.objects.filter(ativa=True).filter(
+        Q(materializado_ate__isnull=True) | Q(materializado_ate__lt=ate)
+    ).select_related('cliente', 'funcionario', 'servico')
+
+    series = criados = 0
+    for recorrencia in pendentes.iterator():
+        resultados = materializar(recorrencia, ate)
+        series += 1
+        criados += sum(erros is None for _, erros in resultados)
+    return series, criados
+
+
+def encerrar(recorrencia):
+    """Desativa a série e cancela, em lote, os seus agendamentos futuros.
+    Devolve o número de agendamentos cancelados."""
+    from ..models import Agendamento, Horario
+
+    with transaction.atomic():
+        recorrencia.ativa = False
+        recorrencia.save(update_fields=['ativa'])
+        futuros = Agendamento.objects.filter(
+            recorrencia=recorrencia, status__in=STATUS_ATIVOS, data__gt=timezone.now()
+        )
+        liberados = Counter(futuros.values_list('horario_id', flat=True))
+        if not liberados:
+            return 0
+        # update() não passa pelo auto_now
+        agora = timezone.now()
+        futuros.update(status='CANCELADO', atualizado_em=agora)
+        Horario.objects.filter(pk__in=liberados).update(
+            vagas=Case(*(
+                When(pk=horario_id, then=F('vagas') + quantidade)
+                for horario_id, quantidade in liberados.items()
+            )),
+            atualizado_em=agora,
+        )
+        invalidar(DISPONIBILIDADE)
+    return sum(liberados.values())
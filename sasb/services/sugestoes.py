@@ -0,0 +1,118 @@
+"""
+Sugestões de horários alternativos quando o horário pedido não está livre.
+
+Os candidatos são os pares (horário, profissional qualificado) livres numa
+janela em torno do horário pedido, ordenados por prioridade: o mesmo
+profissional em horários próximos, depois outros profissionais no mesmo
+horário e, por fim, outros profissionais em horários próximos; dentro de cada
+grupo, pela distância no tempo. A janela é percorrida do centro para fora e
+os k melhores são mantidos num heap, o que permite parar assim que nenhum
+candidato restante pode entrar no resultado.
+"""
+import heapq
+from bisect import bisect_left
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .disponibilidade import usar_indice
+from .jornada import obter_jornadas
+
+JANELA_PADRAO = timedelta(days=2)
+
+MESMO_PROFISSIONAL = 0
+MESMO_HORARIO = 1
+OUTRO_PROFISSIONAL = 2
+
+
+def _do_centro_para_fora(horarios, centro):
+    """Percorre ``horarios`` (ordenados por data) em ordem crescente de
+    distância a ``centro``."""
+    datas = [horario.data for horario in horarios]
+    direita = bisect_left(datas, centro)
+    esquerda = direita - 1
+    while esquerda >= 0 or direita < len(horarios):
+        if direita >= len(horarios) or (
+            esquerda >= 0 and centro - datas[esquerda] <= datas[direita] - centro
+        ):
+            yield horarios[esquerda]
+            esquerda -= 1
+        else:
+            yield horarios[direita]
+            direita += 1
+
+
+def _negar(chave):
+    return tuple(-valor for valor in chave)
+
+
+def _chave(item):
+    return _negar(item[0])
+
+
+def sugerir_alternativas(servico, horario, funcionario_id, k=3, janela=JANELA_PADRAO):
+    """
+    Devolve até ``k`` sugestões ``{'horario', 'funcionario_id',
+    'funcionario_nome', 'distancia_minutos'}`` para ``servico`` em torno de
+    ``horario``, da melhor para a pior.
+    """
+    from ..models import Funcionario, Horario
+
+    qualificados = {
+        pk: (nome, texto, versao)
+        for pk, nome, texto, versao in Funcionario.objects.filter(servicos=servico).values_list(
+            'id', 'nome', 'horario_trabalho', 'versao_jornada'
+        )
+    }
+    if not qualificados or k <= 0:
+        return []
+    jornadas = obter_jornadas(
+        qualificados, {pk: (texto, versao) for pk, (_, texto, versao) in qualificados.items()}
+    )
+
+    inicio = max(horario.data - janela, timezone.now())
+    fim = horario.data + janela
+    candidatos = list(Horario.objects.filter(
+        data__gt=inicio, data__lte=fim, disponivel=True, vagas__gt=0
+    ).order_by('data'))
+
+    duracao = max(servico.duracao, 1)
+    # Heap de máximo (chaves negadas) com os k melhores até aqui
+    melhores = []
+    with usar_indice() as indice:
+        indice.carregar(inicio, fim)
+        for candidato in _do_centro_para_fora(candidatos, horario.data):
+            distancia = abs(candidato.data - horario.data) // timedelta(minutes=1)
+            instante = int(candidato.data.timestamp())
+            for pk in qualificados:
+                if pk == funcionario_id:
+                    if candidato.pk == horario.pk:
+                        continue
+                    grupo = MESMO_PROFISSIONAL
+                else:
+                    grupo = MESMO_HORARIO if distancia == 0 else OUTRO_PROFISSIONAL
+                chave = (grupo, distancia, instante, pk)
+                if len(melhores) == k and chave >= _chave(melhores[0]):
+                    continue
+                if not (jornadas[pk].atende(candidato.data, duracao)
+                        and indice.funcionario_livre(pk, candidato.data, duracao)):
+                    continue
+                item = (_negar(chave), candidato)
+                if len(melhores) < k:
+                    heapq.heappush(melhores, item)
+                else:
+                    heapq.heapreplace(melhores, item)
+            # Distâncias só crescem: se o pior dos k já é do mesmo profissional,
+            # nenhum candidato mais distante pode entrar
+            if len(melhores) == k and _chave(melhores[0])[0] == MESMO_PROFISSIONAL:
+                break
+
+    return [
+        {
+            'horario': candidato,
+            'funcionario_id': chave[3],
+            'funcionario_nome': qualificados[chave[3]][0],
+            'distancia_minutos': chave[1],
+        }
+        for chave, candidato in sorted((_chave(item), item[1]) for item in melhores)
+    ]
@@ -0,0 +1,99 @@
+"""
+Validação de novos agendamentos.
+
+Todas as regras (conflito do funcionário, vaga livre no horário,
+conflito do cliente, data passada e horário de trabalho) são verificadas de
+uma vez: os conflitos e a disponibilidade saem de uma única consulta
+agregada sobre o horário, ou do índice de disponibilidade quando há um ativo.
+A jornada do funcionário vem compilada do cache (ver ``jornada``). O
+resultado fica memorizado na instância, de modo que serializer, view e
+``Agendamento.save`` não repetem a validação. Como a chave da memória não
+reflete o estado do banco, a reserva valida de novo sob as travas, com
+``revalidar_agendamento``.
+"""
+from datetime import timedelta
+
+from django.db.models import Exists
+from django.utils import timezone
+
+from .disponibilidade import STATUS_ATIVOS, indice_ativo
+
+
+def _chave(agendamento):
+    horario = agendamento.horario
+    return (
+        agendamento.horario_id, horario.data, horario.disponivel, horario.vagas,
+        agendamento.funcionario_id, agendamento.cliente_id, agendamento.servico_id,
+    )
+
+
+def validar_agendamento(agendamento):
+    """
+    Devolve ``None`` se o agendamento pode ser criado, ou o dicionário de
+    erros no formato de ``ValidationError``.
+    """
+    chave = _chave(agendamento)
+    memo = agendamento.__dict__.get('_validacao')
+    if memo is not None and memo[0] == chave:
+        return memo[1]
+
+    erros = _validar(agendamento)
+    agendamento._validacao = (chave, erros)
+    return erros
+
+
+def revalidar_agendamento(agendamento):
+    """Como ``validar_agendamento``, mas sempre consultando o banco; o novo
+    resultado substitui o memorizado."""
+    erros = _validar(agendamento)
+    agendamento._validacao = (_chave(agendamento), erros)
+    return erros
+
+
+def _validar(agendamento):
+    from ..models import Agendamento, Horario
+
+    horario = agendamento.horario
+    funcionario = agendamento.funcionario
+    inicio = horario.data
+    duracao = agendamento.servico.duracao if agendamento.servico_id else 1
+
+    indice = indice_ativo()
+    if indice is not None:
+        disponivel = horario.disponivel and horario.vagas > 0
+        conflito_funcionario = not indice.funcionario_livre(funcionario.pk, inicio, duracao)
+        conflito_cliente = not indice.cliente_livre(agendamento.cliente_id, inicio, duracao)
+    else:
+        ativos = Agendamento.objects.filter(
+            status__in=STATUS_ATIVOS,
+            horario__data__lt=inicio + timedelta(minutes=max(duracao, 1)),
+            fim__gt=inicio,
+        )
+        linha = Horario.objects.filter(pk=horario.pk).annotate(
+            conflito_funcionario=Exists(ativos.filter(funcionario_id=funcionario.pk)),
+            conflito_cliente=Exists(ativos.filter(cliente_id=agendamento.cliente_id)),
+        ).values_list('disponivel', 'vagas', 'conflito_funcionario', 'conflito_cliente').first()
+        aberto, vagas, conflito_funcionario, conflito_cliente = linha or (False, 0, False, False)
+        disponivel = aberto and vagas > 0
+
+    # Verificar se o horário já está ocupado para este funcionário
+    if conflito_funcionario:
+        return {'horario': 'Este horário já está ocupado para o funcionário selecionado.'}
+
+    # Verificar se o horário está disponível
+    if not disponivel:
+        return {'horario': 'Este horário não está mais disponível.'}
+
+    # Verificar se o cliente já tem agendamento no mesmo horário
+    if conflito_cliente:
+        return {'horario': 'Você já possui um agendamento neste horário.'}
+
+    # Verificar se a data do agendamento é futura
+    if inicio <= timezone.now():
+        return {'horario': 'Não é possível fazer agendamentos em datas passadas.'}
+
+    # Verificar se o atendimento cabe no horário de trabalho do funcionário
+    if not funcionario.jornada().atende(inicio, duracao):
+        return {'horario': 'Este horário está fora do período de trabalho do funcionário.'}
+
+    return None
@@ -0,0 +1,74 @@
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from .api.autenticacao import revogar_token, revogar_tokens_do_usuario
+from .models import (
+    Agendamento, ExcecaoJornada, Funcionario, Horario, JornadaTrabalho, RegistroExclusao, Servico
+)
+from .services.cache_respostas import DISPONIBILIDADE, FUNCIONARIOS, SERVICOS, invalidar
+from .services.jornada import invalidar_jornada
+
+
+@receiver([post_save, post_delete], sender=JornadaTrabalho)
+@receiver([post_save, post_delete], sender=ExcecaoJornada)
+def invalidar_jornada_alterada(sender, instance, **kwargs):
+    carregado = sender.funcionario.is_cached(instance)
+    invalidar_jornada(instance.funcionario_id, instance.funcionario if carregado else None)
+
+
+@receiver(post_save, sender=Funcionario)
+def abrir_vagas_novo_funcionario(sender, instance, created, **kwargs):
+    # Um profissional a mais é uma vaga a mais em cada horário futuro
+    if created:
+        agora = timezone.now()
+        Horario.objects.filter(data__gt=agora).update(vagas=F('vagas') + 1, atualizado_em=agora)
+
+
+@receiver(post_delete, sender=Funcionario)
+def fechar_vagas_funcionario_removido(sender, instance, **kwargs):
+    agora = timezone.now()
+    Horario.objects.filter(data__gt=agora, vagas__gt=0).update(vagas=F('vagas') - 1, atualizado_em=agora)
+
+
+@receiver([post_save, post_delete], sender=Servico)
+def invalidar_respostas_servico(sender, instance, **kwargs):
+    invalidar(SERVICOS, DISPONIBILIDADE)
+
+
+@receiver([post_save, post_delete], sender=Funcionario)
+@receiver(m2m_changed, sender=Funcionario.servicos.through)
+def invalidar_respostas_funcionario(sender, instance, **kwargs):
+    invalidar(FUNCIONARIOS, DISPONIBILIDADE)
+
+
+@receiver([post_save, post_delete], sender=Horario)
+@receiver([post_save, post_delete], sender=Agendamento)
+@receiver([post_save, post_delete], sender=JornadaTrabalho)
+@receiver([post_save, post_delete], sender=ExcecaoJornada)
+def invalidar_respostas_disponibilidade(sender, instance, **kwargs):
+    invalidar(DISPONIBILIDADE)
+
+
+@receiver(post_delete, sender=Horario)
+@receiver(post_delete, sender=Agendamento)
+def registrar_exclusao(sender, instance, **kwargs):
+    RegistroExclusao.objects.create(
+        modelo=sender._meta.model_name, objeto_id=instance.pk,
+        cliente_id=getattr(instance, 'cliente_id', None), data=instance.data,
+    )
+
+
+@receiver(post_delete, sender=Token)
+def revogar_token_excluido(sender, instance, **kwargs):
+    revogar_token(instance.key)
+
+
+@receiver(post_save, sender=Funcionario)
+def revogar_tokens_funcionario(sender, instance, created, **kwargs):
+    # Senha, is_active ou dados do usuário mudaram; a exclusão apaga os
+    # tokens em cascata e cai no receptor acima
+    if not created:
+        revogar_tokens_do_usuario(instance.pk)
@@ -0,0 +1,411 @@
+import base64
+import importlib
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.apps import apps
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from sasb.models import Agendamento, Cliente, Funcionario, Horario, Servico
+from sasb.services.agendamento import AgendamentoService, ConflitoAgendamento
+from sasb.services.validacao import validar_agendamento
+
+
+class DadosAgendamentoMixin:
+    def criar_dados(self):
+        self.clientes = [
+            Cliente.objects.create(
+                username=f'cliente{i}', email=f'cliente{i}@teste.com',
+                nome=f'Cliente {i}', telefone='1'
+            )
+            for i in range(2)
+        ]
+        self.funcionario = Funcionario.objects.create(
+            username='func', email='func@teste.com', nome='Func', telefone='2',
+            cargo='Cabeleireiro', horario_trabalho='08:00-20:00'
+        )
+        self.servico = Servico.objects.create(nome='Corte', duracao=30, valor=Decimal('50.00'))
+        self.inicio = (timezone.now() + timedelta(days=1)).replace(
+            hour=10, minute=0, second=0, microsecond=0
+        )
+        self.horario = Horario.objects.create(data=self.inicio)
+
+    def reservar(self, cliente, horario=None):
+        horario = horario or self.horario
+        return AgendamentoService.reservar(
+            cliente=cliente, servico=self.servico, horario=horario,
+            funcionario=self.funcionario, data=horario.data
+        )
+
+
+class AgendamentoServiceTestCase(DadosAgendamentoMixin, TestCase):
+    def setUp(self):
+        self.criar_dados()
+
+    def test_reserva_toma_a_vaga(self):
+        vagas = self.horario.vagas
+        agendamento = self.reservar(self.clientes[0])
+        self.assertEqual(agendamento.status, 'AGENDADO')
+        self.horario.refresh_from_db()
+        self.assertEqual(self.horario.vagas, vagas - 1)
+        self.assertTrue(self.horario.disponivel)
+
+    def test_vaga_tomada_por_reserva_concorrente(self):
+        agendamento = Agendamento(
+            data=self.inicio, cliente=self.clientes[0], servico=self.servico,
+            horario=self.horario, funcionario=self.funcionario
+        )
+        self.assertIsNone(validar_agendamento(agendamento))
+
+        # Outra requisição tomou a última vaga depois da validação
+        Horario.objects.filter(pk=self.horario.pk).update(vagas=0)
+        with self.assertRaises(ConflitoAgendamento):
+            AgendamentoService.reservar(agendamento)
+        self.assertEqual(Agendamento.objects.count(), 0)
+
+    def test_revalida_sob_a_trava(self):
+        meia_hora_depois = Horario.objects.create(data=self.inicio + timedelta(minutes=30))
+        agendamento = Agendamento(
+            data=meia_hora_depois.data, cliente=self.clientes[0], servico=self.servico,
+            horario=meia_hora_depois, funcionario=self.funcionario
+        )
+        self.assertIsNone(validar_agendamento(agendamento))
+
+        # Entre a validação e a reserva, outra requisição ocupa o profissional
+        # das 10:00 às 11:00, num horário diferente
+        longo = Servico.objects.create(nome='Coloração', duracao=60, valor=Decimal('120.00'))
+        AgendamentoService.reservar(
+            cliente=self.clientes[1], servico=longo, horario=self.horario,
+            funcionario=self.funcionario, data=self.inicio
+        )
+        with self.assertRaises(ConflitoAgendamento):
+            AgendamentoService.reservar(agendamento)
+        self.assertEqual(Agendamento.objects.count(), 1)
+
+    def test_fim_acompanha_horario_e_servico(self):
+        agendamento = self.reservar(self.clientes[0])
+        self.assertEqual(agendamento.fim, self.inicio + timedelta(minutes=30))
+
+        agendamento = Agendamento.objects.get(pk=agendamento.pk)
+        agendamento.horario = Horario.objects.create(data=self.inicio + timedelta(hours=3))
+        agendamento.servico = Servico.objects.create(nome='Coloração', duracao=60, valor=Decimal('120.00'))
+        agendamento.save()
+        agendamento.refresh_from_db()
+        self.assertEqual(agendamento.fim, self.inicio + timedelta(hours=4))
+
+    def test_restricao_unica_de_reserva_ativa(self):
+        self.reservar(self.clientes[0])
+        duplicado = Agendamento(
+            data=self.inicio, cliente=self.clientes[1], servico=self.servico,
+            horario=self.horario, funcionario=self.funcionario
+        )
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Agendamento.objects.bulk_create([duplicado])
+
+        # Reservas canceladas não ocupam a restrição
+        duplicado.status = 'CANCELADO'
+        Agendamento.objects.bulk_create([duplicado])
+        self.assertEqual(Agendamento.objects.count(), 2)
+
+    def test_so_a_restricao_de_reserva_vira_conflito(self):
+        novo = Agendamento(
+            data=self.inicio, cliente=self.clientes[1], servico=self.servico,
+            horario=self.horario, funcionario=self.funcionario
+        )
+        chave_estrangeira = IntegrityError('FOREIGN KEY constraint failed: agendamento.horario_id')
+        with self.assertRaises(IntegrityError):
+            AgendamentoService._conflito_de_restricao(chave_estrangeira, [novo])
+
+        # Mensagem do PostgreSQL, com o nome da restrição
+        with self.assertRaises(ConflitoAgendamento):
+            AgendamentoService._conflito_de_restricao(IntegrityError(
+                'duplicate key value violates unique constraint "agendamento_horario_funcionario_ativo"'
+            ), [novo])
+
+        # Mensagem do SQLite: confirmada pela reserva ativa do par
+        sqlite = IntegrityError('UNIQUE constraint failed: agendamento.horario_id, agendamento.funcionario_id')
+        with self.assertRaises(IntegrityError):
+            AgendamentoService._conflito_de_restricao(sqlite, [novo])
+        self.reservar(self.clientes[0])
+        with self.assertRaises(ConflitoAgendamento):
+            AgendamentoService._conflito_de_restricao(sqlite, [novo])
+        # O mesmo par com reserva ativa não transforma outros erros em conflito
+        with self.assertRaises(IntegrityError):
+            AgendamentoService._conflito_de_restricao(chave_estrangeira, [novo])
+
+
+class AgendamentoServiceRetentativaTestCase(DadosAgendamentoMixin, TransactionTestCase):
+    def setUp(self):
+        self.criar_dados()
+
+    def test_repete_quando_banco_travado(self):
+        original = AgendamentoService._reservar
+        falhas = [OperationalError('database is locked')]
+
+        def reservar_com_trava(*args):
+            if falhas:
+                raise falhas.pop()
+            return original(*args)
+
+        with mock.patch.object(AgendamentoService, '_reservar', side_effect=reservar_com_trava), \
+                mock.patch.object(AgendamentoService, 'ESPERA_INICIAL', 0):
+            agendamento = self.reservar(self.clientes[0])
+        self.assertIsNotNone(agendamento.pk)
+
+    def test_nao_repete_outros_erros(self):
+        with mock.patch.object(
+            AgendamentoService, '_reservar', side_effect=OperationalError('no such table')
+        ) as reservar:
+            with self.assertRaises(OperationalError):
+                self.reservar(self.clientes[0])
+        self.assertEqual(reservar.call_count, 1)
+
+
+class ValidacaoAgendamentoTestCase(DadosAgendamentoMixin, TestCase):
+    def setUp(self):
+        self.criar_dados()
+
+    def novo(self, cliente, horario=None):
+        horario = horario or self.horario
+        return Agendamento(
+            data=horario.data, cliente=cliente, servico=self.servico,
+            horario=horario, funcionario=self.funcionario
+        )
+
+    def test_validacao_em_uma_consulta_e_memorizada(self):
+        agendamento = self.novo(self.clientes[0])
+        self.funcionario.jornada()  # jornada compilada já em cache
+        with CaptureQueriesContext(connection) as contexto:
+            self.assertIsNone(validar_agendamento(agendamento))
+            agendamento.clean()
+        self.assertEqual(len(contexto), 1)
+
+        # Mudar o horário invalida o resultado memorizado
+        agendamento.horario = Horario.objects.create(data=self.inicio + timedelta(hours=1))
+        with CaptureQueriesContext(connection) as contexto:
+            validar_agendamento(agendamento)
+        self.assertEqual(len(contexto), 1)
+
+    def test_conflitos_por_sobreposicao(self):
+        self.reservar(self.clientes[0])
+        quinze_minutos_antes = Horario.objects.create(data=self.inicio - timedelta(minutes=15))
+
+        erros = validar_agendamento(self.novo(self.clientes[1], quinze_minutos_antes))
+        self.assertEqual(
+            erros, {'horario': 'Este horário já está ocupado para o funcionário selecionado.'}
+        )
+
+    def test_horario_passado_e_fora_do_expediente(self):
+        passado = Horario.objects.create(data=self.inicio - timedelta(days=2))
+        noite = Horario.objects.create(data=self.inicio.replace(hour=21))
+        self.assertEqual(
+            validar_agendamento(self.novo(self.clientes[0], passado)),
+            {'horario': 'Não é possível fazer agendamentos em datas passadas.'}
+        )
+        self.assertEqual(
+            validar_agendamento(self.novo(self.clientes[0], noite)),
+            {'horario': 'Este horário está fora do período de trabalho do funcionário.'}
+        )
+
+
+class VagasHorarioTestCase(DadosAgendamentoMixin, TestCase):
+    def setUp(self):
+        self.criar_dados()
+        self.outro = Funcionario.objects.create(
+            username='func2', email='func2@teste.com', nome='Func 2', telefone='3',
+            cargo='Cabeleireiro', horario_trabalho='08:00-20:00'
+        )
+        self.horario.refresh_from_db()
+
+    def test_reserva_de_um_profissional_nao_esconde_o_horario(self):
+        self.assertEqual(self.horario.vagas, 2)
+        self.reservar(self.clientes[0])
+        AgendamentoService.reservar(
+            cliente=self.clientes[1], servico=self.servico, horario=self.horario,
+            funcionario=self.outro, data=self.inicio
+        )
+        self.horario.refresh_from_db()
+        self.assertEqual(self.horario.vagas, 0)
+        self.assertEqual(Horario.objects.filter(vagas__gt=0).count(), 0)
+
+    def test_contador_so_muda_na_transicao_de_status(self):
+        agendamento = self.reservar(self.clientes[0])
+        with CaptureQueriesContext(connection) as contexto:
+            agendamento.confirmar_agendamento()
+        self.assertFalse(any('UPDATE "horario"' in q['sql'] for q in contexto.captured_queries))
+
+        agendamento.cancelar_agendamento()
+        agendamento.cancelar_agendamento()
+        self.horario.refresh_from_db()
+        self.assertEqual(self.horario.vagas, 2)
+
+        # Status lido do banco também conta como estado anterior
+        Agendamento.objects.get(pk=agendamento.pk).cancelar_agendamento()
+        self.horario.refresh_from_db()
+        self.assertEqual(self.horario.vagas, 2)
+
+    def test_troca_de_horario_move_a_vaga(self):
+        agendamento = Agendamento.objects.get(pk=self.reservar(self.clientes[0]).pk)
+        outro_horario = Horario.objects.create(data=self.inicio + timedelta(hours=2))
+        agendamento.horario = outro_horario
+        agendamento.data = outro_horario.data
+        agendamento.save()
+
+        self.horario.refresh_from_db()
+        outro_horario.refresh_from_db()
+        self.assertEqual((self.horario.vagas, outro_horario.vagas), (2, 1))
+
+        # Cancelar devolve a vaga do horário atual
+        agendamento.cancelar_agendamento()
+        outro_horario.refresh_from_db()
+        self.assertEqual(outro_horario.vagas, 2)
+
+    def test_api_nao_move_reserva(self):
+        agendamento = self.reservar(self.clientes[0])
+        outro_horario = Horario.objects.create(data=self.inicio + timedelta(hours=2))
+        api = APIClient()
+        api.force_authenticate(user=self.funcionario)
+        url = f'/api/agendamentos/{agendamento.pk}/'
+
+        resposta = api.patch(url, {'horario': outro_horario.pk})
+        self.assertEqual(resposta.status_code, 400)
+        self.assertIn('horario', resposta.data)
+        agendamento.refresh_from_db()
+        self.assertEqual(agendamento.horario_id, self.horario.pk)
+
+        # Reenviar os mesmos valores continua valendo
+        self.assertEqual(api.patch(url, {'horario': self.horario.pk, 'servico': self.servico.pk}).status_code, 200)
+
+    def test_migracao_reabre_horarios_fechados_por_reserva(self):
+        migracao = importlib.import_module('sasb.migrations.0007_horario_vagas')
+        reservado = self.horario
+        self.reservar(self.clientes[0])
+        fechado_a_mao = Horario.objects.create(data=self.inicio + timedelta(hours=2))
+        # Estado deixado pelo código antigo
+        Horario.objects.filter(pk__in=[reservado.pk, fechado_a_mao.pk]).update(disponivel=False)
+
+        migracao.calcular_vagas(apps, None)
+        reservado.refresh_from_db()
+        fechado_a_mao.refresh_from_db()
+        self.assertEqual((reservado.disponivel, reservado.vagas), (True, 1))
+        self.assertEqual((fechado_a_mao.disponivel, fechado_a_mao.vagas), (False, 2))
+
+    def test_horario_fechado_nao_aceita_reserva(self):
+        Horario.objects.filter(pk=self.horario.pk).update(disponivel=False)
+        self.horario.refresh_from_db()
+        with self.assertRaises(ValidationError):
+            self.reservar(self.clientes[0])
+
+
+class ReservaEmLoteTestCase(DadosAgendamentoMixin, TestCase):
+    def setUp(self):
+        self.criar_dados()
+        self.horarios = [self.horario] + [
+            Horario.objects.create(data=self.inicio + timedelta(days=dia))
+            for dia in range(1, 6)
+        ]
+
+    def novos(self, horarios, cliente=None):
+        return [
+            Agendamento(
+                data=horario.data, cliente=cliente or self.clientes[0], servico=self.servico,
+                horario=horario, funcionario=self.funcionario
+            )
+            for horario in horarios
+        ]
+
+    def test_conflito_entre_itens_do_lote(self):
+        lote = self.novos([self.horario]) + self.novos([self.horario], self.clientes[1])
+        resultados = AgendamentoService.reservar_lote(lote)
+        self.assertIsNone(resultados[0])
+        self.assertEqual(
+            resultados[1], {'horario': 'Este horário já está ocupado para o funcionário selecionado.'}
+        )
+        self.assertEqual(Agendamento.objects.count(), 0)
+
+        lote = self.novos([self.horario]) + self.novos([self.horario], self.clientes[1])
+        resultados = AgendamentoService.reservar_lote(lote, atomico=False)
+        self.assertIsNone(resultados[0])
+        self.assertIsNotNone(lote[0].pk)
+        self.assertEqual(Agendamento.objects.count(), 1)
+        self.horario.refresh_from_db()
+        self.assertEqual(self.horario.vagas, 0)
+
+    def test_conflito_com_o_banco(self):
+        self.reservar(self.clientes[1], self.horarios[2])
+        resultados = AgendamentoService.reservar_lote(self.novos(self.horarios), atomico=False)
+        self.assertEqual([r is None for r in resultados], [True, True, False, True, True, True])
+        self.assertEqual(Agendamento.objects.filter(status='AGENDADO').count(), 6)
+        self.assertTrue(all(a.fim for a in Agendamento.objects.all()))
+
+    def test_vagas_relidas_sob_a_trava(self):
+        lote = self.novos(self.horarios[:3])
+        # Outra reserva tomou a última vaga depois de os horários serem lidos
+        Horario.objects.filter(pk=self.horarios[1].pk).update(vagas=0)
+        resultados = AgendamentoService.reservar_lote(lote, atomico=False)
+        self.assertEqual(resultados[1], {'horario': 'Este horário não está mais disponível.'})
+        self.assertEqual([r is None for r in resultados], [True, False, True])
+        self.assertEqual(
+            set(Agendamento.objects.values_list('horario_id', flat=True)),
+            {self.horarios[0].pk, self.horarios[2].pk}
+        )
+        self.assertEqual(Horario.objects.get(pk=self.horarios[1].pk).vagas, 0)
+
+    def test_consultas_constantes(self):
+        self.funcionario.jornada()
+        with CaptureQueriesContext(connection) as pequeno:
+            AgendamentoService.reservar_lote(self.novos(self.horarios[:2]))
+        with CaptureQueriesContext(connection) as grande:
+            AgendamentoService.reservar_lote(self.novos(self.horarios[2:], self.clientes[1]))
+        self.assertEqual(len(pequeno), len(grande))
+        self.assertEqual(Agendamento.objects.count(), 6)
+
+    def test_endpoint_lote(self):
+        api = APIClient()
+        api.force_authenticate(user=self.clientes[0])
+        itens = [
+            {'servico': self.servico.pk, 'horario': h.pk, 'funcionario': self.funcionario.pk}
+            for h in self.horarios[:3]
+        ]
+        resposta = api.post(
+            '/api/agendamentos/lote/',
+            {'modo': 'parcial', 'agendamentos': itens + [{**itens[0], 'servico': 999}]},
+            format='json'
+        )
+        self.assertEqual(resposta.status_code, 207)
+        self.assertEqual(resposta.data['criados'], 3)
+        self.assertEqual(
+            [r['status'] for r in resposta.data['resultados']],
+            ['criado', 'criado', 'criado', 'rejeitado']
+        )
+        self.assertEqual(resposta.data['resultados'][3]['erros'], {'servico': 'Serviço não encontrado.'})
+
+        resposta = api.post('/api/agendamentos/lote/', {'agendamentos': itens}, format='json')
+        self.assertEqual(resposta.status_code, 400)
+        self.assertEqual(Agendamento.objects.count(), 3)
+
+    def test_endpoint_lote_autenticado_como_funcionario(self):
+        # Com autenticação de verdade o usuário é sempre um Funcionario, cujo
+        # id nada tem a ver com o de um Cliente
+        self.funcionario.set_password('senha-forte-1')
+        self.funcionario.save()
+        api = APIClient()
+        api.credentials(HTTP_AUTHORIZATION='Basic ' + base64.b64encode(b'func:senha-forte-1').decode())
+        item = {'servico': self.servico.pk, 'horario': self.horarios[0].pk, 'funcionario': self.funcionario.pk}
+
+        resposta = api.post('/api/agendamentos/lote/', {'agendamentos': [item]}, format='json')
+        self.assertEqual(resposta.status_code, 400)
+        self.assertEqual(resposta.data['resultados'][0]['erros'], {'cliente': 'Este campo é obrigatório.'})
+        self.assertFalse(Agendamento.objects.exists())
+
+        resposta = api.post(
+            '/api/agendamentos/lote/', {'agendamentos': [{**item, 'cliente': self.clientes[1].pk}]}, format='json'
+        )
+        self.assertEqual(resposta.status_code, 201)
+        self.assertEqual(Agendamento.objects.get().cliente, self.clientes[1])
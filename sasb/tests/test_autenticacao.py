@@ -0,0 +1,165 @@
+import base64
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from sasb.api.autenticacao import AutenticacaoBasica, AutenticacaoToken, CacheLRU, _chave_token
+from sasb.models import Funcionario
+
+
+def _basica(usuario, senha):
+    return 'Basic ' + base64.b64encode(f'{usuario}:{senha}'.encode()).decode()
+
+
+class CacheLRUTestCase(TestCase):
+    def test_limite_e_expiracao(self):
+        cache = CacheLRU(maximo=2, ttl=10)
+        with mock.patch('sasb.api.autenticacao.time.monotonic', return_value=100):
+            cache.guardar('a', 1)
+            cache.guardar('b', 2)
+            self.assertEqual(cache.obter('a'), 1)
+            # 'b' é o menos usado
+            cache.guardar('c', 3)
+            self.assertIsNone(cache.obter('b'))
+            self.assertEqual(len(cache), 2)
+        with mock.patch('sasb.api.autenticacao.time.monotonic', return_value=110):
+            self.assertIsNone(cache.obter('a'))
+            self.assertEqual(len(cache), 1)
+
+
+class AutenticacaoBasicaTestCase(TestCase):
+    def setUp(self):
+        AutenticacaoBasica.credenciais.limpar()
+        self.funcionario = Funcionario.objects.create_user(
+            username='integracao', email='integracao@teste.com', password='senha-forte-1', nome='Integração',
+            telefone='0', cargo='Sistema', horario_trabalho='08:00-18:00'
+        )
+        self.api = APIClient()
+        self.url = '/api/agendamentos/'
+
+    def get(self, senha, usuario='integracao'):
+        with mock.patch('django.contrib.auth.base_user.check_password', wraps=hashers.check_password) as verificacao:
+            resposta = self.api.get(self.url, HTTP_AUTHORIZATION=_basica(usuario, senha))
+        return resposta.status_code, verificacao.call_count
+
+    def test_repeticao_nao_refaz_o_hash(self):
+        self.assertEqual(self.get('senha-forte-1'), (200, 1))
+        self.assertEqual(self.get('senha-forte-1'), (200, 0))
+        self.assertEqual(self.get('senha-forte-1'), (200, 0))
+
+    def test_falhas_nao_entram_no_cache(self):
+        self.assertEqual(self.get('errada'), (401, 1))
+        self.assertEqual(self.get('errada'), (401, 1))
+        self.assertEqual(len(AutenticacaoBasica.credenciais), 0)
+
+    def test_troca_de_senha_invalida(self):
+        self.get('senha-forte-1')
+        self.funcionario.set_password('senha-nova-2')
+        self.funcionario.save()
+
+        self.assertEqual(self.get('senha-forte-1'), (401, 1))
+        self.assertEqual(self.get('senha-nova-2'), (200, 1))
+        self.assertEqual(self.get('senha-nova-2'), (200, 0))
+
+    def test_usuario_desativado(self):
+        self.get('senha-forte-1')
+        Funcionario.objects.filter(pk=self.funcionario.pk).update(is_active=False)
+        self.assertEqual(self.get('senha-forte-1')[0], 401)
+
+    def test_so_o_cache_evita_o_hash(self):
+        self.get('senha-forte-1')
+        for _ in range(5):
+            self.assertEqual(self.get('senha-forte-1'), (200, 0))
+        # Sem a entrada no cache, cada requisição volta a pagar o PBKDF2
+        with mock.patch.object(AutenticacaoBasica.credenciais, 'obter', return_value=None):
+            self.assertEqual(self.get('senha-forte-1'), (200, 1))
+            self.assertEqual(self.get('senha-forte-1'), (200, 1))
+
+
+# O LocMemCache faz aqui o papel do cache compartilhado entre os processos
+@override_settings(CACHES={
+    **settings.CACHES,
+    'tokens': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tokens'},
+})
+class AutenticacaoTokenTestCase(TestCase):
+    def setUp(self):
+        caches['tokens'].clear()
+        self.funcionario = Funcionario.objects.create_user(
+            username='painel', email='painel@teste.com', password='senha-forte-1', nome='Painel',
+            telefone='0', cargo='Sistema', horario_trabalho='08:00-18:00'
+        )
+        self.token = Token.objects.create(user=self.funcionario)
+        self.api = APIClient()
+        self.url = '/api/servicos/'
+
+    def get(self, key=None):
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.api.get(self.url, HTTP_AUTHORIZATION=f'Token {key or self.token.key}')
+        autenticacao = [q for q in consultas.captured_queries if 'authtoken_token' in q['sql']]
+        return resposta, len(autenticacao)
+
+    def test_repeticao_nao_consulta_o_token(self):
+        resposta, consultas = self.get()
+        self.assertEqual((resposta.status_code, consultas), (200, 1))
+        resposta, consultas = self.get()
+        self.assertEqual((resposta.status_code, consultas), (200, 0))
+        self.assertEqual(resposta.wsgi_request.user.pk, self.funcionario.pk)
+
+    def test_so_o_cache_compartilhado_guarda_o_token(self):
+        self.get()
+        self.assertIsNotNone(caches['tokens'].get(_chave_token(self.token.key)))
+        # Revogação feita por outro processo: a entrada some do cache
+        # compartilhado e a próxima requisição volta ao banco
+        caches['tokens'].delete(_chave_token(self.token.key))
+        self.assertEqual(self.get()[1], 1)
+
+    @override_settings(CACHES=settings.CACHES)
+    def test_sem_o_alias_consulta_o_banco(self):
+        self.assertEqual(self.get()[1], 1)
+        resposta, consultas = self.get()
+        self.assertEqual((resposta.status_code, consultas), (200, 1))
+        self.token.delete()
+        self.assertEqual(self.get(self.token.key)[0].status_code, 401)
+
+    def test_exclusao_do_token_revoga(self):
+        key = self.token.key
+        self.get()
+        self.token.delete()
+        self.assertEqual(self.get(key)[0].status_code, 401)
+
+    def test_gravacao_do_usuario_revoga(self):
+        self.get()
+        self.funcionario.is_active = False
+        self.funcionario.save()
+        self.assertEqual(self.get()[0].status_code, 401)
+
+        self.funcionario.is_active = True
+        self.funcionario.nome = 'Painel 2'
+        self.funcionario.save()
+        resposta, consultas = self.get()
+        self.assertEqual((resposta.status_code, consultas), (200, 1))
+        self.assertEqual(resposta.wsgi_request.user.nome, 'Painel 2')
+
+    def test_exclusao_do_usuario_revoga(self):
+        key = self.token.key
+        self.get()
+        self.funcionario.delete()
+        self.assertEqual(self.get(key)[0].status_code, 401)
+
+    def test_token_invalido_nao_entra_no_cache(self):
+        self.assertEqual(self.get('0' * 40)[0].status_code, 401)
+        self.assertIsNone(caches['tokens'].get(_chave_token('0' * 40)))
+
+    def test_requisicoes_recebem_copias(self):
+        usuario, _ = AutenticacaoToken().authenticate_credentials(self.token.key)
+        usuario.nome = 'Alterado'
+        outro, token = AutenticacaoToken().authenticate_credentials(self.token.key)
+        self.assertEqual(outro.nome, 'Painel')
+        self.assertIs(token.user, outro)
@@ -0,0 +1,85 @@
+from array import array
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from sasb.models import Agendamento, Cliente, Funcionario, Horario, Servico
+from sasb.services.busca import buscar_horarios_livres, inicios_que_cabem, janelas_livres
+
+
+class JanelasLivresTestCase(TestCase):
+    def test_desconta_ocupados_e_pausas(self):
+        faixas = array('H', [480, 720, 780, 1080])  # 08-12 e 13-18
+        ocupados = [(540, 600, 1), (570, 630, 2), (700, 800, 3)]
+        self.assertEqual(
+            janelas_livres(faixas, ocupados),
+            [(480, 540), (630, 700), (800, 1080)]
+        )
+
+    def test_inicios_que_cabem(self):
+        janelas = [(480, 540), (630, 700)]
+        minutos = [480, 520, 630, 660, 690]
+        self.assertEqual(list(inicios_que_cabem(minutos, janelas, 30)), [0, 2, 3])
+
+
+class BuscaHorariosLivresTestCase(TestCase):
+    def setUp(self):
+        self.cliente = Cliente.objects.create(
+            username='cliente', email='cliente@teste.com', nome='Cliente', telefone='1'
+        )
+        self.servico = Servico.objects.create(nome='Coloração', duracao=60, valor=Decimal('90.00'))
+        self.curto = Servico.objects.create(nome='Franja', duracao=15, valor=Decimal('20.00'))
+        self.funcionario = Funcionario.objects.create(
+            username='func', email='func@teste.com', nome='Func', telefone='2',
+            cargo='Cabeleireiro', horario_trabalho='08:00-12:00'
+        )
+        self.funcionario.servicos.add(self.servico, self.curto)
+        # Qualificado apenas para o serviço curto
+        outro = Funcionario.objects.create(
+            username='outro', email='outro@teste.com', nome='Outro', telefone='3',
+            cargo='Cabeleireiro', horario_trabalho='08:00-12:00'
+        )
+        outro.servicos.add(self.curto)
+
+        self.dia = (timezone.now() + timedelta(days=1)).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+        self.horarios = {
+            minuto: Horario.objects.create(data=self.dia + timedelta(minutes=minuto))
+            for minuto in range(480, 720, 15)
+        }
+        # Ocupado das 10:00 às 10:15
+        Agendamento.objects.create(
+            data=self.dia + timedelta(hours=10), cliente=self.cliente, servico=self.curto,
+            horario=self.horarios[600], funcionario=self.funcionario
+        )
+
+    def test_apenas_inicios_com_duracao_contigua(self):
+        horarios = Horario.objects.filter(data__date=self.dia.date())
+        livres = buscar_horarios_livres(self.servico, horarios)
+        minutos = [(h.data - self.dia) // timedelta(minutes=1) for h, _ in livres]
+        # 09:15 em diante esbarra no agendamento das 10:00; 11:15 passa do expediente
+        self.assertEqual(minutos, [480, 495, 510, 525, 540, 615, 630, 645, 660])
+        self.assertTrue(all(funcionarios == [self.funcionario.pk] for _, funcionarios in livres))
+
+    def test_uma_consulta_por_periodo(self):
+        horarios = list(Horario.objects.all())
+        buscar_horarios_livres(self.servico, horarios)  # aquece o cache das jornadas
+        with CaptureQueriesContext(connection) as contexto:
+            buscar_horarios_livres(self.servico, horarios)
+        # Profissionais qualificados e ocupação do período
+        self.assertEqual(len(contexto), 2)
+
+    def test_servico_sem_profissional_livre(self):
+        self.assertEqual(
+            self.servico.buscar_horarios_disponiveis(self.dia, self.dia + timedelta(days=1))[-1].data,
+            self.dia + timedelta(minutes=660)
+        )
+        self.funcionario.servicos.remove(self.servico)
+        self.assertEqual(
+            self.servico.buscar_horarios_disponiveis(self.dia, self.dia + timedelta(days=1)), []
+        )
@@ -0,0 +1,168 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import caches
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from sasb.models import Agendamento, Cliente, Funcionario, Horario, Servico
+from sasb.services.agendamento import AgendamentoService
+
+
+class CacheRespostasTestCase(TestCase):
+    def setUp(self):
+        caches['respostas'].clear()
+        self.client = APIClient()
+        self.admin = Funcionario.objects.create_superuser(
+            username='admin', email='admin@teste.com', password='admin', nome='Admin', telefone='0',
+            cargo='Gerente', horario_trabalho='08:00-18:00'
+        )
+        self.cliente = Cliente.objects.create(
+            username='cliente', email='cliente@teste.com', nome='Cliente', telefone='1'
+        )
+        self.servico = Servico.objects.create(nome='Corte', duracao=30, valor=Decimal('50.00'))
+        self.admin.servicos.add(self.servico)
+        amanha = (timezone.now() + timedelta(days=1)).replace(hour=9, minute=0, second=0, microsecond=0)
+        self.horarios = [Horario.objects.create(data=amanha + timedelta(minutes=30 * i)) for i in range(4)]
+        self.url_horarios = f'/api/servicos/{self.servico.pk}/horarios_disponiveis/'
+
+    def test_segunda_leitura_vem_do_cache_sem_consultas(self):
+        primeira = self.client.get('/api/servicos/')
+        self.assertEqual(primeira['X-Cache'], 'MISS')
+        # Só a agregação da ETag vai ao banco
+        with self.assertNumQueries(1):
+            segunda = self.client.get('/api/servicos/')
+        self.assertEqual(segunda['X-Cache'], 'HIT')
+        self.assertEqual(segunda.json(), primeira.json())
+
+        # Parâmetros diferentes são outra entrada
+        self.assertEqual(self.client.get('/api/servicos/?fields=nome')['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(f'/api/servicos/{self.servico.pk}/')['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(f'/api/servicos/{self.servico.pk}/')['X-Cache'], 'HIT')
+
+    def test_gravar_servico_invalida_catalogo(self):
+        self.client.get('/api/servicos/')
+        self.servico.nome = 'Corte e escova'
+        self.servico.save()
+
+        resposta = self.client.get('/api/servicos/')
+        self.assertEqual(resposta['X-Cache'], 'MISS')
+        self.assertEqual(resposta.json()['results'][0]['nome'], 'Corte e escova')
+
+    def test_agendamento_invalida_so_a_disponibilidade(self):
+        self.client.force_authenticate(self.cliente)
+        self.assertEqual(len(self.client.get(self.url_horarios).json()), 4)
+        self.client.get('/api/servicos/')
+
+        Agendamento.objects.create(
+            data=self.horarios[0].data, cliente=self.cliente, servico=self.servico,
+            horario=self.horarios[0], funcionario=self.admin
+        )
+
+        resposta = self.client.get(self.url_horarios)
+        self.assertEqual(resposta['X-Cache'], 'MISS')
+        self.assertEqual(len(resposta.json()), 3)
+        self.assertEqual(self.client.get('/api/servicos/')['X-Cache'], 'HIT')
+
+    def test_reserva_em_lote_invalida_a_disponibilidade(self):
+        self.client.get(self.url_horarios)
+        erros = AgendamentoService.reservar_lote([
+            Agendamento(
+                data=horario.data, cliente=self.cliente, servico=self.servico,
+                horario=horario, funcionario=self.admin
+            )
+            for horario in self.horarios[:2]
+        ])
+        self.assertEqual(erros, [None, None])
+
+        resposta = self.client.get(self.url_horarios)
+        self.assertEqual(resposta['X-Cache'], 'MISS')
+        self.assertEqual(len(resposta.json()), 2)
+
+    def test_estatisticas_de_acertos_e_falhas(self):
+        self.client.get('/api/servicos/')
+        self.client.get('/api/servicos/')
+        self.client.get('/api/servicos/')
+
+        self.client.force_authenticate(self.cliente)
+        self.assertEqual(self.client.get('/api/cache-respostas/').status_code, 403)
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(
+            self.client.get('/api/cache-respostas/').json(),
+            {'acertos': 2, 'falhas': 1, 'taxa_acerto': 0.6667}
+        )
+        self.assertEqual(self.client.delete('/api/cache-respostas/').status_code, 204)
+        self.assertEqual(self.client.get('/api/cache-respostas/').json()['falhas'], 0)
+
+
+class ETagTestCase(TestCase):
+    def setUp(self):
+        caches['respostas'].clear()
+        self.client = APIClient()
+        self.funcionario = Funcionario.objects.create(
+            username='func', email='func@teste.com', nome='Func', telefone='0',
+            cargo='Cabeleireiro', horario_trabalho='08:00-18:00'
+        )
+        self.clientes = [
+            Cliente.objects.create(
+                username=f'cliente{i}', email=f'cliente{i}@teste.com', nome=f'Cliente {i}', telefone='1'
+            )
+            for i in range(2)
+        ]
+        self.servico = Servico.objects.create(nome='Corte', duracao=30, valor=Decimal('50.00'))
+        amanha = (timezone.now() + timedelta(days=1)).replace(hour=9, minute=0, second=0, microsecond=0)
+        self.horarios = [Horario.objects.create(data=amanha + timedelta(minutes=30 * i)) for i in range(3)]
+        self.client.force_authenticate(self.clientes[0])
+
+    def agendar(self, horario, cliente):
+        return Agendamento.objects.create(
+            data=horario.data, cliente=cliente, servico=self.servico, horario=horario, funcionario=self.funcionario
+        )
+
+    def test_if_none_match_devolve_304_so_com_a_agregacao(self):
+        resposta = self.client.get('/api/servicos/')
+        etag = resposta['ETag']
+        self.assertTrue(etag.startswith('"'))
+
+        with self.assertNumQueries(1):
+            resposta = self.client.get('/api/servicos/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 304)
+        self.assertEqual(resposta['ETag'], etag)
+        self.assertEqual(self.client.get('/api/servicos/', HTTP_IF_NONE_MATCH=f'"outra", W/{etag}').status_code, 304)
+
+        self.servico.valor = Decimal('60.00')
+        self.servico.save()
+        resposta = self.client.get('/api/servicos/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertNotEqual(resposta['ETag'], etag)
+
+    def test_vagas_e_exclusoes_mudam_a_etag_dos_horarios(self):
+        etag = self.client.get('/api/horarios/')['ETag']
+
+        # A vaga é tomada com update(), fora do auto_now
+        self.agendar(self.horarios[0], self.clientes[0])
+        resposta = self.client.get('/api/horarios/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 200)
+        etag = resposta['ETag']
+
+        self.horarios[2].delete()
+        self.assertEqual(self.client.get('/api/horarios/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_etag_dos_agendamentos_do_cliente(self):
+        self.agendar(self.horarios[0], self.clientes[0])
+        url = f'/api/agendamentos/?cliente={self.clientes[0].pk}'
+        etag = self.client.get(url)['ETag']
+
+        # Agendamentos de outro cliente não afetam a lista filtrada
+        self.agendar(self.horarios[1], self.clientes[1])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.agendar(self.horarios[2], self.clientes[0])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_expansao_nao_tem_etag(self):
+        self.agendar(self.horarios[0], self.clientes[0])
+        resposta = self.client.get('/api/agendamentos/?expand=servico')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertNotIn('ETag', resposta)
@@ -0,0 +1,152 @@
+import os
+import time
+import unittest
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.cache import caches
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from sasb.models import Agendamento, Cliente, Funcionario, Horario, Servico
+from sasb.services.calendario import calendario_mes
+from sasb.services.disponibilidade import inicio_do_dia
+
+
+def _proximo_mes():
+    hoje = timezone.localdate()
+    return date(hoje.year + hoje.month // 12, hoje.month % 12 + 1, 1)
+
+
+class CalendarioTestCase(TestCase):
+    def setUp(self):
+        caches['respostas'].clear()
+        self.cliente = Cliente.objects.create(
+            username='cliente', email='cliente@teste.com', nome='Cliente', telefone='1'
+        )
+        self.servico = Servico.objects.create(nome='Escova', duracao=60, valor=Decimal('80.00'))
+        self.funcionarios = [
+            Funcionario.objects.create(
+                username=f'func{i}', email=f'func{i}@teste.com', nome=f'Func {i}', telefone='2',
+                cargo='Cabeleireiro', horario_trabalho='08:00-12:00'
+            )
+            for i in range(3)
+        ]
+        for funcionario in self.funcionarios[:2]:
+            funcionario.servicos.add(self.servico)
+
+        self.mes = _proximo_mes()
+        self.horarios = {}
+        for dia in range(3):
+            for minuto in range(480, 720, 30):
+                data = inicio_do_dia(self.mes + timedelta(days=dia)) + timedelta(minutes=minuto)
+                self.horarios[dia, minuto] = Horario.objects.create(data=data)
+
+    def test_totais_por_dia(self):
+        Agendamento.objects.create(
+            data=self.horarios[0, 480].data, cliente=self.cliente, servico=self.servico,
+            horario=self.horarios[0, 480], funcionario=self.funcionarios[0]
+        )
+        fechado = self.horarios[1, 600]
+        fechado.disponivel = False
+        fechado.save()
+
+        calendario_mes(self.mes.year, self.mes.month)
+        # Com as jornadas em cache: profissionais, horários e agendamentos
+        with self.assertNumQueries(3):
+            dias = calendario_mes(self.mes.year, self.mes.month)
+        # A reserva de 60 minutos das 08:00 ocupa também o horário das 08:30
+        self.assertEqual(dias[0], {'dia': self.mes, 'horarios_livres': 8, 'vagas': 22})
+        self.assertEqual(dias[1], {'dia': self.mes + timedelta(days=1), 'horarios_livres': 7, 'vagas': 21})
+        self.assertEqual(dias[2]['vagas'], 24)
+        self.assertEqual(dias[3]['horarios_livres'], 0)
+        self.assertEqual(dias[-1]['dia'].month, self.mes.month)
+
+    def test_totais_do_servico(self):
+        Agendamento.objects.create(
+            data=self.horarios[0, 480].data, cliente=self.cliente, servico=self.servico,
+            horario=self.horarios[0, 480], funcionario=self.funcionarios[0]
+        )
+        dias = calendario_mes(self.mes.year, self.mes.month, self.servico, por_profissional=True)
+        # Só dois profissionais fazem o serviço, e 60 minutos não cabem a partir das 11:30
+        self.assertEqual((dias[0]['horarios_livres'], dias[0]['vagas']), (7, 12))
+        self.assertEqual(dias[0]['vagas'], sum(dias[0]['profissionais'].values()))
+        self.assertEqual((dias[2]['horarios_livres'], dias[2]['vagas']), (7, 14))
+
+        # As vagas do horário continuam sendo o teto
+        Horario.objects.filter(pk=self.horarios[2, 480].pk).update(vagas=1)
+        dias = calendario_mes(self.mes.year, self.mes.month, self.servico)
+        self.assertEqual(dias[2]['vagas'], 13)
+
+    def test_por_profissional_com_a_duracao_do_servico(self):
+        Agendamento.objects.create(
+            data=self.horarios[0, 480].data, cliente=self.cliente, servico=self.servico,
+            horario=self.horarios[0, 480], funcionario=self.funcionarios[0]
+        )
+        dias = calendario_mes(self.mes.year, self.mes.month, self.servico, por_profissional=True)
+        primeiro, segundo = self.funcionarios[0].pk, self.funcionarios[1].pk
+        # 60 minutos cabem de 08:00 a 11:00; a reserva das 08:00 tira 08:00 e 08:30
+        self.assertEqual(dias[0]['profissionais'], {primeiro: 5, segundo: 7})
+        self.assertEqual(dias[2]['profissionais'], {primeiro: 7, segundo: 7})
+        self.assertEqual(dias[5]['profissionais'], {primeiro: 0, segundo: 0})
+
+    def test_endpoint(self):
+        api = APIClient()
+        api.force_authenticate(self.cliente)
+        url = '/api/agendamento-processo/calendario/'
+        mes = f'{self.mes:%Y-%m}'
+
+        resposta = api.get(url, {'mes': mes, 'servico_id': self.servico.pk, 'por_profissional': 1})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.data['mes'], mes)
+        self.assertEqual(resposta.json()['dias'][0]['profissionais'], {
+            str(self.funcionarios[0].pk): 7, str(self.funcionarios[1].pk): 7
+        })
+        self.assertNotIn('profissionais', api.get(url, {'mes': mes}).data['dias'][0])
+
+        self.assertEqual(api.get(url, {'mes': '2025/03'}).status_code, 400)
+        self.assertEqual(api.get(url, {'mes': mes, 'servico_id': 999}).status_code, 404)
+
+
+@unittest.skipUnless(os.environ.get('SASB_BENCHMARK'), 'defina SASB_BENCHMARK=1 para medir')
+class CalendarioDesempenhoTestCase(TestCase):
+    def test_salao_com_20_profissionais(self):
+        mes = _proximo_mes()
+        funcionarios = [
+            Funcionario.objects.create(
+                username=f'func{i}', email=f'func{i}@teste.com', nome=f'Func {i}', telefone='2',
+                cargo='Cabeleireiro', horario_trabalho='08:00-18:00'
+            )
+            for i in range(20)
+        ]
+        cliente = Cliente.objects.create(username='cliente', email='c@teste.com', nome='Cliente', telefone='1')
+        servico = Servico.objects.create(nome='Corte', duracao=30, valor=Decimal('50.00'))
+        horarios = Horario.objects.bulk_create([
+            Horario(data=inicio_do_dia(mes + timedelta(days=dia)) + timedelta(minutes=minuto), vagas=20)
+            for dia in range(28) for minuto in range(480, 1080, 15)
+        ])
+        Agendamento.objects.bulk_create([
+            Agendamento(
+                data=horario.data, fim=horario.data + timedelta(minutes=30), cliente=cliente, servico=servico,
+                horario=horario, funcionario=funcionarios[i % 20]
+            )
+            for i, horario in enumerate(horarios[::7])
+        ])
+        api = APIClient()
+        api.force_authenticate(cliente)
+
+        def medir(parametros, rodadas=3):
+            melhor = float('inf')
+            for _ in range(rodadas):
+                caches['respostas'].clear()
+                inicio = time.perf_counter()
+                resposta = api.get('/api/agendamento-processo/calendario/', parametros)
+                melhor = min(melhor, time.perf_counter() - inicio)
+                self.assertEqual(resposta.status_code, 200)
+            return melhor
+
+        por_dia = medir({'mes': f'{mes:%Y-%m}'})
+        por_profissional = medir({'mes': f'{mes:%Y-%m}', 'servico_id': servico.pk, 'por_profissional': 1})
+        print(f'\ncalendário de {len(horarios)} horários e 20 profissionais: '
+              f'por dia {por_dia * 1000:.1f} ms, por profissional {por_profissional * 1000:.1f} ms')
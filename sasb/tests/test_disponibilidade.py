@@ -0,0 +1,92 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from sasb.models import Agendamento, Cliente, Funcionario, Horario, Servico
+from sasb.services.disponibilidade import IndiceDisponibilidade, usar_indice
+
+
+class IndiceDisponibilidadeTestCase(TestCase):
+    def setUp(self):
+        self.cliente = Cliente.objects.create(
+            username='cliente', email='cliente@teste.com', nome='Cliente', telefone='1'
+        )
+        self.funcionarios = [
+            Funcionario.objects.create(
+                username=f'func{i}', email=f'func{i}@teste.com', nome=f'Func {i}',
+                telefone='2', cargo='Cabeleireiro', horario_trabalho='08:00-20:00'
+            )
+            for i in range(3)
+        ]
+        self.servico = Servico.objects.create(nome='Corte', duracao=60, valor=Decimal('50.00'))
+        self.inicio = (timezone.now() + timedelta(days=1)).replace(
+            hour=10, minute=0, second=0, microsecond=0
+        )
+        self.horario = Horario.objects.create(data=self.inicio)
+        self.agendamento = Agendamento.objects.create(
+            data=self.inicio, cliente=self.cliente, servico=self.servico,
+            horario=self.horario, funcionario=self.funcionarios[0]
+        )
+
+    def test_sobreposicao_pela_duracao(self):
+        indice = IndiceDisponibilidade()
+        f = self.funcionarios[0].pk
+        self.assertFalse(indice.funcionario_livre(f, self.inicio))
+        self.assertFalse(indice.funcionario_livre(f, self.inicio + timedelta(minutes=30)))
+        self.assertFalse(indice.funcionario_livre(f, self.inicio - timedelta(minutes=30), 45))
+        self.assertTrue(indice.funcionario_livre(f, self.inicio + timedelta(minutes=60)))
+        self.assertTrue(indice.funcionario_livre(f, self.inicio - timedelta(minutes=30), 30))
+        self.assertFalse(indice.cliente_livre(self.cliente.pk, self.inicio))
+        self.assertTrue(indice.funcionario_livre(self.funcionarios[1].pk, self.inicio))
+
+    def test_semana_inteira_em_uma_consulta(self):
+        indice = IndiceDisponibilidade()
+        with CaptureQueriesContext(connection) as contexto:
+            indice.carregar(self.inicio, self.inicio + timedelta(days=7))
+            for dia in range(7):
+                for hora in range(8, 20):
+                    momento = self.inicio.replace(hour=hora) + timedelta(days=dia)
+                    for funcionario in self.funcionarios:
+                        indice.funcionario_livre(funcionario.pk, momento, 30)
+        self.assertEqual(len(contexto), 1)
+
+    def test_atualizacao_incremental(self):
+        with usar_indice() as indice:
+            indice.carregar(self.inicio)
+            self.assertIn(self.funcionarios[0].pk, indice.funcionarios_ocupados(self.inicio))
+
+            self.agendamento.cancelar_agendamento()
+            with CaptureQueriesContext(connection) as contexto:
+                self.assertTrue(self.horario.esta_disponivel_para_funcionario(self.funcionarios[0]))
+                self.assertTrue(self.horario.esta_disponivel_para_cliente(self.cliente))
+            self.assertEqual(len(contexto), 0)
+
+            novo = Agendamento.objects.create(
+                data=self.inicio, cliente=self.cliente, servico=self.servico,
+                horario=self.horario, funcionario=self.funcionarios[1]
+            )
+            self.assertFalse(indice.funcionario_livre(self.funcionarios[1].pk, self.inicio))
+            self.assertEqual(
+                set(self.horario.buscar_profissionais_disponiveis().values_list('id', flat=True)),
+                {self.funcionarios[0].pk, self.funcionarios[2].pk}
+            )
+            self.assertEqual(novo.status, 'AGENDADO')
+
+    def test_intervalo_atravessando_meia_noite(self):
+        tarde = self.inicio.replace(hour=23, minute=30)
+        horario = Horario.objects.create(data=tarde)
+        Agendamento.objects.bulk_create([Agendamento(
+            data=tarde, cliente=self.cliente, servico=self.servico,
+            horario=horario, funcionario=self.funcionarios[2]
+        )])
+        indice = IndiceDisponibilidade()
+        self.assertFalse(indice.funcionario_livre(
+            self.funcionarios[2].pk, tarde + timedelta(minutes=45)
+        ))
+        self.assertTrue(indice.funcionario_livre(
+            self.funcionarios[2].pk, tarde + timedelta(minutes=60)
+        ))
@@ -0,0 +1,96 @@
+import csv
+import io
+import json
+from datetime import timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from sasb.models import Agendamento, Cliente, DadosPagamento, Funcionario, Horario, Pagamento, Servico
+
+
+class ExportacaoTestCase(TestCase):
+    def setUp(self):
+        self.admin = Funcionario.objects.create_superuser(
+            username='admin', email='admin@teste.com', password='admin', nome='Ana', telefone='0',
+            cargo='Gerente', horario_trabalho='00:00-23:59'
+        )
+        self.cliente = Cliente.objects.create(
+            username='cliente', email='cliente@teste.com', nome='Bruno, o Cliente', telefone='1'
+        )
+        self.servico = Servico.objects.create(nome='Corte', duracao=15, valor=Decimal('50.00'))
+        self.dia = (timezone.now() + timedelta(days=1)).replace(hour=8, minute=0, second=0, microsecond=0)
+        horarios = Horario.objects.bulk_create([
+            Horario(data=self.dia + timedelta(days=i // 40, minutes=15 * (i % 40)), vagas=1) for i in range(120)
+        ])
+        dados = DadosPagamento.objects.create(numero_cartao='4111111111111111', valor=Decimal('50.00'), metodo='PIX')
+        self.pagamento = Pagamento.objects.create(status='CONFIRMADO', dados_pagamento=dados)
+        self.agendamentos = Agendamento.objects.bulk_create([
+            Agendamento(
+                data=horario.data, fim=horario.data + timedelta(minutes=15), cliente=self.cliente,
+                servico=self.servico, horario=horario, funcionario=self.admin,
+                status='CANCELADO' if i % 10 == 0 else 'AGENDADO',
+                pagamento=self.pagamento if i == 1 else None,
+            )
+            for i, horario in enumerate(horarios)
+        ])
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+
+    def baixar(self, url):
+        resposta = self.api.get(url)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertTrue(resposta.streaming)
+        return resposta, b''.join(resposta.streaming_content).decode()
+
+    def test_csv_com_colunas_relacionadas_numa_consulta(self):
+        resposta = self.api.get('/api/agendamentos/export/')
+        self.assertEqual(resposta['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('agendamentos.csv', resposta['Content-Disposition'])
+        # As linhas só são lidas quando o conteúdo é consumido, numa consulta
+        with self.assertNumQueries(1):
+            conteudo = b''.join(resposta.streaming_content).decode()
+
+        linhas = list(csv.DictReader(io.StringIO(conteudo)))
+        self.assertEqual(len(linhas), 120)
+        self.assertEqual(linhas[1]['cliente'], 'Bruno, o Cliente')
+        self.assertEqual(linhas[1]['profissional'], 'Ana')
+        self.assertEqual(linhas[1]['servico'], 'Corte')
+        self.assertEqual(linhas[1]['valor'], '50.00')
+        self.assertEqual(linhas[1]['pagamento_status'], 'CONFIRMADO')
+        self.assertEqual(linhas[2]['pagamento_status'], '')
+        self.assertEqual([int(linha['id']) for linha in linhas], [a.pk for a in self.agendamentos])
+
+    def test_ndjson_com_filtros_de_data_e_status(self):
+        amanha = self.dia.date()
+        _, conteudo = self.baixar(
+            f'/api/agendamentos/export/?formato=ndjson&data_inicio={amanha + timedelta(days=1)}'
+            f'&data_fim={amanha + timedelta(days=1)}&status=CANCELADO'
+        )
+        itens = [json.loads(linha) for linha in conteudo.splitlines()]
+        self.assertEqual([item['id'] for item in itens], [self.agendamentos[i].pk for i in (40, 50, 60, 70)])
+        self.assertEqual(itens[0]['valor'], '50.00')
+
+    def test_pagamentos(self):
+        resposta, conteudo = self.baixar('/api/pagamentos/export/?formato=ndjson')
+        self.assertEqual(resposta['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        item = json.loads(conteudo)
+        self.assertEqual(item['metodo'], 'PIX')
+        self.assertEqual(item['agendamento'], self.agendamentos[1].pk)
+        self.assertEqual(item['cliente'], 'Bruno, o Cliente')
+        self.assertNotIn('numero_cartao', item)
+
+    def test_o_accept_nao_interfere(self):
+        resposta = self.api.get('/api/agendamentos/export/', HTTP_ACCEPT='text/csv')
+        self.assertEqual(resposta.status_code, 200)
+
+    def test_parametros_invalidos_e_permissao(self):
+        self.assertEqual(self.api.get('/api/agendamentos/export/?formato=xlsx').status_code, 400)
+        self.assertEqual(self.api.get('/api/agendamentos/export/?status=PERDIDO').status_code, 400)
+        self.assertEqual(
+            self.api.get('/api/agendamentos/export/?data_inicio=2025-02-02&data_fim=2025-02-01').status_code, 400
+        )
+        self.api.force_authenticate(self.cliente)
+        self.assertEqual(self.api.get('/api/pagamentos/export/').status_code, 403)
@@ -0,0 +1,135 @@
+from datetime import date, time, timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from sasb.models import Cliente, Funcionario, Horario, JornadaTrabalho
+from sasb.services.horarios import gerar_horarios, iterar_inicios
+
+SEGUNDA = date(2030, 1, 7)
+
+
+class GeracaoHorariosTestCase(TestCase):
+    def setUp(self):
+        self.manha = Funcionario.objects.create(
+            username='manha', email='manha@teste.com', nome='Manhã', telefone='1',
+            cargo='Cabeleireiro', horario_trabalho='08:10-12:00'
+        )
+        self.tarde = Funcionario.objects.create(
+            username='tarde', email='tarde@teste.com', nome='Tarde', telefone='2',
+            cargo='Manicure', horario_trabalho='11:00-14:00'
+        )
+
+    def test_grade_sobre_a_uniao_das_jornadas(self):
+        inicios = list(iterar_inicios(SEGUNDA, SEGUNDA, intervalo=30))
+        horas = [(i.hour, i.minute) for i in inicios]
+        # 08:10 alinha para 08:30; a última vaga de 30 min termina às 14:00
+        self.assertEqual(horas[0], (8, 30))
+        self.assertEqual(horas[-1], (13, 30))
+        self.assertEqual(len(horas), 11)
+
+    def test_pausas_e_dias_sem_jornada(self):
+        JornadaTrabalho.objects.create(
+            funcionario=self.manha, dia_semana=0, inicio=time(8, 0), fim=time(9, 0)
+        )
+        JornadaTrabalho.objects.create(
+            funcionario=self.manha, dia_semana=0, inicio=time(10, 0), fim=time(11, 0)
+        )
+        inicios = list(iterar_inicios(SEGUNDA, SEGUNDA + timedelta(days=1), 60, [self.manha.pk]))
+        self.assertEqual([(i.day, i.hour) for i in inicios], [(7, 8), (7, 10)])
+
+    def test_geracao_idempotente(self):
+        resumo = gerar_horarios(SEGUNDA, SEGUNDA + timedelta(days=6), intervalo=15, tamanho_lote=50)
+        # 08:15..13:45 em passos de 15 min, 7 dias
+        self.assertEqual(resumo['gerados'], 23 * 7)
+        self.assertEqual(resumo['inseridos'], 23 * 7)
+
+        resumo = gerar_horarios(SEGUNDA, SEGUNDA + timedelta(days=6), intervalo=15, tamanho_lote=50)
+        self.assertEqual(resumo['inseridos'], 0)
+        self.assertEqual(Horario.objects.count(), 23 * 7)
+
+    def test_comando(self):
+        saida = StringIO()
+        call_command('gerar_horarios', '2030-01-07', '2030-01-08', '--intervalo', '60', stdout=saida)
+        self.assertIn('10 horários gerados (10 novos)', saida.getvalue())
+        self.assertIn('linhas/s', saida.getvalue())
+
+
+class GeracaoHorariosApiTestCase(APITestCase):
+    def setUp(self):
+        self.funcionario = Funcionario.objects.create(
+            username='func', email='func@teste.com', nome='Func', telefone='1',
+            cargo='Cabeleireiro', horario_trabalho='09:00-12:00'
+        )
+        self.admin = Cliente.objects.create(
+            username='admin', email='admin@teste.com', nome='Admin', telefone='1', is_staff=True
+        )
+        self.client.force_authenticate(user=self.admin)
+
+    def test_gerar(self):
+        dados = {'data_inicio': '2030-01-07', 'data_fim': '2030-01-09', 'intervalo': 30}
+        response = self.client.post('/api/horarios/gerar/', dados, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['inseridos'], 18)
+
+    def test_periodo_invalido(self):
+        dados = {'data_inicio': '2030-01-07', 'data_fim': '2031-06-01'}
+        response = self.client.post('/api/horarios/gerar/', dados, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class MigracaoHorarioUnicoTestCase(TransactionTestCase):
+    antes = [('sasb', '0005_jornada_trabalho')]
+    depois = [('sasb', '0006_horario_data_unica')]
+
+    def setUp(self):
+        self.executor = MigrationExecutor(connection)
+        self.executor.migrate(self.antes)
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_unifica_horarios_sem_violar_a_reserva_unica(self):
+        modelos = self.executor.loader.project_state(self.antes).apps
+        Horario = modelos.get_model('sasb', 'Horario')
+        Agendamento = modelos.get_model('sasb', 'Agendamento')
+        funcionarios = [
+            modelos.get_model('sasb', 'Funcionario').objects.create(
+                username=f'func{i}', email=f'func{i}@teste.com', nome=f'Func {i}', telefone='1', cargo='C',
+                horario_trabalho='08:00-18:00'
+            )
+            for i in range(2)
+        ]
+        cliente = modelos.get_model('sasb', 'Cliente').objects.create(
+            username='cliente', email='cliente@teste.com', nome='Cliente', telefone='1'
+        )
+        servico = modelos.get_model('sasb', 'Servico').objects.create(nome='Corte', duracao=30, valor=50)
+        data = timezone.now().replace(microsecond=0) + timedelta(days=1)
+        manter, repetido, outro = [Horario.objects.create(data=data, disponivel=False) for _ in range(3)]
+        Horario.objects.filter(pk=outro.pk).update(disponivel=True)
+
+        def agendar(horario, funcionario, status='AGENDADO'):
+            return Agendamento.objects.create(
+                data=data, cliente=cliente, servico=servico, horario=horario, funcionario=funcionario, status=status
+            ).pk
+
+        primeiro = agendar(manter, funcionarios[0])
+        duplicado = agendar(repetido, funcionarios[0])
+        cancelado = agendar(outro, funcionarios[0], status='CANCELADO')
+        de_outro_funcionario = agendar(outro, funcionarios[1])
+
+        MigrationExecutor(connection).migrate(self.depois)
+
+        self.assertEqual(list(Horario.objects.values_list('pk', 'disponivel')), [(manter.pk, True)])
+        self.assertEqual(
+            dict(Agendamento.objects.values_list('pk', 'status')),
+            {primeiro: 'AGENDADO', duplicado: 'CANCELADO', cancelado: 'CANCELADO', de_outro_funcionario: 'AGENDADO'}
+        )
+        self.assertEqual(set(Agendamento.objects.values_list('horario_id', flat=True)), {manter.pk})
@@ -0,0 +1,114 @@
+from datetime import date, time, timedelta
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from sasb.models import Cliente, ExcecaoJornada, Funcionario, JornadaTrabalho
+from sasb.services.jornada import CHAVE_CACHE, compilar, interpretar_horario_trabalho, obter_jornadas
+
+SEGUNDA = date(2030, 1, 7)
+
+
+def momento(dia, hora, minuto=0):
+    return timezone.make_aware(timezone.datetime.combine(dia, time(hora, minuto)))
+
+
+class JornadaCompiladaTestCase(TestCase):
+    def test_faixas_com_pausa(self):
+        jornada = compilar(
+            [(0, time(8, 30), time(12, 0)), (0, time(13, 15), time(18, 0))], []
+        )
+        self.assertTrue(jornada.atende(momento(SEGUNDA, 8, 30), 60))
+        self.assertFalse(jornada.atende(momento(SEGUNDA, 8, 0), 30))
+        self.assertFalse(jornada.atende(momento(SEGUNDA, 11, 30), 45))
+        self.assertFalse(jornada.atende(momento(SEGUNDA, 12, 30)))
+        self.assertTrue(jornada.atende(momento(SEGUNDA, 13, 15), 45))
+        self.assertTrue(jornada.atende(momento(SEGUNDA, 17, 0), 60))
+        # Terça-feira sem faixas
+        self.assertFalse(jornada.atende(momento(SEGUNDA + timedelta(days=1), 10, 0)))
+
+    def test_excecoes_substituem_a_semana(self):
+        semana = [(d, time(9, 0), time(18, 0)) for d in range(5)]
+        excecoes = [
+            (SEGUNDA, SEGUNDA + timedelta(days=1), None, None),  # folga
+            (SEGUNDA + timedelta(days=2), SEGUNDA + timedelta(days=2), time(14, 0), time(0, 0)),
+        ]
+        jornada = compilar(semana, excecoes)
+        self.assertFalse(jornada.atende(momento(SEGUNDA, 10, 0)))
+        self.assertFalse(jornada.atende(momento(SEGUNDA + timedelta(days=1), 10, 0)))
+        self.assertFalse(jornada.atende(momento(SEGUNDA + timedelta(days=2), 10, 0)))
+        self.assertTrue(jornada.atende(momento(SEGUNDA + timedelta(days=2), 23, 0), 60))
+        self.assertTrue(jornada.atende(momento(SEGUNDA + timedelta(days=3), 10, 0)))
+
+    def test_texto_legado_com_minutos(self):
+        self.assertEqual(interpretar_horario_trabalho('08:30-17:45'), (510, 1065))
+        self.assertIsNone(interpretar_horario_trabalho('manhã'))
+        jornada = compilar([], [], '08:30-17:45')
+        self.assertFalse(jornada.atende(momento(SEGUNDA, 8, 0)))
+        self.assertTrue(jornada.atende(momento(SEGUNDA + timedelta(days=5), 17, 0), 45))
+        self.assertFalse(jornada.atende(momento(SEGUNDA, 17, 0), 60))
+
+
+class JornadaCacheTestCase(APITestCase):
+    def setUp(self):
+        self.funcionario = Funcionario.objects.create(
+            username='func', email='func@teste.com', nome='Func', telefone='2',
+            cargo='Manicure', horario_trabalho='08:00-18:00'
+        )
+
+    def test_cache_e_invalidacao(self):
+        self.assertTrue(self.funcionario.jornada().atende(momento(SEGUNDA, 9, 0)))
+        with CaptureQueriesContext(connection) as contexto:
+            self.funcionario.jornada()
+        self.assertEqual(len(contexto), 0)
+
+        JornadaTrabalho.objects.create(
+            funcionario=self.funcionario, dia_semana=0, inicio=time(10, 0), fim=time(16, 0)
+        )
+        self.assertFalse(self.funcionario.jornada().atende(momento(SEGUNDA, 9, 0)))
+
+        excecao = ExcecaoJornada.objects.create(
+            funcionario=self.funcionario, data_inicio=SEGUNDA, data_fim=SEGUNDA, motivo='Feriado'
+        )
+        self.assertFalse(self.funcionario.jornada().atende(momento(SEGUNDA, 11, 0)))
+        excecao.delete()
+        self.assertTrue(self.funcionario.jornada().atende(momento(SEGUNDA, 11, 0)))
+
+    def test_cache_de_outro_processo_nao_serve_jornada_velha(self):
+        self.assertTrue(self.funcionario.jornada().atende(momento(SEGUNDA, 9, 0)))
+
+        # O texto legado muda a jornada sem mudar a versão
+        Funcionario.objects.filter(pk=self.funcionario.pk).update(horario_trabalho='13:00-18:00')
+        funcionario = Funcionario.objects.get(pk=self.funcionario.pk)
+        self.assertFalse(funcionario.jornada().atende(momento(SEGUNDA, 9, 0)))
+        self.assertTrue(funcionario.jornada().atende(momento(SEGUNDA, 14, 0)))
+
+        chave = CHAVE_CACHE.format(funcionario.pk, funcionario.versao_jornada)
+        entrada = cache.get(chave)
+        JornadaTrabalho.objects.create(
+            funcionario_id=funcionario.pk, dia_semana=0, inicio=time(8, 0), fim=time(12, 0)
+        )
+        # Outro processo ainda tem a entrada antiga no seu cache local
+        cache.set(chave, entrada)
+        funcionario = Funcionario.objects.get(pk=self.funcionario.pk)
+        self.assertTrue(funcionario.jornada().atende(momento(SEGUNDA, 9, 0)))
+        self.assertFalse(obter_jornadas([funcionario.pk])[funcionario.pk].atende(momento(SEGUNDA, 14, 0)))
+
+    def test_api_de_jornada(self):
+        admin = Cliente.objects.create(
+            username='admin', email='admin@teste.com', nome='Admin', telefone='1', is_staff=True
+        )
+        self.client.force_authenticate(user=admin)
+        dados = {'funcionario': self.funcionario.id, 'dia_semana': 0, 'inicio': '12:00', 'fim': '09:00'}
+        response = self.client.post('/api/jornadas/', dados, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        dados['fim'] = '00:00'
+        response = self.client.post('/api/jornadas/', dados, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(self.funcionario.jornada().atende(momento(SEGUNDA, 23, 0), 60))
@@ -0,0 +1,138 @@
+import io
+import json
+import os
+import time
+import unittest
+import uuid
+from datetime import date, datetime, time as dt_time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from sasb.api import renderers
+from sasb.api.renderers import JSONRapidoParser, JSONRapidoRenderer
+from sasb.models import Cliente, Horario
+
+
+def _amostra():
+    return {
+        'utc': datetime(2025, 3, 4, 9, 30, 15, 123456, tzinfo=dt_timezone.utc),
+        'fuso': datetime(2025, 3, 4, 9, 30, tzinfo=dt_timezone(timedelta(hours=-3))),
+        'ingenua': datetime(2025, 3, 4, 9, 30, 15, 500),
+        'dia': date(2025, 3, 4),
+        'hora': dt_time(9, 30, 15, 250000),
+        'decimal': Decimal('50.10'),
+        'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'texto': 'Serviço “especial”\u2028linha\u2029',
+        'preguicoso': gettext_lazy('Horário'),
+        'lista': [1, 2.5, None, True, ('a', 'b')],
+        'conjunto': {7},
+        'aninhado': {'vazio': {}, 'numeros': list(range(5))},
+    }
+
+
+class JSONRapidoTestCase(TestCase):
+    def test_saida_igual_ao_json_renderer(self):
+        dados = _amostra()
+        esperado = JSONRenderer().render(dados)
+        self.assertEqual(JSONRapidoRenderer().render(dados), esperado)
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertEqual(JSONRapidoRenderer().render(dados), esperado)
+
+    def test_volta_para_a_biblioteca_padrao(self):
+        # Inteiros fora de 64 bits e indentação ficam com o json padrão
+        self.assertEqual(JSONRapidoRenderer().render({'n': 2 ** 70}), JSONRenderer().render({'n': 2 ** 70}))
+        contexto = {'indent': 2}
+        self.assertEqual(
+            JSONRapidoRenderer().render({'a': [1]}, 'application/json', contexto),
+            JSONRenderer().render({'a': [1]}, 'application/json', contexto)
+        )
+        self.assertEqual(JSONRapidoRenderer().render(None), b'')
+
+    @unittest.skipIf(renderers.orjson is None, 'orjson não instalado')
+    def test_diferencas_em_float(self):
+        # O mesmo número, com o expoente escrito de outro jeito
+        rapido = JSONRapidoRenderer().render([1e16, 1e-7, 0.5])
+        self.assertEqual(rapido, b'[1e16,1e-7,0.5]')
+        self.assertEqual(json.loads(rapido), json.loads(JSONRenderer().render([1e16, 1e-7, 0.5])))
+        # Não finitos viram null em vez de erro
+        for valor in (float('nan'), float('inf'), float('-inf')):
+            self.assertEqual(JSONRapidoRenderer().render({'v': valor}), b'{"v":null}')
+            with self.assertRaises(ValueError):
+                JSONRenderer().render({'v': valor})
+
+    def test_parser_equivalente(self):
+        corpo = '{"nome": "Ana", "valores": [1, 2.5, null], "ativo": true, "texto": "ç\\u2028"}'.encode()
+        self.assertEqual(
+            JSONRapidoParser().parse(io.BytesIO(corpo)),
+            JSONParser().parse(io.BytesIO(corpo))
+        )
+        for invalido in (b'{"a": }', b'{"a": NaN}'):
+            with self.assertRaises(ParseError):
+                JSONRapidoParser().parse(io.BytesIO(invalido))
+
+    def test_parser_mantem_inteiros_fora_de_64_bits(self):
+        for corpo in (
+            b'{"id": 123456789012345678901234}', b'[18446744073709551616, -9223372036854775809]',
+            b'{"texto": "1234567890123456789", "n": 1}', b'[1e400]',
+        ):
+            self.assertEqual(
+                JSONRapidoParser().parse(io.BytesIO(corpo)),
+                JSONParser().parse(io.BytesIO(corpo))
+            )
+        self.assertEqual(
+            JSONRapidoParser().parse(io.BytesIO(b'{"id": 123456789012345678901234}')),
+            {'id': 123456789012345678901234}
+        )
+
+    def test_api_usa_o_renderer_e_o_parser(self):
+        usuario = Cliente.objects.create(username='cliente', email='c@teste.com', nome='Cliente', telefone='1')
+        api = APIClient()
+        api.force_authenticate(usuario)
+        inicio = timezone.now().replace(second=0, microsecond=0)
+        Horario.objects.bulk_create([Horario(data=inicio + timedelta(minutes=15 * i), vagas=2) for i in range(30)])
+
+        resposta = api.get('/api/horarios/', {'page_size': 30})
+        self.assertIsInstance(resposta.accepted_renderer, JSONRapidoRenderer)
+        self.assertEqual(resposta.content, JSONRenderer().render(resposta.data))
+
+        resposta = api.post('/api/agendamentos/', data='{"servico": }', content_type='application/json')
+        self.assertEqual(resposta.status_code, 400)
+        self.assertIn('JSON parse error', resposta.data['detail'])
+
+
+@unittest.skipUnless(os.environ.get('SASB_BENCHMARK'), 'defina SASB_BENCHMARK=1 para medir')
+class JSONRapidoDesempenhoTestCase(TestCase):
+    def test_benchmark_renderer(self):
+        agora = timezone.now()
+        dados = {
+            'next': None,
+            'previous': None,
+            'results': [
+                {
+                    'id': i, 'data': agora + timedelta(minutes=i), 'status': 'AGENDADO', 'cliente': i % 50,
+                    'servico': 3, 'horario': i, 'funcionario': i % 20, 'pagamento': None, 'recorrencia': None,
+                }
+                for i in range(5000)
+            ],
+        }
+
+        def medir(renderer, rodadas=5):
+            melhor = float('inf')
+            for _ in range(rodadas):
+                inicio = time.perf_counter()
+                renderer.render(dados)
+                melhor = min(melhor, time.perf_counter() - inicio)
+            return melhor
+
+        padrao = medir(JSONRenderer())
+        rapido = medir(JSONRapidoRenderer())
+        print(f'\nrender de 5000 agendamentos: json {padrao * 1000:.1f} ms, '
+              f'orjson {rapido * 1000:.1f} ms ({padrao / rapido:.1f}x)')
@@ -0,0 +1,155 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from sasb.models import Agendamento, Cliente, Funcionario, Horario, Notificacao, Servico
+from sasb.services.lembretes import agendar_lembretes, faixas
+from sasb.services.notifications import NotificationService, processar_pendentes
+
+
+class LembretesTestCase(TestCase):
+    def setUp(self):
+        self.agora = timezone.now().replace(microsecond=0)
+        self.cliente = Cliente.objects.create(username='cliente', email='cliente@teste.com', nome='Ana', telefone='1')
+        self.sem_email = Cliente.objects.create(username='sem', email='', nome='Sem', telefone='1')
+        self.servico = Servico.objects.create(nome='Corte', duracao=30, valor=Decimal('50.00'))
+        self.funcionario = Funcionario.objects.create(
+            username='func', email='func@teste.com', nome='Bia', telefone='2',
+            cargo='Cabeleireiro', horario_trabalho='00:00-23:59'
+        )
+
+    def agendar(self, horas, cliente=None, status='AGENDADO'):
+        horario = Horario.objects.create(data=self.agora + timedelta(hours=horas))
+        # bulk_create: sem validação de jornada nem consumo de vaga
+        return Agendamento.objects.bulk_create([Agendamento(
+            data=horario.data, cliente=cliente or self.cliente, servico=self.servico,
+            horario=horario, funcionario=self.funcionario, status=status,
+        )])[0]
+
+    def lembretes(self):
+        return sorted(Notificacao.objects.values_list('chave', flat=True))
+
+    def test_faixas_disjuntas(self):
+        self.assertEqual(
+            [(horas, inicio - self.agora, fim - self.agora) for horas, inicio, fim in faixas([24, 2, 2], self.agora)],
+            [(2, timedelta(0), timedelta(hours=2)), (24, timedelta(hours=2), timedelta(hours=24))]
+        )
+
+    def test_cada_agendamento_recebe_um_lembrete_por_faixa(self):
+        perto = self.agendar(1)
+        hoje = self.agendar(5)
+        amanha = self.agendar(23)
+        self.agendar(30)
+        self.agendar(-1)
+        self.agendar(3, status='CANCELADO')
+        self.agendar(4, cliente=self.sem_email)
+
+        self.assertEqual(agendar_lembretes(agora=self.agora), {2: 1, 24: 2})
+        self.assertEqual(self.lembretes(), sorted([
+            f'lembrete-2h:{perto.pk}', f'lembrete-24h:{hoje.pk}', f'lembrete-24h:{amanha.pk}',
+        ]))
+
+        # Idempotente: nada de novo na mesma janela
+        self.assertEqual(agendar_lembretes(agora=self.agora), {2: 0, 24: 0})
+
+        # Quatro horas depois, o de 5h entra na faixa de 2h
+        self.assertEqual(agendar_lembretes(agora=self.agora + timedelta(hours=4)), {2: 1, 24: 0})
+        self.assertIn(f'lembrete-2h:{hoje.pk}', self.lembretes())
+
+        notificacao = Notificacao.objects.get(chave=f'lembrete-24h:{amanha.pk}')
+        self.assertEqual(notificacao.destinatario, 'cliente@teste.com')
+        self.assertIn('Serviço: Corte', notificacao.mensagem)
+        self.assertIn('Profissional: Bia', notificacao.mensagem)
+
+    def test_lembrete_avulso_nao_repete(self):
+        agendamento = self.agendar(10)
+        NotificationService.enviar_lembrete(agendamento)
+        NotificationService.enviar_lembrete(agendamento)
+        self.assertEqual(self.lembretes(), [f'lembrete-24h:{agendamento.pk}'])
+        self.assertEqual(agendar_lembretes(agora=self.agora), {2: 0, 24: 0})
+
+    def test_consultas_nao_crescem_com_os_agendamentos(self):
+        for i in range(40):
+            self.agendar(3 + i * 0.25)
+        with CaptureQueriesContext(connection) as consultas:
+            agendar_lembretes(agora=self.agora)
+        selects = [q for q in consultas.captured_queries if q['sql'].startswith('SELECT')]
+        self.assertEqual(len(selects), 2)
+        self.assertEqual(Notificacao.objects.count(), 40)
+
+    def test_consulta_usa_o_indice(self):
+        self.agendar(3)
+        consulta = Agendamento.objects.filter(
+            status__in=['AGENDADO', 'CONFIRMADO'], data__gt=self.agora, data__lte=self.agora + timedelta(hours=24)
+        )
+        self.assertIn('agendamento_status_data_idx', consulta.explain())
+
+    def test_cancelado_depois_de_enfileirado_nao_recebe(self):
+        cancelado = self.agendar(5)
+        excluido = self.agendar(6)
+        mantido = self.agendar(7)
+        self.assertEqual(agendar_lembretes(agora=self.agora), {2: 0, 24: 3})
+
+        excluido_id = excluido.pk
+        cancelado.cancelar_agendamento()
+        excluido.delete()
+        self.assertEqual(processar_pendentes(), (1, 0, 0))
+
+        self.assertEqual([m.to for m in mail.outbox], [['cliente@teste.com']])
+        self.assertEqual(
+            dict(Notificacao.objects.values_list('chave', 'status')),
+            {
+                f'lembrete-24h:{cancelado.pk}': 'CANCELADA',
+                f'lembrete-24h:{excluido_id}': 'CANCELADA',
+                f'lembrete-24h:{mantido.pk}': 'ENVIADA',
+            }
+        )
+        # Nem volta para a fila numa nova passada
+        self.assertEqual(agendar_lembretes(agora=self.agora), {2: 0, 24: 0})
+
+    def test_comando_enfileira_e_envia(self):
+        self.agendar(1)
+        self.agendar(10)
+        saida = StringIO()
+        call_command('enviar_lembretes', '--antecedencias', '24', '2', stdout=saida)
+        self.assertIn('1 de 2h, 1 de 24h', saida.getvalue())
+        self.assertIn('2 enviadas', saida.getvalue())
+        self.assertEqual(len(mail.outbox), 2)
+
+        call_command('enviar_lembretes', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 2)
+
+        # Outra antecedência é outro lembrete; sem envio, fica na fila
+        call_command('enviar_lembretes', '--sem-envio', '--antecedencias', '48', stdout=StringIO())
+        self.assertEqual(Notificacao.objects.filter(status='PENDENTE', chave__startswith='lembrete-48h:').count(), 2)
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_dezenas_de_milhares(self):
+        funcionarios = Funcionario.objects.bulk_create([
+            Funcionario(username=f'f{i}', email=f'f{i}@teste.com', nome=f'F {i}', telefone='2', cargo='C',
+                        horario_trabalho='00:00-23:59')
+            for i in range(100)
+        ])
+        horarios = Horario.objects.bulk_create([
+            Horario(data=self.agora + timedelta(minutes=14 * (i + 1)), vagas=100) for i in range(100)
+        ])
+        Agendamento.objects.bulk_create([
+            Agendamento(data=horario.data, cliente=self.cliente, servico=self.servico, horario=horario,
+                        funcionario=funcionario)
+            for horario in horarios for funcionario in funcionarios
+        ], batch_size=2000)
+
+        with CaptureQueriesContext(connection) as consultas:
+            enfileirados = agendar_lembretes(agora=self.agora)
+        self.assertEqual(sum(enfileirados.values()), 10000)
+        # Duas leituras (uma por faixa) e os inserts em lotes de TAMANHO_LOTE
+        selects = [q for q in consultas.captured_queries if q['sql'].startswith('SELECT')]
+        self.assertEqual(len(selects), 2)
+        self.assertEqual(agendar_lembretes(agora=self.agora), {2: 0, 24: 0})
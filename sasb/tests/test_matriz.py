@@ -0,0 +1,127 @@
+import base64
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import caches
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from sasb.models import Agendamento, Cliente, Funcionario, Horario, Servico
+from sasb.services.busca import buscar_horarios_livres
+from sasb.services.matriz import codificar_bits, codificar_rle, matriz_disponibilidade
+
+
+def _decodificar_rle(corridas):
+    livres = []
+    for posicao, tamanho in enumerate(corridas):
+        livres.extend([posicao % 2] * tamanho)
+    return livres
+
+
+class MatrizDisponibilidadeTestCase(TestCase):
+    def setUp(self):
+        caches['respostas'].clear()
+        self.cliente = Cliente.objects.create(
+            username='cliente', email='cliente@teste.com', nome='Cliente', telefone='1'
+        )
+        self.servico = Servico.objects.create(nome='Escova', duracao=60, valor=Decimal('80.00'))
+        jornadas = ['08:00-12:00', '10:00-14:00', '08:00-12:00']
+        self.funcionarios = [
+            Funcionario.objects.create(
+                username=f'func{i}', email=f'func{i}@teste.com', nome=f'Func {i}', telefone='2',
+                cargo='Cabeleireiro', horario_trabalho=jornada
+            )
+            for i, jornada in enumerate(jornadas)
+        ]
+        # O terceiro não faz o serviço
+        for funcionario in self.funcionarios[:2]:
+            funcionario.servicos.add(self.servico)
+
+        self.dia = (timezone.now() + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        self.horarios = [
+            Horario.objects.create(data=self.dia + timedelta(minutes=minuto)) for minuto in range(480, 840, 30)
+        ]
+        Agendamento.objects.create(
+            data=self.horarios[2].data, cliente=self.cliente, servico=self.servico,
+            horario=self.horarios[2], funcionario=self.funcionarios[0]
+        )
+        fechado = self.horarios[8]
+        fechado.disponivel = False
+        fechado.save()
+
+    def test_grade_igual_a_busca_por_horario(self):
+        horarios, linhas = matriz_disponibilidade(self.servico, self.dia, self.dia + timedelta(days=1))
+        self.assertEqual([pk for pk, _ in horarios], [h.pk for h in self.horarios])
+        self.assertEqual([pk for pk, _, _ in linhas], [f.pk for f in self.funcionarios[:2]])
+
+        abertos = Horario.objects.filter(pk__in=[h.pk for h in self.horarios], disponivel=True, vagas__gt=0)
+        livres = dict((h.pk, ids) for h, ids in buscar_horarios_livres(self.servico, abertos))
+        for pk, _, linha in linhas:
+            self.assertEqual(list(linha), [int(pk in livres.get(h.pk, ())) for h in self.horarios])
+
+        # 08:00-12:00 com 09:00-10:00 ocupado, serviço de 60 minutos
+        self.assertEqual(list(linhas[0][2]), [1, 0, 0, 0, 1, 1, 1, 0, 0, 0, 0, 0])
+        # 10:00-14:00, sem o horário fechado das 12:00
+        self.assertEqual(list(linhas[1][2]), [0, 0, 0, 0, 1, 1, 1, 1, 0, 1, 1, 0])
+
+    def test_consultas_constantes(self):
+        inicio, fim = self.dia, self.dia + timedelta(days=1)
+        matriz_disponibilidade(self.servico, inicio, fim)
+        # Horários, profissionais qualificados e agendamentos
+        with self.assertNumQueries(3):
+            matriz_disponibilidade(self.servico, inicio, fim)
+
+    def test_codificacoes(self):
+        livres = bytearray([1, 0, 0, 0, 1, 1, 1, 0, 0, 1])
+        self.assertEqual(codificar_rle(livres), [0, 1, 3, 3, 2, 1])
+        self.assertEqual(codificar_rle(bytearray([0, 0])), [2])
+        self.assertEqual(codificar_rle(bytearray()), [0])
+        self.assertEqual(base64.b64decode(codificar_bits(livres)), bytes([0b10001110, 0b01000000]))
+
+    def test_endpoint(self):
+        api = APIClient()
+        api.force_authenticate(self.cliente)
+        url = '/api/agendamento-processo/matriz_disponibilidade/'
+        periodo = {
+            'servico_id': self.servico.pk,
+            'data_inicio': self.dia.replace(tzinfo=None).isoformat(),
+            'data_fim': (self.dia + timedelta(days=1)).replace(tzinfo=None).isoformat(),
+        }
+
+        resposta = api.get(url, periodo)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.data['codificacao'], 'rle')
+        self.assertEqual(len(resposta.data['horarios']), 12)
+        primeiro = resposta.data['profissionais'][0]
+        self.assertEqual(primeiro['nome'], 'Func 0')
+        self.assertEqual(_decodificar_rle(primeiro['livres']), [1, 0, 0, 0, 1, 1, 1, 0, 0, 0, 0, 0])
+
+        resposta = api.get(url, {**periodo, 'codificacao': 'bits'})
+        self.assertEqual(base64.b64decode(resposta.data['profissionais'][0]['livres']), bytes([0b10001110, 0]))
+
+        self.assertEqual(api.get(url, {**periodo, 'codificacao': 'xml'}).status_code, 400)
+        self.assertEqual(api.get(url, {'servico_id': 999}).status_code, 404)
+        self.assertEqual(api.get(url).status_code, 400)
+        longo = {**periodo, 'data_fim': (self.dia + timedelta(days=40)).replace(tzinfo=None).isoformat()}
+        self.assertEqual(api.get(url, longo).status_code, 400)
+
+    def test_periodo_com_fuso_ou_invalido(self):
+        api = APIClient()
+        api.force_authenticate(self.cliente)
+        url = '/api/agendamento-processo/matriz_disponibilidade/'
+        periodo = {
+            'servico_id': self.servico.pk,
+            'data_inicio': self.dia.isoformat(),
+            'data_fim': (self.dia + timedelta(days=1)).isoformat(),
+        }
+        resposta = api.get(url, periodo)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(len(resposta.data['horarios']), 12)
+
+        for invalido in ({'data_inicio': 'xx'}, {'data_fim': '2025-13-01'}):
+            resposta = api.get(url, {**periodo, **invalido})
+            self.assertEqual(resposta.status_code, 400)
+            self.assertIn(next(iter(invalido)), resposta.data)
+        resposta = api.get(f'/api/servicos/{self.servico.pk}/horarios_disponiveis/', {'data_inicio': 'xx'})
+        self.assertEqual(resposta.status_code, 400)
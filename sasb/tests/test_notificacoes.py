@@ -0,0 +1,145 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from smtplib import SMTPRecipientsRefused, SMTPServerDisconnected
+from unittest import mock
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from sasb.models import Agendamento, Cliente, Funcionario, Horario, Notificacao, Servico
+from sasb.services import notifications
+from sasb.services.notifications import MAX_TENTATIVAS, enfileirar, espera, processar_lote
+
+
+class BackendInstavel(EmailBackend):
+    """locmem que recusa os destinatários de ``recusados``."""
+    recusados = set()
+    aberturas = 0
+
+    def open(self):
+        BackendInstavel.aberturas += 1
+        return super().open()
+
+    def send_messages(self, messages):
+        for mensagem in messages:
+            if set(mensagem.to) & self.recusados:
+                raise SMTPRecipientsRefused({destinatario: (550, b'recusado') for destinatario in mensagem.to})
+        return super().send_messages(messages)
+
+
+class CaixaDeSaidaTestCase(TestCase):
+    def setUp(self):
+        BackendInstavel.recusados = set()
+        BackendInstavel.aberturas = 0
+
+    def test_envia_em_lotes_por_uma_conexao(self):
+        for i in range(5):
+            enfileirar(f'cliente{i}@teste.com', 'Assunto', f'Mensagem {i}')
+
+        self.assertEqual(processar_lote(tamanho=3, conexao=BackendInstavel()), (3, 0, 0))
+        self.assertEqual(processar_lote(tamanho=3, conexao=BackendInstavel()), (2, 0, 0))
+        self.assertEqual(processar_lote(tamanho=3, conexao=BackendInstavel()), (0, 0, 0))
+
+        self.assertEqual(BackendInstavel.aberturas, 2)
+        self.assertEqual([m.body for m in mail.outbox], [f'Mensagem {i}' for i in range(5)])
+        self.assertFalse(Notificacao.objects.exclude(status='ENVIADA').exists())
+        self.assertFalse(Notificacao.objects.filter(enviada_em=None).exists())
+
+    def test_falha_reagenda_com_espera_exponencial_e_depois_desiste(self):
+        BackendInstavel.recusados = {'ruim@teste.com'}
+        ruim = enfileirar('ruim@teste.com', 'Assunto', 'Mensagem')
+        enfileirar('bom@teste.com', 'Assunto', 'Mensagem')
+
+        self.assertEqual(processar_lote(conexao=BackendInstavel()), (1, 1, 0))
+        ruim.refresh_from_db()
+        self.assertEqual((ruim.status, ruim.tentativas), ('PENDENTE', 1))
+        self.assertIn('SMTPRecipientsRefused', ruim.ultimo_erro)
+        self.assertGreater(ruim.proxima_tentativa, timezone.now() + espera(1) - timedelta(seconds=5))
+
+        # Ainda não venceu
+        self.assertEqual(processar_lote(conexao=BackendInstavel()), (0, 0, 0))
+
+        for tentativa in range(2, MAX_TENTATIVAS + 1):
+            Notificacao.objects.filter(pk=ruim.pk).update(proxima_tentativa=timezone.now())
+            esperado = (0, 0, 1) if tentativa == MAX_TENTATIVAS else (0, 1, 0)
+            self.assertEqual(processar_lote(conexao=BackendInstavel()), esperado)
+
+        ruim.refresh_from_db()
+        self.assertEqual((ruim.status, ruim.tentativas), ('FALHOU', MAX_TENTATIVAS))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertLess(espera(2), espera(3))
+        self.assertEqual(espera(50), notifications.ESPERA_MAXIMA)
+
+    def test_sem_conexao_o_lote_volta_para_a_fila(self):
+        enfileirar('cliente@teste.com', 'Assunto', 'Mensagem')
+        with mock.patch.object(EmailBackend, 'open', side_effect=SMTPServerDisconnected('fora do ar')):
+            self.assertEqual(processar_lote(), (0, 1, 0))
+        self.assertEqual(Notificacao.objects.get().status, 'PENDENTE')
+        self.assertEqual(mail.outbox, [])
+
+    def test_lote_reservado_nao_e_pego_de_novo(self):
+        enfileirar('cliente@teste.com', 'Assunto', 'Mensagem')
+        lote = notifications._reservar_lote(10, timezone.now())
+        self.assertEqual(len(lote), 1)
+        self.assertEqual(notifications._reservar_lote(10, timezone.now()), [])
+        # Passado o arrendamento, volta a ficar disponível
+        self.assertEqual(len(notifications._reservar_lote(10, timezone.now() + notifications.ARRENDAMENTO)), 1)
+
+    def test_comando(self):
+        for i in range(3):
+            enfileirar(f'cliente{i}@teste.com', 'Assunto', 'Mensagem')
+        saida = StringIO()
+        call_command('processar_notificacoes', '--lote', '2', stdout=saida)
+        self.assertIn('3 enviadas, 0 reagendadas, 0 com falha definitiva', saida.getvalue())
+        self.assertEqual(len(mail.outbox), 3)
+
+
+class ConfirmacaoAgendamentoTestCase(TestCase):
+    def setUp(self):
+        self.cliente = Cliente.objects.create(username='cliente', email='cliente@teste.com', nome='Cliente', telefone='1')
+        self.servico = Servico.objects.create(nome='Corte', duracao=30, valor=Decimal('50.00'))
+        self.funcionario = Funcionario.objects.create(
+            username='func', email='func@teste.com', nome='Func', telefone='2',
+            cargo='Cabeleireiro', horario_trabalho='00:00-23:59'
+        )
+        self.funcionario.servicos.add(self.servico)
+        self.horario = Horario.objects.create(data=timezone.now() + timedelta(days=1))
+        self.api = APIClient()
+        self.api.force_authenticate(user=self.cliente)
+
+    def criar(self):
+        return self.api.post('/api/agendamento-processo/criar_agendamento/', {
+            'servico_id': self.servico.pk, 'horario_id': self.horario.pk, 'funcionario_id': self.funcionario.pk,
+        })
+
+    def test_requisicao_so_enfileira(self):
+        resposta = self.criar()
+        self.assertEqual(resposta.status_code, 201)
+        self.assertEqual(mail.outbox, [])
+
+        notificacao = Notificacao.objects.get()
+        self.assertEqual(notificacao.agendamento_id, resposta.data['id'])
+        self.assertEqual(notificacao.destinatario, 'cliente@teste.com')
+        self.assertIn('Serviço: Corte', notificacao.mensagem)
+
+        call_command('processar_notificacoes', stdout=StringIO())
+        self.assertEqual([m.to for m in mail.outbox], [['cliente@teste.com']])
+
+    def test_reserva_recusada_nao_enfileira(self):
+        with mock.patch.object(Agendamento, 'save', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.criar()
+        self.assertFalse(Notificacao.objects.exists())
+
+    def test_falha_ao_enfileirar_desfaz_a_reserva(self):
+        with mock.patch.object(notifications, 'enfileirar', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.criar()
+        self.assertFalse(Agendamento.objects.exists())
+        self.horario.refresh_from_db()
+        self.assertEqual(self.horario.vagas, 1)
@@ -1,7 +1,19 @@
+import os
+import time
+import unittest
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.db import connection
 from django.test import TestCase
 from django.test.utils import CaptureQueriesContext
-from django.db import connection
-import time
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from sasb.api.leitura import LeituraRapidaMixin
+from sasb.models import Agendamento, Cliente, Funcionario, Horario, Servico
+
 
 class PerformanceTestCase(TestCase):
     def test_query_count(self):
@@ -18,4 +30,164 @@ class PerformanceTestCase(TestCase):
         end_time = time.time()
         
         # Verificar se resposta é rápida o suficiente
-        self.assertLess(end_time - start_time, 0.5)
\ No newline at end of file
+        self.assertLess(end_time - start_time, 0.5)
+
+class PaginacaoCursorTestCase(TestCase):
+    def setUp(self):
+        usuario = Cliente.objects.create(
+            username='cliente', email='cliente@teste.com', nome='Cliente', telefone='1'
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(user=usuario)
+        inicio = timezone.now().replace(microsecond=0)
+        Horario.objects.bulk_create([
+            Horario(data=inicio + timedelta(minutes=15 * i), vagas=1) for i in range(45)
+        ])
+
+    def test_percorre_todas_as_paginas_sem_count(self):
+        vistos = []
+        url = '/api/horarios/?page_size=10'
+        consultas = []
+        while url:
+            with CaptureQueriesContext(connection) as context:
+                response = self.api.get(url)
+            consultas.append(len(context))
+            # Fora a agregação da ETag (MAX + COUNT), a página não conta linhas
+            self.assertFalse(any(
+                'COUNT(' in q['sql'] and 'MAX(' not in q['sql'] for q in context.captured_queries
+            ))
+            vistos.extend(h['data'] for h in response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(len(vistos), 45)
+        self.assertEqual(vistos, sorted(vistos))
+        # A última página custa o mesmo que a primeira
+        self.assertEqual(len(set(consultas)), 1)
+
+
+class DadosListagemMixin:
+    def setUp(self):
+        self.cliente = Cliente.objects.create(
+            username='cliente', email='cliente@teste.com', nome='Cliente', telefone='1'
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(user=self.cliente)
+        servico = Servico.objects.create(nome='Corte', duracao=15, valor=Decimal('50.00'))
+        funcionario = Funcionario.objects.create(
+            username='func', email='func@teste.com', nome='Func', telefone='2',
+            cargo='Cabeleireiro', horario_trabalho='08:00-18:00'
+        )
+        inicio = (timezone.now() + timedelta(days=1)).replace(microsecond=0)
+        horarios = Horario.objects.bulk_create([
+            Horario(data=inicio + timedelta(minutes=15 * i), vagas=1) for i in range(500)
+        ])
+        Agendamento.objects.bulk_create([
+            Agendamento(
+                data=horario.data, fim=horario.data + timedelta(minutes=15), cliente=self.cliente,
+                servico=servico, horario=horario, funcionario=funcionario
+            )
+            for horario in horarios
+        ])
+
+    def listar(self, tamanho):
+        with CaptureQueriesContext(connection) as context:
+            response = self.api.get('/api/agendamentos/', {
+                'expand': 'cliente,servico,funcionario,horario', 'page_size': tamanho
+            })
+        self.assertEqual(response.status_code, 200)
+        return response, len(context)
+
+
+class ExpansaoTestCase(DadosListagemMixin, TestCase):
+    def test_lista_expandida_em_numero_fixo_de_consultas(self):
+        response, consultas_500 = self.listar(500)
+        self.assertEqual(len(response.data['results']), 500)
+        item = response.data['results'][0]
+        self.assertEqual(item['cliente']['nome'], 'Cliente')
+        self.assertEqual(item['servico']['nome'], 'Corte')
+        self.assertEqual(item['funcionario']['cargo'], 'Cabeleireiro')
+        self.assertNotIn('password', item['cliente'])
+        self.assertIsInstance(item['pagamento'], type(None))
+
+        _, consultas_5 = self.listar(5)
+        self.assertEqual(consultas_500, consultas_5)
+        self.assertLessEqual(consultas_500, 3)
+
+    def test_sem_expand_mantem_pks(self):
+        response = self.api.get('/api/agendamentos/', {'page_size': 5})
+        self.assertEqual(response.data['results'][0]['cliente'], self.cliente.pk)
+
+
+class CamposEsparsosTestCase(DadosListagemMixin, TestCase):
+    def test_fields_corta_resposta_e_colunas(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.api.get('/api/agendamentos/', {'fields': 'id,status', 'page_size': 5})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'status'})
+        sql = context.captured_queries[-1]['sql']
+        self.assertNotIn('"servico_id"', sql)
+        # A coluna da ordenação do cursor continua sendo lida
+        self.assertIn('"data"', sql)
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.api.get(f'/api/clientes/{self.cliente.pk}/', {'fields': 'id,nome'})
+        self.assertEqual(response.data, {'id': self.cliente.pk, 'nome': 'Cliente'})
+        sql = context.captured_queries[-1]['sql']
+        self.assertNotIn('"password"', sql)
+        self.assertNotIn('"date_joined"', sql)
+
+    def test_fields_com_expand(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.api.get('/api/agendamentos/', {
+                'fields': 'id,servico', 'expand': 'servico,cliente', 'page_size': 50
+            })
+        item = response.data['results'][0]
+        self.assertEqual(set(item), {'id', 'servico'})
+        self.assertEqual(item['servico']['nome'], 'Corte')
+        self.assertLessEqual(len(context), 3)
+
+
+class LeituraRapidaTestCase(DadosListagemMixin, TestCase):
+    def comparar(self, url, parametros):
+        rapida = self.api.get(url, parametros)
+        with mock.patch.object(LeituraRapidaMixin, 'leitura_rapida', False):
+            normal = self.api.get(url, parametros)
+        self.assertEqual(rapida.status_code, 200)
+        self.assertEqual(rapida.content, normal.content)
+
+    def test_saida_identica_ao_serializer(self):
+        Agendamento.objects.filter(pk__in=Agendamento.objects.values('pk')[:3]).update(status='CANCELADO')
+        self.comparar('/api/agendamentos/', {'page_size': 500})
+        self.comparar('/api/agendamentos/', {'page_size': 7, 'fields': 'id,data,horario'})
+        self.comparar('/api/horarios/', {'page_size': 500})
+        self.comparar('/api/horarios/', {'page_size': 20, 'vagas_min': 1})
+
+    def test_caminho_rapido_nao_instancia_modelos(self):
+        def instancias():
+            with mock.patch.object(Agendamento, 'from_db', wraps=Agendamento.from_db) as agendamentos, \
+                    mock.patch.object(Horario, 'from_db', wraps=Horario.from_db) as horarios:
+                for url in ('/api/agendamentos/', '/api/horarios/'):
+                    self.assertEqual(self.api.get(url, {'page_size': 500}).status_code, 200)
+            return agendamentos.call_count + horarios.call_count
+
+        self.assertEqual(instancias(), 0)
+        with mock.patch.object(LeituraRapidaMixin, 'leitura_rapida', False):
+            self.assertGreater(instancias(), 0)
+
+
+@unittest.skipUnless(os.environ.get('SASB_BENCHMARK'), 'defina SASB_BENCHMARK=1 para medir')
+class LeituraRapidaDesempenhoTestCase(DadosListagemMixin, TestCase):
+    def test_listagem_de_500_linhas(self):
+        def medir(rodadas=3):
+            melhor = float('inf')
+            for _ in range(rodadas):
+                inicio = time.perf_counter()
+                for url in ('/api/agendamentos/', '/api/horarios/'):
+                    self.assertEqual(self.api.get(url, {'page_size': 500}).status_code, 200)
+                melhor = min(melhor, time.perf_counter() - inicio)
+            return melhor
+
+        rapida = medir()
+        with mock.patch.object(LeituraRapidaMixin, 'leitura_rapida', False):
+            normal = medir()
+        print(f'\nlistagem de 500 linhas: serializer {normal * 1000:.1f} ms, '
+              f'caminho rápido {rapida * 1000:.1f} ms ({normal / rapida:.1f}x)')
@@ -0,0 +1,129 @@
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from sasb.models import Agendamento, Cliente, Funcionario, Horario, RecorrenciaAgendamento, Servico
+from sasb.services.recorrencia import FORA_DA_GRADE, encerrar, materializar, ocorrencias
+
+
+class RecorrenciaTestCase(TestCase):
+    def setUp(self):
+        self.cliente = Cliente.objects.create(
+            username='cliente', email='cliente@teste.com', nome='Cliente', telefone='1'
+        )
+        self.funcionario = Funcionario.objects.create(
+            username='func', email='func@teste.com', nome='Func', telefone='2',
+            cargo='Cabeleireiro', horario_trabalho='08:00-20:00'
+        )
+        self.servico = Servico.objects.create(nome='Escova', duracao=45, valor=Decimal('40.00'))
+        self.funcionario.servicos.add(self.servico)
+        self.inicio = (timezone.now() + timedelta(days=1)).replace(
+            hour=10, minute=0, second=0, microsecond=0
+        )
+
+    def nova(self, **campos):
+        dados = dict(
+            cliente=self.cliente, funcionario=self.funcionario, servico=self.servico,
+            inicio=self.inicio
+        )
+        dados.update(campos)
+        return RecorrenciaAgendamento.objects.create(**dados)
+
+    def test_semanal_a_cada_n_semanas(self):
+        recorrencia = RecorrenciaAgendamento(inicio=self.inicio, intervalo=2, data_fim=(self.inicio + timedelta(weeks=6)).date())
+        self.assertEqual(
+            list(ocorrencias(recorrencia)),
+            [self.inicio + timedelta(weeks=semanas) for semanas in (0, 2, 4, 6)]
+        )
+
+    def test_mensal_no_mesmo_dia_da_semana(self):
+        # 31/01/2030 é a quinta quinta-feira do mês: nos meses sem ela, vale a última
+        inicio = timezone.make_aware(datetime(2030, 1, 31, 9, 30))
+        recorrencia = RecorrenciaAgendamento(inicio=inicio, frequencia='MENSAL', data_fim=date(2030, 5, 31))
+        self.assertEqual(
+            [momento.date() for momento in ocorrencias(recorrencia)],
+            [date(2030, 1, 31), date(2030, 2, 28), date(2030, 3, 28), date(2030, 4, 25), date(2030, 5, 30)]
+        )
+        segunda_terca = timezone.make_aware(datetime(2030, 1, 8, 9, 30))
+        recorrencia = RecorrenciaAgendamento(
+            inicio=segunda_terca, frequencia='MENSAL', intervalo=2, data_fim=date(2030, 5, 31)
+        )
+        self.assertEqual(
+            [momento.date() for momento in ocorrencias(recorrencia)],
+            [date(2030, 1, 8), date(2030, 3, 12), date(2030, 5, 14)]
+        )
+
+    def test_materializa_ate_o_horizonte_e_pula_conflitos(self):
+        ocupado = Horario.objects.create(data=self.inicio + timedelta(weeks=1, minutes=30))
+        outro = Cliente.objects.create(username='outro', email='outro@teste.com', nome='Outro', telefone='3')
+        Agendamento.objects.create(
+            data=ocupado.data, cliente=outro, servico=self.servico, horario=ocupado, funcionario=self.funcionario
+        )
+        recorrencia = self.nova()
+
+        resultados = materializar(recorrencia, self.inicio + timedelta(weeks=3))
+        self.assertEqual([erros is None for _, erros in resultados], [True, False, True, True])
+        self.assertEqual(recorrencia.agendamentos.count(), 3)
+
+        # Já materializado: nada a fazer até o horizonte avançar
+        self.assertEqual(materializar(recorrencia, self.inicio + timedelta(weeks=3)), [])
+        resultados = materializar(recorrencia, self.inicio + timedelta(weeks=5))
+        self.assertEqual(len(resultados), 2)
+        self.assertEqual(recorrencia.agendamentos.count(), 5)
+
+    def test_fora_da_grade_nao_cria_horario_publico(self):
+        quebrado = self.inicio + timedelta(minutes=7)
+        existente = Horario.objects.create(data=quebrado + timedelta(weeks=1))
+        recorrencia = self.nova(inicio=quebrado)
+
+        resultados = materializar(recorrencia, quebrado + timedelta(weeks=2))
+        self.assertEqual([data for data, _ in resultados], [quebrado + timedelta(weeks=n) for n in range(3)])
+        self.assertEqual(
+            [erros for _, erros in resultados],
+            [FORA_DA_GRADE, None, FORA_DA_GRADE]
+        )
+        self.assertEqual(list(Horario.objects.values_list('pk', flat=True)), [existente.pk])
+        self.assertEqual(recorrencia.agendamentos.get().horario, existente)
+
+    def test_consultas_nao_crescem_com_a_serie(self):
+        self.funcionario.jornada()
+        curta, longa = self.nova(), self.nova(inicio=self.inicio + timedelta(hours=2))
+        with CaptureQueriesContext(connection) as contexto_curta:
+            materializar(curta, self.inicio + timedelta(weeks=2))
+        with CaptureQueriesContext(connection) as contexto_longa:
+            materializar(longa, self.inicio + timedelta(weeks=10))
+        self.assertEqual(longa.agendamentos.count(), 10)
+        self.assertEqual(len(contexto_curta), len(contexto_longa))
+
+    def test_encerrar_cancela_futuros_e_devolve_vagas(self):
+        recorrencia = self.nova()
+        materializar(recorrencia, self.inicio + timedelta(weeks=2))
+        self.assertEqual(encerrar(recorrencia), 3)
+        self.assertFalse(recorrencia.agendamentos.filter(status='AGENDADO').exists())
+        self.assertEqual(set(Horario.objects.values_list('vagas', flat=True)), {1})
+        self.assertEqual(materializar(recorrencia, self.inicio + timedelta(weeks=4)), [])
+
+    def test_api_e_comando(self):
+        api = APIClient()
+        api.force_authenticate(user=self.cliente)
+        resposta = api.post('/api/recorrencias/', {
+            'cliente': self.cliente.pk, 'funcionario': self.funcionario.pk,
+            'servico': self.servico.pk, 'inicio': self.inicio.isoformat(), 'frequencia': 'SEMANAL',
+        }, format='json')
+        self.assertEqual(resposta.status_code, 201)
+        self.assertEqual(len(resposta.data['ocorrencias']), 8)
+        self.assertTrue(all(o['status'] == 'criado' for o in resposta.data['ocorrencias']))
+
+        saida = StringIO()
+        call_command('materializar_recorrencias', '--semanas', '12', stdout=saida)
+        self.assertIn('1 séries estendidas, 4 agendamentos criados', saida.getvalue())
+
+        resposta = api.post(f"/api/recorrencias/{resposta.data['id']}/encerrar/")
+        self.assertEqual(resposta.data['agendamentos_cancelados'], 12)
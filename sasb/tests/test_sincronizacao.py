@@ -0,0 +1,167 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from sasb.api.sincronizacao import RETENCAO, gerar_continuacao, gerar_token
+from sasb.models import Agendamento, Cliente, Funcionario, Horario, RegistroExclusao, Servico
+
+
+class SincronizacaoTestCase(TestCase):
+    def setUp(self):
+        self.funcionario = Funcionario.objects.create(
+            username='func', email='func@teste.com', nome='Func', telefone='0',
+            cargo='Cabeleireiro', horario_trabalho='08:00-18:00'
+        )
+        self.clientes = [
+            Cliente.objects.create(
+                username=f'cliente{i}', email=f'cliente{i}@teste.com', nome=f'Cliente {i}', telefone='1'
+            )
+            for i in range(2)
+        ]
+        self.servico = Servico.objects.create(nome='Corte', duracao=30, valor=Decimal('50.00'))
+        amanha = (timezone.now() + timedelta(days=1)).replace(hour=8, minute=0, second=0, microsecond=0)
+        self.horarios = [Horario.objects.create(data=amanha + timedelta(minutes=30 * i)) for i in range(20)]
+        self.agendamentos = [
+            self.agendar(self.horarios[i], self.clientes[i % 2]) for i in range(4)
+        ]
+
+        # Tudo o que existe até aqui já foi sincronizado há uma hora
+        uma_hora = timezone.now() - timedelta(hours=1)
+        Horario.objects.update(atualizado_em=uma_hora)
+        Agendamento.objects.update(atualizado_em=uma_hora)
+        self.token = gerar_token(timezone.now() - timedelta(minutes=1))
+
+        self.api = APIClient()
+        self.api.force_authenticate(self.clientes[0])
+
+    def agendar(self, horario, cliente):
+        return Agendamento.objects.create(
+            data=horario.data, cliente=cliente, servico=self.servico, horario=horario, funcionario=self.funcionario
+        )
+
+    def test_listagem_traz_o_token_inicial(self):
+        resposta = self.api.get('/api/horarios/')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertTrue(resposta['X-Sync-Token'].isdigit())
+
+    def test_sem_alteracoes_nada_vem(self):
+        resposta = self.api.get(f'/api/horarios/?since={self.token}')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.data['alterados'], [])
+        self.assertEqual(resposta.data['excluidos'], [])
+        self.assertEqual(resposta['X-Sync-Token'], resposta.data['token'])
+
+    def test_alteracoes_cancelamentos_e_exclusoes(self):
+        novo = self.agendar(self.horarios[10], self.clientes[0])
+        self.agendamentos[1].cancelar_agendamento()
+        excluido = self.agendamentos[2].pk
+        self.agendamentos[2].delete()
+
+        with self.assertNumQueries(2):
+            resposta = self.api.get(f'/api/agendamentos/?since={self.token}')
+        self.assertEqual(
+            {(item['id'], item['status']) for item in resposta.data['alterados']},
+            {(novo.pk, 'AGENDADO'), (self.agendamentos[1].pk, 'CANCELADO')}
+        )
+        self.assertEqual(resposta.data['excluidos'], [excluido])
+
+        # As vagas tomadas e devolvidas contam como alteração do horário
+        resposta = self.api.get(f'/api/horarios/?since={self.token}')
+        self.assertEqual(
+            {item['id'] for item in resposta.data['alterados']},
+            {self.horarios[10].pk, self.horarios[1].pk}
+        )
+
+    def test_respeita_os_filtros_da_listagem(self):
+        self.agendar(self.horarios[10], self.clientes[0])
+        self.agendar(self.horarios[11], self.clientes[1])
+
+        resposta = self.api.get(f'/api/agendamentos/?cliente={self.clientes[1].pk}&since={self.token}')
+        self.assertEqual([item['cliente'] for item in resposta.data['alterados']], [self.clientes[1].pk])
+
+    def test_exclusoes_respeitam_os_filtros_da_listagem(self):
+        do_outro, meu = self.agendamentos[1], self.agendamentos[2]
+        ids = do_outro.pk, meu.pk
+        do_outro.delete()
+        meu.delete()
+
+        resposta = self.api.get(f'/api/agendamentos/?cliente={self.clientes[0].pk}&since={self.token}')
+        self.assertEqual(resposta.data['excluidos'], [ids[1]])
+
+        dia = timezone.localtime(self.horarios[0].data).date()
+        outro_dia = dia + timedelta(days=1)
+        resposta = self.api.get(f'/api/agendamentos/?data={outro_dia}&since={self.token}')
+        self.assertEqual(resposta.data['excluidos'], [])
+        resposta = self.api.get(f'/api/agendamentos/?since={self.token}')
+        self.assertEqual(resposta.data['excluidos'], list(ids))
+
+    def test_alteracoes_e_exclusoes_vem_em_paginas(self):
+        novos = [self.agendar(self.horarios[10 + i], self.clientes[0]) for i in range(5)]
+        # Mesmo instante para todos: o desempate é pelo id
+        Agendamento.objects.filter(pk__in=[a.pk for a in novos]).update(atualizado_em=timezone.now())
+        excluidos_antes = [a.pk for a in self.agendamentos]
+        for agendamento in self.agendamentos:
+            agendamento.delete()
+
+        recebidos, excluidos, tokens = [], [], set()
+        url = f'/api/agendamentos/?page_size=2&since={self.token}'
+        while True:
+            with self.assertNumQueries(2):
+                resposta = self.api.get(url)
+            self.assertLessEqual(len(resposta.data['alterados']), 2)
+            self.assertLessEqual(len(resposta.data['excluidos']), 2)
+            recebidos += [item['id'] for item in resposta.data['alterados']]
+            excluidos += resposta.data['excluidos']
+            tokens.add(resposta.data['token'])
+            if resposta.data['proximo'] is None:
+                break
+            url = f"/api/agendamentos/?page_size=2&since={resposta.data['proximo']}"
+
+        self.assertEqual(recebidos, [a.pk for a in novos])
+        self.assertEqual(excluidos, excluidos_antes)
+        self.assertEqual(len(tokens), 1)
+
+    def test_token_alem_da_retencao_expira(self):
+        antigo = gerar_token(timezone.now() - RETENCAO - timedelta(minutes=1))
+        resposta = self.api.get(f'/api/agendamentos/?since={antigo}')
+        self.assertEqual(resposta.status_code, 410)
+        self.assertIn('since', resposta.data)
+
+        # A continuação leva o token original e também expira
+        continuacao = gerar_continuacao(self.token, timezone.now() - RETENCAO - timedelta(minutes=1), None, 0)
+        self.assertEqual(self.api.get(f'/api/agendamentos/?since={continuacao}').status_code, 410)
+
+    def test_poda_das_exclusoes(self):
+        antigo, recente = self.agendamentos[0].pk, self.agendamentos[1].pk
+        self.agendamentos[0].delete()
+        self.agendamentos[1].delete()
+        RegistroExclusao.objects.filter(objeto_id=antigo).update(
+            excluido_em=timezone.now() - RETENCAO - timedelta(days=1)
+        )
+
+        saida = StringIO()
+        call_command('podar_exclusoes', stdout=saida)
+        self.assertIn('1 registros de exclusão apagados', saida.getvalue())
+        self.assertEqual(
+            list(RegistroExclusao.objects.values_list('objeto_id', flat=True)), [recente]
+        )
+
+    def test_token_seguinte_encadeia(self):
+        primeira = self.api.get(f'/api/agendamentos/?since={self.token}')
+        self.assertEqual(primeira.data['alterados'], [])
+
+        # Alterações recentes ficam dentro da margem do token seguinte
+        novo = self.agendar(self.horarios[12], self.clientes[0])
+        segunda = self.api.get(f"/api/agendamentos/?since={primeira.data['token']}")
+        self.assertEqual([item['id'] for item in segunda.data['alterados']], [novo.pk])
+
+    def test_token_invalido(self):
+        for token in ('ontem', '1:2', '1:2:3', '1:2:3:4:x', '1:2:3::0', '9' * 30, f'1:{"9" * 30}::0'):
+            resposta = self.api.get(f'/api/agendamentos/?since={token}')
+            self.assertEqual(resposta.status_code, 400)
+            self.assertIn('since', resposta.data)
@@ -0,0 +1,88 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from sasb.models import Agendamento, Cliente, Funcionario, Horario, Servico
+from sasb.services.sugestoes import sugerir_alternativas
+
+
+class SugestoesTestCase(TestCase):
+    def setUp(self):
+        self.clientes = [
+            Cliente.objects.create(
+                username=f'cliente{i}', email=f'cliente{i}@teste.com', nome=f'Cliente {i}', telefone='1'
+            )
+            for i in range(3)
+        ]
+        self.servico = Servico.objects.create(nome='Corte', duracao=30, valor=Decimal('50.00'))
+        self.funcionarios = []
+        for i in range(3):
+            funcionario = Funcionario.objects.create(
+                username=f'func{i}', email=f'func{i}@teste.com', nome=f'Func {i}', telefone='2',
+                cargo='Cabeleireiro', horario_trabalho='08:00-12:00'
+            )
+            self.funcionarios.append(funcionario)
+        # O terceiro não faz o serviço
+        for funcionario in self.funcionarios[:2]:
+            funcionario.servicos.add(self.servico)
+
+        self.dia = (timezone.now() + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        self.horarios = {
+            minuto: Horario.objects.create(data=self.dia + timedelta(minutes=minuto))
+            for minuto in range(480, 720, 30)
+        }
+
+    def ocupar(self, minuto, funcionario, cliente=0):
+        Agendamento.objects.create(
+            data=self.horarios[minuto].data, cliente=self.clientes[cliente], servico=self.servico,
+            horario=self.horarios[minuto], funcionario=funcionario
+        )
+
+    def test_mesmo_profissional_primeiro_depois_mesmo_horario(self):
+        self.ocupar(600, self.funcionarios[0])
+        sugestoes = sugerir_alternativas(self.servico, self.horarios[600], self.funcionarios[0].pk, k=4)
+        self.assertEqual(
+            [(s['distancia_minutos'], s['funcionario_id']) for s in sugestoes],
+            [(30, self.funcionarios[0].pk), (30, self.funcionarios[0].pk),
+             (60, self.funcionarios[0].pk), (60, self.funcionarios[0].pk)]
+        )
+        self.assertEqual(sugestoes[0]['horario'], self.horarios[570])
+
+        # Com o profissional lotado, vêm os colegas qualificados no mesmo horário
+        for minuto in (480, 510, 540, 570, 630, 660, 690):
+            self.ocupar(minuto, self.funcionarios[0], cliente=1)
+        sugestoes = sugerir_alternativas(self.servico, self.horarios[600], self.funcionarios[0].pk)
+        self.assertEqual(
+            [(s['distancia_minutos'], s['funcionario_id']) for s in sugestoes],
+            [(0, self.funcionarios[1].pk), (30, self.funcionarios[1].pk), (30, self.funcionarios[1].pk)]
+        )
+
+    def test_consultas_limitadas_com_salao_quase_cheio(self):
+        for minuto in self.horarios:
+            if minuto != 690:
+                self.ocupar(minuto, self.funcionarios[0])
+                self.ocupar(minuto, self.funcionarios[1], cliente=1)
+        self.funcionarios[0].jornada()
+        self.funcionarios[1].jornada()
+        with CaptureQueriesContext(connection) as contexto:
+            sugestoes = sugerir_alternativas(self.servico, self.horarios[480], self.funcionarios[0].pk)
+        self.assertEqual(len(contexto), 3)
+        self.assertEqual([s['horario'] for s in sugestoes], [self.horarios[690]] * 2)
+
+    def test_resposta_de_conflito_traz_sugestoes(self):
+        self.ocupar(600, self.funcionarios[0])
+        api = APIClient()
+        api.force_authenticate(user=self.clientes[1])
+        resposta = api.post('/api/agendamento-processo/criar_agendamento/', {
+            'servico_id': self.servico.pk, 'horario_id': self.horarios[600].pk,
+            'funcionario_id': self.funcionarios[0].pk,
+        })
+        self.assertEqual(resposta.status_code, 400)
+        self.assertEqual(resposta.data['sugestoes'][0]['horario'], self.horarios[570].pk)
+        self.assertEqual(resposta.data['sugestoes'][0]['funcionario'], self.funcionarios[0].pk)
+        self.assertEqual(len(resposta.data['horarios_alternativos']), 3)
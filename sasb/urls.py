@@ -5,12 +5,16 @@ from drf_yasg import openapi
 from .api.views import (
     ClienteViewSet,
     FuncionarioViewSet,
+    JornadaTrabalhoViewSet,
+    ExcecaoJornadaViewSet,
     ServicoViewSet,
     HorarioViewSet,
     DadosPagamentoViewSet,
     PagamentoViewSet,
     AgendamentoViewSet,
-    AgendamentoProcessoViewSet
+    RecorrenciaAgendamentoViewSet,
+    AgendamentoProcessoViewSet,
+    EstatisticasCacheView
 )
 
 schema_view = get_schema_view(
@@ -26,15 +30,19 @@ schema_view = get_schema_view(
 router = DefaultRouter()
 router.register(r'clientes', ClienteViewSet)
 router.register(r'funcionarios', FuncionarioViewSet)
+router.register(r'jornadas', JornadaTrabalhoViewSet)
+router.register(r'excecoes-jornada', ExcecaoJornadaViewSet)
 router.register(r'servicos', ServicoViewSet)
 router.register(r'horarios', HorarioViewSet)
 router.register(r'dados-pagamento', DadosPagamentoViewSet)
 router.register(r'pagamentos', PagamentoViewSet)
 router.register(r'agendamentos', AgendamentoViewSet)
+router.register(r'recorrencias', RecorrenciaAgendamentoViewSet)
 router.register(r'agendamento-processo', AgendamentoProcessoViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('cache-respostas/', EstatisticasCacheView.as_view(), name='cache-respostas'),
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0)),
     path('redoc/', schema_view.with_ui('redoc', cache_timeout=0)),
 ]
\ No newline at end of file